@@ -1,16 +1,22 @@
 from flask import Flask
 from flask_cors import CORS
-from blueprints.question import question_bp
-from blueprints.interview import interview_bp
-from blueprints.syllabus import syllabus_bp
-from blueprints.authentication import auth_bp
-from blueprints.systemCurriculum import curriculum_bp
-from blueprints.revision import revision_bp
 
 
 def create_app():
+    # Import blueprint trong hàm: chúng tạo Mongo client, thread pool, cấu hình Gemini ngay khi import
+    from blueprints.question import question_bp
+    from blueprints.interview import interview_bp
+    from blueprints.syllabus import syllabus_bp
+    from blueprints.authentication import auth_bp
+    from blueprints.systemCurriculum import curriculum_bp
+    from blueprints.revision import revision_bp
+    from blueprints.metrics import metrics_bp
+    from extensions.indexes import ensure_indexes
+    from extensions.scheduler import status_scheduler
+    from utils.pagination import NEXT_CURSOR_HEADER
+
     app = Flask(__name__)
-    CORS(app, resources={r"*": {"origins": "*"}})
+    CORS(app, resources={r"*": {"origins": "*"}}, expose_headers=[NEXT_CURSOR_HEADER])
 
     @app.route('/')
     def index():
@@ -22,9 +28,17 @@ def create_app():
     app.register_blueprint(syllabus_bp, url_prefix="/syllabus")
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(revision_bp, url_prefix="/revision")
+    app.register_blueprint(metrics_bp, url_prefix="/metrics")
+
+    ensure_indexes()
+    status_scheduler.start()
     return app
 
-app = create_app()
+
+# Process con của pool ingest (spawn) chạy lại file này dưới tên __mp_main__:
+# không dựng app (index, scheduler, thread pool...) trong các process đó
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
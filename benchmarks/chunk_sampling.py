@@ -0,0 +1,77 @@
+# So sánh lấy mẫu chunk bằng $sample của Mongo với danh sách _id cache trong ChunkIdIndex,
+# theo số chunk của 1 syllabus.
+#   python -m benchmarks.chunk_sampling [--sizes 100 10000 100000] [--repeat 200]
+# Cần Mongo local (MONGO_URI, mặc định mongodb://localhost:27017); dữ liệu ghi vào DB nháp BENCH_DB_NAME.
+import argparse
+from typing import List, Optional
+
+from pymongo import ASCENDING
+
+from benchmarks.common import BENCH_DB_NAME, connect_mongo, measure, print_table
+from utils.chunk_index import ChunkIdIndex
+
+COLLECTION = "bench_chunks"
+OWNER_FIELD = "metadata.syllabus_id"
+INSERT_BATCH = 5000
+
+
+def seed(col, owner_id: str, n: int) -> None:
+    batch = []
+    for i in range(n):
+        batch.append({"text": f"chunk {i}", "metadata": {"syllabus_id": owner_id, "start_offset": i * 5000}})
+        if len(batch) >= INSERT_BATCH:
+            col.insert_many(batch)
+            batch = []
+    if batch:
+        col.insert_many(batch)
+
+
+def run(sizes: List[int], repeat: int, k: int) -> List[dict]:
+    client = connect_mongo()
+    col = client[BENCH_DB_NAME][COLLECTION]
+    col.drop()
+    col.create_index([(OWNER_FIELD, ASCENDING), ("_id", ASCENDING)])
+
+    rows = []
+    try:
+        for n in sizes:
+            owner_id = f"bench-{n}"
+            seed(col, owner_id, n)
+
+            sampler = ChunkIdIndex(col, OWNER_FIELD, as_str=True, strategy="sample")
+            cached = ChunkIdIndex(col, OWNER_FIELD, as_str=True, strategy="cache", ttl_seconds=10 ** 9)
+
+            def cold_load():
+                cached.invalidate(owner_id)
+                return cached.ids(owner_id)
+
+            # lần load đầu (cache miss) chậm theo n nên chạy ít lần hơn
+            cold_repeat = max(3, min(repeat, 2_000_000 // max(n, 1)))
+            results = {
+                "$sample": measure(lambda: sampler.sample(owner_id, k), repeat),
+                "cache (cold load)": measure(cold_load, cold_repeat),
+                "cache (warm)": measure(lambda: cached.sample(owner_id, k), repeat),
+            }
+            for strategy, stats in results.items():
+                rows.append(dict(stats, chunks=n, strategy=strategy))
+    finally:
+        col.drop()
+        client.close()
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark $sample vs cached chunk ids")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10_000, 100_000],
+                        help="number of chunks in the syllabus")
+    parser.add_argument("--repeat", type=int, default=200, help="timed runs per strategy")
+    parser.add_argument("-k", type=int, default=3, help="chunks drawn per question")
+    args = parser.parse_args(argv)
+
+    rows = run(args.sizes, args.repeat, args.k)
+    print_table(rows, ["chunks", "strategy", "mean_ms", "p50_ms", "p95_ms", "min_ms", "runs"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
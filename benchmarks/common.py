@@ -0,0 +1,64 @@
+# Tiện ích dùng chung cho các script benchmark: chạy từ thư mục gốc repo bằng
+#   python -m benchmarks.<tên script> [--help]
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+# DB nháp của benchmark (bị xoá sau mỗi lần chạy), luôn tách khỏi MONGO_DB_NAME của app
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "ainterview_bench")
+
+# config.py đọc biến môi trường lúc import: đặt mặc định trỏ tới Mongo local
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB_NAME", BENCH_DB_NAME)
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    """
+    Chạy fn repeat lần (sau warmup lần bỏ qua), trả về thời gian theo ms: mean/p50/p95/min.
+    """
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": samples[len(samples) // 2],
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_ms": samples[0],
+        "runs": repeat,
+    }
+
+
+def print_table(rows: List[dict], columns: List[str]) -> None:
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r.get(c)).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return "" if value is None else str(value)
+
+
+def connect_mongo():
+    """
+    Mở MongoClient tới MONGO_URI, thoát (mã 2) nếu không kết nối được.
+    """
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(os.environ["MONGO_URI"], serverSelectionTimeoutMS=3000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        print(f"Không kết nối được Mongo tại {os.environ['MONGO_URI']}: {e}", file=sys.stderr)
+        sys.exit(2)
+    return client
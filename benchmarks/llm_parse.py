@@ -0,0 +1,148 @@
+# Micro-benchmark parse output LLM: safe_parse_llm_output hiện tại so với cách parse cũ
+# (bỏ code fence + escape mọi backslash bằng regex rồi json.loads), trên các output đã ghi lại.
+#   python -m benchmarks.llm_parse [--samples FILE.jsonl] [--group kind|shape] [--repeat 2000]
+#   python -m benchmarks.llm_parse --from-cache N --db DB_NAME [--save FILE.jsonl]
+# Mặc định dùng benchmarks/data/llm_outputs.jsonl: ~250 output theo đúng các prompt của app
+# (câu hỏi đơn, batch 3 câu, revision, summary; 0.4-4 KB), gồm output chuẩn, bọc ```json,
+# LaTeX 1 backslash / đã escape, bị cắt giữa chừng (hết max_output_tokens), có lời dẫn ngoài fence
+# và dấu phẩy thừa. --from-cache đọc output thật từ collection llm_cache, --save ghi chúng ra JSONL
+# (kind được gán tự động) để thay/bổ sung file mẫu.
+import argparse
+import json
+import os
+import re
+from typing import List, Optional, Tuple
+
+from benchmarks.common import connect_mongo, measure, print_table
+from extensions.llm_parse import _LATEX_HINT, JSON_BACKEND, _strip_fence, safe_parse_llm_output
+
+DEFAULT_SAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_outputs.jsonl")
+
+
+def baseline_parse(raw: str) -> dict:
+    """
+    Bản sao cách parse trước đây của extensions/llm.py, để so sánh.
+    """
+    cleaned = re.sub(r"^```(?:json)?|```$", "", raw.strip(), flags=re.MULTILINE).strip()
+    cleaned = re.sub(r'(?<!\\)\\(?![\\"])', r'\\\\', cleaned)
+    return json.loads(cleaned)
+
+
+def classify(raw: str) -> str:
+    """
+    Gán kind cho output ghi lại từ llm_cache, cùng tên với kind trong file mẫu.
+    """
+    text = raw.strip()
+    fenced = "```" in text
+    if fenced and not text.startswith("```"):
+        return "prose_fenced"
+    body = _strip_fence(text) if fenced else text
+    try:
+        json.loads(body)
+        valid = True
+    except ValueError:
+        valid = False
+    if not valid and not body.rstrip().endswith(("}", "]")):
+        return "fenced_truncated" if fenced else "truncated"
+    if _LATEX_HINT.search(body) or (not valid and re.search(r"(?<!\\)\\[a-zA-Z]{2,}", body)):
+        return "latex_single"
+    if not valid:
+        return "trailing_comma" if re.search(r",\s*[}\]]", body) else "invalid"
+    if fenced:
+        return "fenced"
+    return "latex_escaped" if "\\\\" in body else "plain"
+
+
+def load_samples(path: str, group: str = "kind") -> List[Tuple[str, str]]:
+    """
+    JSONL, mỗi dòng {"kind": ..., "shape": ..., "raw": ...} (hoặc {"response": ...} như document llm_cache).
+    Trả về [(nhóm, raw)] với nhóm lấy theo field group.
+    """
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            doc = json.loads(line)
+            samples.append((doc.get(group) or f"line-{n + 1}", doc.get("raw") or doc.get("response") or ""))
+    return samples
+
+
+def load_from_cache(db_name: str, limit: int) -> List[Tuple[str, str]]:
+    client = connect_mongo()
+    try:
+        cursor = client[db_name]["llm_cache"].find({}, {"response": 1}).sort("created_at", -1).limit(limit)
+        return [(classify(doc["response"]), doc["response"]) for doc in cursor if doc.get("response")]
+    finally:
+        client.close()
+
+
+def save_samples(path: str, samples: List[Tuple[str, str]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for kind, raw in samples:
+            f.write(json.dumps({"kind": kind, "shape": "llm_cache", "raw": raw}, ensure_ascii=False) + "\n")
+
+
+def _try(parse, raw):
+    try:
+        return parse(raw)
+    except ValueError:
+        return None
+
+
+def run(samples: List[Tuple[str, str]], repeat: int) -> List[dict]:
+    rows = []
+    by_kind = {}
+    for kind, raw in samples:
+        by_kind.setdefault(kind, []).append(raw)
+
+    for kind, raws in by_kind.items():
+        new_results = [_try(safe_parse_llm_output, r) for r in raws]
+        old_results = [_try(baseline_parse, r) for r in raws]
+        for name, parse, results in (("current", safe_parse_llm_output, new_results),
+                                     ("baseline", baseline_parse, old_results)):
+            stats = measure(lambda: [_try(parse, r) for r in raws], repeat)
+            rows.append(dict(
+                stats,
+                kind=kind,
+                parser=name,
+                samples=len(raws),
+                us_per_parse=stats["mean_ms"] * 1000 / len(raws),
+                failed=sum(r is None for r in results),
+                differs=sum(a != b for a, b in zip(new_results, old_results)) if name == "current" else None,
+            ))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark LLM output parsing on recorded outputs")
+    parser.add_argument("--samples", default=DEFAULT_SAMPLES, help="JSONL file of recorded raw outputs")
+    parser.add_argument("--from-cache", type=int, default=0, metavar="N",
+                        help="use the N newest responses from the llm_cache collection instead")
+    parser.add_argument("--db", help="database holding llm_cache (required with --from-cache)")
+    parser.add_argument("--save", metavar="FILE", help="with --from-cache: also write the responses as JSONL")
+    parser.add_argument("--group", choices=["kind", "shape"], default="kind",
+                        help="group sample file rows by output kind or prompt shape")
+    parser.add_argument("--repeat", type=int, default=2000, help="timed runs per parser and kind")
+    args = parser.parse_args(argv)
+
+    if args.from_cache:
+        if not args.db:
+            parser.error("--from-cache requires --db")
+        samples = load_from_cache(args.db, args.from_cache)
+        if args.save:
+            save_samples(args.save, samples)
+    else:
+        samples = load_samples(args.samples, args.group)
+    if not samples:
+        print("No samples")
+        return 1
+
+    rows = run(samples, args.repeat)
+    print(f"json backend: {JSON_BACKEND}")
+    print_table(rows, ["kind", "parser", "samples", "us_per_parse", "p95_ms", "failed", "differs"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,92 @@
+# Độ trễ truy vấn BM25 (utils.retrieval.Bm25Index) theo số chunk của 1 syllabus/book,
+# trên văn bản tiếng Việt tổng hợp (từ vựng phân bố Zipf). Không cần Mongo.
+#   python -m benchmarks.retrieval [--sizes 100 1000 10000] [--words 800] [--queries 200]
+import argparse
+import random
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from benchmarks.common import measure, print_table
+from utils.retrieval import Bm25Index
+
+_ONSETS = ["", "b", "c", "ch", "d", "đ", "g", "gi", "h", "k", "kh", "l", "m", "n", "ng", "nh", "ph",
+           "qu", "r", "s", "t", "th", "tr", "v", "x"]
+_RHYMES = ["a", "à", "á", "ả", "ã", "ạ", "ai", "am", "an", "ang", "anh", "ao", "ăn", "âm", "ân", "ây",
+           "e", "em", "en", "ê", "ên", "i", "im", "in", "inh", "o", "oa", "oi", "ong", "ô", "ôi", "ông",
+           "ơ", "ơi", "u", "ui", "un", "ung", "ư", "ưa", "ương", "y"]
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    vocab = set()
+    while len(vocab) < size:
+        syllables = rng.choice((1, 2, 2, 3))
+        vocab.add(" ".join(rng.choice(_ONSETS) + rng.choice(_RHYMES) for _ in range(syllables)).replace(" ", "_"))
+    return sorted(vocab)
+
+
+def make_corpus(n_chunks: int, words_per_chunk: int, vocab: List[str], seed: int) -> List[tuple]:
+    rng = np.random.default_rng(seed)
+    # Zipf: vài từ rất phổ biến, đa số hiếm, giống văn bản thật
+    ranks = np.arange(1, len(vocab) + 1)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+    docs = []
+    for i in range(n_chunks):
+        words = rng.choice(len(vocab), size=words_per_chunk, p=probs)
+        docs.append((f"chunk-{i}", " ".join(vocab[w] for w in words)))
+    return docs
+
+
+def run(sizes: List[int], words: int, vocab_size: int, n_queries: int, k: int, seed: int) -> List[dict]:
+    rng = random.Random(seed)
+    vocab = make_vocabulary(vocab_size, rng)
+    rows = []
+    for n in sizes:
+        docs = make_corpus(n, words, vocab, seed)
+        t0 = time.perf_counter()
+        index = Bm25Index.build(docs)
+        build_s = time.perf_counter() - t0
+        stored = index.to_doc()
+        stored_bytes = sum(len(v) for v in stored.values() if isinstance(v, (bytes, bytearray)))
+        load = measure(lambda: Bm25Index.from_doc(stored), repeat=3)
+
+        # truy vấn = yêu cầu bổ sung của interview: vài từ. Từ phổ biến (đầu bảng Zipf) có posting dài nhất
+        frequent = vocab[:200]
+        query_sets = (
+            ("2 rare terms", [" ".join(rng.sample(vocab, 2)) for _ in range(n_queries)]),
+            ("2 frequent terms", [" ".join(rng.sample(frequent, 2)) for _ in range(n_queries)]),
+            ("10 mixed terms", [" ".join(rng.sample(frequent, 3) + rng.sample(vocab, 7)) for _ in range(n_queries)]),
+        )
+        for label, queries in query_sets:
+            it = iter(queries * 2)
+            stats = measure(lambda: index.top_k(next(it), k), repeat=n_queries, warmup=1)
+            rows.append(dict(
+                stats,
+                chunks=n,
+                query=label,
+                build_s=build_s,
+                load_ms=load["mean_ms"],
+                stored_kb=stored_bytes / 1024,
+            ))
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark BM25 query latency by corpus size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10_000], help="chunks per owner")
+    parser.add_argument("--words", type=int, default=800, help="words per chunk (~5000 characters)")
+    parser.add_argument("--vocab", type=int, default=30_000, help="vocabulary size")
+    parser.add_argument("--queries", type=int, default=200, help="timed queries per size and query type")
+    parser.add_argument("-k", type=int, default=10, help="top-k chunks per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rows = run(args.sizes, args.words, args.vocab, args.queries, args.k, args.seed)
+    print_table(rows, ["chunks", "query", "p50_ms", "p95_ms", "mean_ms", "build_s", "load_ms", "stored_kb"])
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
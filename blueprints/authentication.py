@@ -1,6 +1,7 @@
 from flask import Blueprint, request, jsonify
 import uuid
 import bcrypt
+from pymongo.errors import DuplicateKeyError
 from extensions.mongo import db
 auth_bp = Blueprint("auth", __name__)
 
@@ -36,7 +37,11 @@ def register():
         "role": role or "user",
     }
 
-    users_col.insert_one(new_user)
+    try:
+        users_col.insert_one(new_user)
+    except DuplicateKeyError:
+        # 2 request đăng ký cùng email chạy song song: unique index trên email chặn lại
+        return jsonify({"error": "Email already registered"}), 409
 
     # Trả về full user object
     return jsonify({
@@ -2,13 +2,31 @@ import datetime
 import json
 import uuid
 import time
-from typing import List, Dict
+import random
+from typing import List, Dict, Optional
 
 
 from flask import Blueprint, request, jsonify
-from bson import ObjectId
+from pymongo import ReturnDocument
+from config import QUESTION_BATCH_SIZE, QUESTION_QUEUE_LOW_WATERMARK, RETRIEVAL_CANDIDATES
 from extensions.llm import call_llm_json
-from utils.summarize import summarize
+from extensions.rate_limit import is_rate_limit_error, token_estimator
+from extensions.session_store import SessionStore, make_session_store
+from extensions.write_behind import answer_writer
+from utils.summarize import schedule_rolling_summary
+from utils.chunk_cache import chunk_text_cache, system_chunk_text_cache
+from utils.chunk_index import syllabus_chunk_index, book_chunk_index
+from utils.context_builder import build_prompt_context, prompt_stats
+from utils.coverage import draw_positions
+from utils.prefetch import question_prefetcher
+from utils.question_pool import question_pool
+from utils.retrieval import syllabus_retrieval, book_retrieval
+from utils.sse import sse_event, sse_response, llm_question_events
+from utils.json_stream import json_array_response, wants_stream
+from utils.pagination import (
+    PaginationError, date_range_filter, equality_filters, find_all, find_page, parse_fields,
+    with_next_cursor,
+)
 
 # ==== MongoDB setup ====
 from extensions.mongo import db
@@ -18,39 +36,26 @@ interviews_col = db["interviews"]
 interview_session_col = db["interview_session"]
 users_col = db["users"]
 system_curriculums_col = db["systemCurriculum"]
+syllabus_col = db["syllabus"]
 
 # ==== Blueprint ====
 interview_bp = Blueprint("interview", __name__)
 
-# ==== In-memory cache ====
-INTERVIEW_CACHE: Dict[str, dict] = {}
+# ==== Session store ====
+INTERVIEW_CACHE: SessionStore = make_session_store("interview")
+
+# Các field được lọc bằng query string ở API danh sách interview
+INTERVIEW_FILTER_FIELDS = ["status", "creator_id", "syllabus_id", "difficulty"]
 
 # ==== Utils ====
 def now_utc():
     return datetime.datetime.utcnow()
 
 def load_texts_by_chunk_ids(chunk_ids):
-    texts = []
-    for cid in chunk_ids:
-        try:
-            oid = ObjectId(cid)
-            doc = chunks_col.find_one({"_id": oid})
-            if doc:
-                texts.append({"cid": cid, "text": doc.get("text", "")})
-        except Exception:
-            continue
-    return texts
+    return chunk_text_cache.load(chunk_ids)
 
 def load_texts_by_system_chunk_ids(chunk_ids):
-    texts = []
-    for id in chunk_ids:
-        try:
-            doc = system_chunks_col.find_one({"_id": id})
-            if doc:
-                texts.append({"cid": id, "text": doc.get("content", "")})
-        except Exception:
-            continue
-    return texts
+    return system_chunk_text_cache.load(chunk_ids)
 
 
 def to_iso(dt):
@@ -74,37 +79,98 @@ def parse_iso_to_utc(dt_str: str):
         return None
 
 
-def select_chunks_randomly_by_syllabus(syllabus_id: str, k: int = 3) -> list[str]:
+def overlay_interview_status(iv: dict, now: datetime.datetime) -> None:
     """
-    Lấy ngẫu nhiên k chunk khác nhau từ collection chunks theo syllabus_id.
+    Chuẩn hoá interview để trả về client. Chỉ đọc: trạng thái trong DB do scheduler cập nhật,
+    ở đây chỉ hiển thị Available nếu đã tới giờ mà scheduler chưa kịp chạy.
     """
-    all_chunks = list(chunks_col.find(
-        {"metadata.syllabus_id": syllabus_id},
-        {"_id": 1}
-    ))
+    available_at = iv.get("available_at")
+    if isinstance(available_at, str):
+        available_at_dt = parse_iso_to_utc(available_at)
+    elif isinstance(available_at, datetime.datetime):
+        available_at_dt = available_at
+    else:
+        available_at_dt = None
 
-    if not all_chunks:
-        return []
+    if available_at_dt and now >= available_at_dt and iv.get("status") == "Unavailable":
+        iv["status"] = "Available"
 
-    sampled = random.sample(all_chunks, min(k, len(all_chunks)))
-    return [str(c["_id"]) for c in sampled]
+    if "available_at" in iv:
+        iv["available_at"] = to_iso(available_at_dt)
+    if "created_at" in iv:
+        iv["created_at"] = to_iso(iv.get("created_at"))
 
+def select_chunks_randomly_by_syllabus(syllabus_id: str, k: int = 3) -> list[str]:
+    """
+    Lấy ngẫu nhiên k chunk khác nhau từ collection chunks theo syllabus_id.
+    """
+    return syllabus_chunk_index.sample(syllabus_id, k)
 
-from typing import List
 
 def select_chunks_randomly_by_system_syllabus(book_id: str, k: int = 3) -> list[str]:
     """
     Lấy ngẫu nhiên k chunk khác nhau từ collection system_book_chunks theo book_id.
     """
-    all_chunks = list(system_chunks_col.find(
-        {"bookId": book_id},
-        {"_id": 1}
-    ))
+    return book_chunk_index.sample(book_id, k)
 
-    if not all_chunks:
+
+def select_chunks_for_question(interview: dict, syllabus_id: str, additional: str, system: bool,
+                               k: int = 3) -> list:
+    """
+    Chọn k chunk cho câu hỏi tiếp theo, không lặp lại chunk đã dùng cho tới khi phủ hết syllabus.
+    Chunk liên quan tới yêu cầu bổ sung (BM25 cục bộ) được ưu tiên nếu còn chưa dùng.
+    Trạng thái phủ lưu ở interview["coverage"] và trong session store nếu có session id.
+    """
+    chunk_index = book_chunk_index if system else syllabus_chunk_index
+    retrieval = book_retrieval if system else syllabus_retrieval
+
+    if chunk_index.strategy == "sample":
+        # không giữ danh sách _id thì không theo dõi độ phủ được, chỉ lấy mẫu ngẫu nhiên
+        return chunk_index.sample(syllabus_id, k)
+
+    ids = chunk_index.ids(syllabus_id)
+    if not ids:
         return []
-    sampled = random.sample(all_chunks, min(k, len(all_chunks)))
-    return [c["_id"] for c in sampled]
+
+    preferred = retrieval.top_positions(syllabus_id, additional or "", RETRIEVAL_CANDIDATES, len(ids))
+    session_id = interview.get("id")
+    state = interview.get("coverage")
+    while True:
+        current = INTERVIEW_CACHE.get(session_id) if session_id else None
+        if current is None:
+            state, positions = draw_positions(state, len(ids), k, preferred)
+            break
+        # request và prefetch cùng rút: chỉ ghi nếu không ai ghi chen giữa, thua thì đọc lại và rút lại
+        # (mỗi lần thua nghĩa là bên kia đã ghi xong nên vòng lặp luôn tiến).
+        # Đọc version trước coverage: session của MemorySessionStore là object dùng chung.
+        version = current.get("coverage_version", 0)
+        state, positions = draw_positions(current.get("coverage"), len(ids), k, preferred)
+        if INTERVIEW_CACHE.replace_coverage(session_id, state, version):
+            break
+
+    interview["coverage"] = state
+    return [ids[p] for p in positions]
+
+
+def question_output_format(count: int, source_str: str):
+    """
+    Trả về (câu nhiệm vụ, mô tả JSON output) cho 1 câu hỏi hoặc 1 batch count câu hỏi.
+    """
+    item_str = f"""{{
+  "question": "...",
+  "question_type": "...",
+  "answer": "...",
+  "options": [...],  # chỉ nếu question_type = "multiple_choice"
+  "source": {source_str}
+}}"""
+    if count <= 1:
+        return "Sinh ra 1 câu hỏi phỏng vấn mới", f"Trả về JSON object:\n{item_str}"
+
+    item_str = "\n".join("    " + line for line in item_str.splitlines())
+    return (
+        f"Sinh ra {count} câu hỏi phỏng vấn mới, khác nhau về ý, rải đều trên các chunk,",
+        f"Trả về JSON object:\n{{\n  \"questions\": [  # đúng {count} phần tử\n{item_str},\n    ...\n  ]\n}}",
+    )
 
 
 def prompt_generate_question_with_session(
@@ -113,10 +179,16 @@ def prompt_generate_question_with_session(
     context_formatted: str,
     difficulty: str,
     types: List[str],
-    additional: str
+    additional: str,
+    count: int = 1
 ) -> str:
     type_str = " hoặc ".join(types)
     recent_qa_str = json.dumps(recent_qa, ensure_ascii=False, indent=2)
+    task_str, output_str = question_output_format(count, """{
+    "chunk_id": "...",
+    "start": "...",  # offset của kí tự đầu tiên dùng làm nguồn câu hỏi trong chunk
+    "end": "..."     # offset của kí tự cuối cùng dùng làm nguồn câu hỏi trong chunk
+  }""")
 
     return f"""
 Bạn là giảng viên đang phỏng vấn sinh viên để kiểm tra. Hãy đọc thông tin buổi phỏng vấn sau:
@@ -124,26 +196,22 @@ Bạn là giảng viên đang phỏng vấn sinh viên để kiểm tra. Hãy đ
 [Context chunks (kèm chunk_id)]
 \"\"\"{context_formatted}\"\"\"
 
+[Session Summary - tóm tắt tiến trình tới hiện tại]
+{summary}
+
+[Recent Q&A - vài lượt gần nhất]
+{recent_qa_str}
+
 Nhiệm vụ:
-Sinh ra 1 câu hỏi phỏng vấn mới dạng {type_str}, độ khó Bloom: {difficulty}
+{task_str} dạng {type_str}, độ khó Bloom: {difficulty}
 - Câu hỏi phải hoàn toàn dựa trên nội dung trong [Content] và không dùng kiến thức bên ngoài.
 - Không tạo câu hỏi tổng quát hay kiến thức phổ biến nếu chunk không nhắc tới.
 Yêu cầu bổ sung (nếu có): {additional}
 
-Trả về JSON object:
-{{
-  "question": "...",
-  "question_type": "...",
-  "answer": "...",
-  "options": [...],  # chỉ nếu question_type = "multiple_choice"
-  "source": {{
-    "chunk_id": "...",
-    "start": "...",  # offset của kí tự đầu tiên dùng làm nguồn câu hỏi trong chunk
-    "end": "..."     # offset của kí tự cuối cùng dùng làm nguồn câu hỏi trong chunk
-  }}
-}}
+{output_str}
 
 Quy tắc:
+- Không lặp lại ý/câu hỏi đã có trong summary và recent Q&A.
 - Nếu question_type != "multiple_choice" thì bỏ trường "options".
 - Không sinh những câu hỏi "Theo tài liệu nhận được", "Dựa trên ví dụ", "Được đề câp trong tài liệu" hoặc tương tự
 - Chỉ trả JSON thuần, không thêm bất kì gì khác, đặc biệt là không markdown code block (```json ... ```), không sử dụng Latex.
@@ -159,10 +227,16 @@ def prompt_generate_question_from_system_curriculum_with_session(
     context_formatted: str,
     difficulty: str,
     types: List[str],
-    additional: str
+    additional: str,
+    count: int = 1
 ) -> str:
     type_str = " hoặc ".join(types)
     recent_qa_str = json.dumps(recent_qa, ensure_ascii=False, indent=2)
+    task_str, output_str = question_output_format(count, """{
+    "chunk_id": "",
+    "start": "...",  # thứ tự text bắt đầu được chọn để sinh câu hỏi, kiểu int
+    "end": "..."     # thứ tự text kết thúc được chọn để sinh câu hỏi, kiểu int
+  }""")
 
     return f"""
 Bạn là giảng viên đang phỏng vấn sinh viên để kiểm tra kiến thức. Chỉ bạn được nhận {subject} Hãy đọc thông tin buổi phỏng vấn sau:
@@ -170,26 +244,22 @@ Bạn là giảng viên đang phỏng vấn sinh viên để kiểm tra kiến t
 [Content]
 \"\"\"{context_formatted}\"\"\"
 
+[Session Summary - tóm tắt tiến trình tới hiện tại]
+{summary}
+
+[Recent Q&A - vài lượt gần nhất]
+{recent_qa_str}
+
 Nhiệm vụ:
-Sinh ra 1 câu hỏi phỏng vấn mới dạng {type_str}, độ khó Bloom: {difficulty}
+{task_str} dạng {type_str}, độ khó Bloom: {difficulty}
 - Câu hỏi phải hoàn toàn dựa trên nội dung trong [Content], liên quan đến môn học trong {subject} và không dùng kiến thức bên ngoài.
 - Không tạo câu hỏi tổng quát hay kiến thức phổ biến nếu chunk không nhắc tới.
 Yêu cầu bổ sung (nếu có): {additional}
 
-Trả về JSON object:
-{{
-  "question": "...",
-  "question_type": "...",
-  "answer": "...",
-  "options": [...],  # chỉ nếu question_type = "multiple_choice"
-  "source": {{
-    "chunk_id": "",
-    "start": "...",  # thứ tự text bắt đầu được chọn để sinh câu hỏi, kiểu int
-    "end": "..."     # thứ tự text kết thúc được chọn để sinh câu hỏi, kiểu int
-  }}
-}}
+{output_str}
 
 Quy tắc:
+- Không lặp lại ý/câu hỏi đã có trong summary và recent Q&A.
 - Nếu question_type != "multiple_choice" thì bỏ trường "options".
 - Không sinh những câu hỏi "Theo tài liệu nhận được", "Dựa trên ví dụ", "Được đề câp trong tài liệu" hoặc tương tự
 - Chỉ trả JSON thuần, không thêm bất kì gì khác, đặc biệt là không markdown code block (```json ... ```), không sử dụng Latex.
@@ -198,6 +268,247 @@ Quy tắc:
 - Người phỏng vấn không được đọc tài liệu mà AI được nhận, không sinh ra những câu hỏi dựa trên ví dụ cụ thể hay theo thông tin được đọc trong văn bản được nhận
 """.strip()
 
+# ==== Question generation ====
+class QuestionGenerationError(Exception):
+    def __init__(self, message: str, status_code: int = 404):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def pick_question_types(question_type, count: int = 1) -> List[str]:
+    # Chọn ngẫu nhiên 1 loại question_type, batch nhiều câu thì cho phép mọi loại
+    if isinstance(question_type, list) and question_type:
+        return list(question_type) if count > 1 else [random.choice(question_type)]
+    elif isinstance(question_type, str):
+        return [question_type]
+    return []
+
+
+def interview_config(db_interview: dict) -> dict:
+    """
+    Snapshot phần cấu hình interview cần để sinh câu hỏi, không đổi trong suốt session.
+    """
+    config = {
+        "syllabus_id": db_interview.get("syllabus_id"),
+        "difficulty": db_interview.get("difficulty"),
+        "questionType": db_interview.get("questionType"),
+        "additional": db_interview.get("additional", ""),
+        "isSystemCurriculum": bool(db_interview.get("isSystemCurriculum")),
+        "subject_title": None,
+        "chunk_owner_id": db_interview.get("syllabus_id"),
+    }
+    if config["isSystemCurriculum"]:
+        subject = system_curriculums_col.find_one({"uuid": config["syllabus_id"]}, {"title": 1})
+        if subject:
+            config["subject_title"] = subject.get("title")
+    else:
+        # syllabus upload trùng file dùng chung chunk của syllabus gốc
+        syllabus = syllabus_col.find_one({"_id": config["syllabus_id"]}, {"chunk_owner_id": 1})
+        if syllabus and syllabus.get("chunk_owner_id"):
+            config["chunk_owner_id"] = syllabus["chunk_owner_id"]
+    return config
+
+
+def load_interview_config(interview_id: str) -> Optional[dict]:
+    db_interview = interviews_col.find_one({"_id": interview_id})
+    return interview_config(db_interview) if db_interview else None
+
+
+def build_question_prompt(interview: dict, system: bool, count: int = 1,
+                          types: Optional[List[str]] = None) -> str:
+    """
+    Dựng prompt sinh count câu hỏi cho 1 session (syllabus người dùng hoặc giáo trình hệ thống).
+    """
+    config = interview.get("config") or load_interview_config(interview.get("interview_id"))
+    if not config:
+        raise QuestionGenerationError("Interview not found in DB")
+
+    difficulty = config.get("difficulty")
+    types = types or pick_question_types(config.get("questionType"), count)
+    additional = config.get("additional", "")
+    syllabus_id = config.get("chunk_owner_id") or config.get("syllabus_id")
+
+    if system:
+        if not config.get("subject_title"):
+            raise QuestionGenerationError("Curriculum not found")
+        selected_chunk_ids = select_chunks_for_question(interview, syllabus_id, additional, system, 3)
+        texts = load_texts_by_system_chunk_ids(selected_chunk_ids) if selected_chunk_ids else []
+    else:
+        selected_chunk_ids = select_chunks_for_question(interview, syllabus_id, additional, system, 3)
+        texts = load_texts_by_chunk_ids(selected_chunk_ids) if selected_chunk_ids else []
+
+    if not texts:
+        raise QuestionGenerationError("No valid chunks found")
+
+    def render(context_formatted: str, summary: str, recent_qa: List[Dict]) -> str:
+        if system:
+            return prompt_generate_question_from_system_curriculum_with_session(
+                summary=summary,
+                recent_qa=recent_qa,
+                context_formatted=context_formatted,
+                difficulty=difficulty,
+                types=types,
+                additional=additional,
+                subject=config["subject_title"],
+                count=count,
+            )
+        return prompt_generate_question_with_session(
+            summary=summary,
+            recent_qa=recent_qa,
+            context_formatted=context_formatted,
+            difficulty=difficulty,
+            types=types,
+            additional=additional,
+            count=count,
+        )
+
+    # Xếp chunk + summary + recent Q&A vừa ngân sách token (phần template để trống làm overhead)
+    ctx = build_prompt_context(
+        texts,
+        summary=interview.get("summary", ""),
+        recent_qa=interview.get("qa_log", [])[-4:],
+        overhead_tokens=token_estimator.count(render("", "", [])),
+    )
+    prompt = render(ctx["context_formatted"], ctx["summary"], ctx["recent_qa"])
+    prompt_stats.record(token_estimator.count(prompt), ctx["truncated"])
+    return prompt
+
+
+def generate_questions(interview: dict, system: bool, count: int = QUESTION_BATCH_SIZE,
+                       types: Optional[List[str]] = None) -> List[dict]:
+    """
+    Sinh 1 batch câu hỏi trong 1 lần gọi LLM. Mỗi phần tử: {"question": obj, "prompt": prompt}.
+    """
+    prompt = build_question_prompt(interview, system, count, types)
+    obj = call_llm_json(prompt)
+
+    if count > 1:
+        questions = obj.get("questions") if isinstance(obj, dict) else obj
+        questions = [q for q in (questions or []) if isinstance(q, dict) and q.get("question")]
+    else:
+        questions = [obj]
+
+    if not questions:
+        raise ValueError("LLM returned no questions")
+    return [{"question": q, "prompt": prompt} for q in questions]
+
+
+def question_kind(system: bool) -> str:
+    return "system" if system else "syllabus"
+
+
+def prefetch_next_question(session_id: str, system: bool, replace: bool = False) -> None:
+    """
+    Sinh trước batch câu hỏi tiếp theo ở background khi hàng đợi của session
+    xuống tới low watermark. replace=True để bỏ batch đang sinh dở (vd: summary vừa đổi).
+    """
+    interview = INTERVIEW_CACHE.get(session_id)
+    if not interview or interview.get("use_pool"):
+        return
+    if len(interview.get("question_queue", [])) > QUESTION_QUEUE_LOW_WATERMARK:
+        return
+
+    snapshot = {
+        "id": session_id,
+        "interview_id": interview.get("interview_id"),
+        "config": interview.get("config"),
+        "summary": interview.get("summary", ""),
+        "qa_log": list(interview.get("qa_log", [])),
+    }
+    question_prefetcher.schedule(
+        session_id,
+        question_kind(system),
+        lambda: generate_questions(snapshot, system),
+        replace=replace,
+    )
+
+
+def schedule_question_pool(interview_id: str, config: dict) -> None:
+    """
+    Sinh pool câu hỏi dùng chung ở lần /start đầu tiên của interview (nếu pool được bật).
+    """
+    if not question_pool.enabled:
+        return
+    question_type = config.get("questionType")
+    pool_types = question_type if isinstance(question_type, list) else [question_type]
+    pool_session = {"interview_id": interview_id, "config": config}
+    system = config["isSystemCurriculum"]
+    question_pool.schedule_build(
+        interview_id,
+        config.get("difficulty"),
+        pool_types,
+        lambda qtype, count: [
+            item["question"] for item in
+            generate_questions(pool_session, system, count, [qtype])
+        ],
+    )
+
+
+def llm_error_response(e: Exception):
+    if is_rate_limit_error(e):
+        return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
+    return jsonify({"error": "LLM error", "detail": str(e)}), 500
+
+
+def pop_ready_question(session_id: str, interview: dict, system: bool):
+    """
+    Lấy câu hỏi có sẵn: ưu tiên hàng đợi của session, tới pool của interview,
+    sau đó tới batch prefetch. Trả None nếu không có, khi đó caller tự sinh.
+    """
+    item = INTERVIEW_CACHE.pop_question(session_id)
+
+    if item is None and interview.get("use_pool"):
+        interview_id = interview.get("interview_id")
+        pooled = question_pool.draw(interview_id, session_id)
+        if pooled is not None:
+            return {"question": pooled, "prompt": None}
+        # pool đã cạn với session này thì quay về sinh trực tiếp
+        if not question_pool.is_building(interview_id):
+            INTERVIEW_CACHE.update(session_id, {"use_pool": False})
+
+    if item is not None:
+        question_prefetcher.record_queue_hit()
+    else:
+        batch = question_prefetcher.take(session_id, question_kind(system))
+        if batch:
+            item = batch[0]
+            INTERVIEW_CACHE.push_questions(session_id, batch[1:])
+
+    if item is not None:
+        prefetch_next_question(session_id, system)
+    return item
+
+
+def next_question_for_session(session_id: str, interview: dict, system: bool):
+    """
+    Trả (question, prompt): lấy từ hàng đợi/prefetch nếu có, ngược lại sinh đồng bộ 1 batch.
+    """
+    item = pop_ready_question(session_id, interview, system)
+    if item is None:
+        batch = generate_questions(interview, system)
+        item = batch[0]
+        INTERVIEW_CACHE.push_questions(session_id, batch[1:])
+        prefetch_next_question(session_id, system)
+    return item["question"], item["prompt"]
+
+def flush_evicted_session(interview: dict) -> None:
+    """
+    Lưu lại session bị bỏ dở (hết idle TTL / vượt quota) trước khi bị xoá khỏi store.
+    """
+    session_id = interview.get("id")
+    question_prefetcher.cancel(session_id)
+    answer_writer.flush("interview_session", session_id)
+    interview_session_col.update_one(
+        {"_id": session_id},
+        {"$set": {
+            "point": interview.get("point", 0.0),
+            "feedback": interview.get("feedback", ""),
+            "evicted_at": now_utc(),
+        }}
+    )
+
+INTERVIEW_CACHE.on_evict = flush_evicted_session
+
 # ==== Routes ====
 
 @interview_bp.route("/create", methods=["POST"])
@@ -293,31 +604,36 @@ def start_interview():
         "end_time": None,
     })
 
-    interviews_col.update_one(
+    # Cập nhật participant và lấy cấu hình interview trong 1 round trip
+    db_interview = interviews_col.find_one_and_update(
         {"_id": interview_id},
-        {"$addToSet": {"participant_ids": session_id}}
+        {"$addToSet": {"participant_ids": session_id}},
+        projection={"participant_ids": 0},
+        return_document=ReturnDocument.AFTER,
     )
+    config = interview_config(db_interview) if db_interview else None
+    if config:
+        schedule_question_pool(interview_id, config)
 
-
-    INTERVIEW_CACHE[session_id] = {
+    INTERVIEW_CACHE.create({
         "id": session_id,
         "interview_id": interview_id,
         "participant_id": participant_id,
-        "questions": [],
-        "answers": [],
         "qa_log": [],
         "summary": "",
-        "cursor": 0,
-        "chunk_ids": []
-    }
+        "coverage": None,
+        "config": config,
+        "is_system_curriculum": bool(config and config["isSystemCurriculum"]),
+        "question_queue": [],
+        "use_pool": question_pool.enabled and question_pool.has_pool(interview_id),
+    })
+    prefetch_next_question(session_id, bool(config and config["isSystemCurriculum"]))
 
     return jsonify({
         "session_id": session_id,
     }), 200
 
 
-import random
-
 @interview_bp.route("/next_question", methods=["POST"])
 def next_question():
     data = request.get_json(force=True)
@@ -330,54 +646,12 @@ def next_question():
     if not interview:
         return jsonify({"error": "Interview not started or not in cache"}), 404
 
-    interview_id = interview.get("interview_id")
-    db_interview = interviews_col.find_one({"_id": interview_id})
-    if not db_interview:
-        return jsonify({"error": "Interview not found in DB"}), 404
-
-    difficulty = db_interview.get("difficulty")
-    question_type = db_interview.get("questionType")
-    additional = db_interview.get("additional", "")
-
-    # --------------------
-    # Chọn ngẫu nhiên 1 loại question_type
-    if isinstance(question_type, list) and question_type:
-        types = [random.choice(question_type)]
-    elif isinstance(question_type, str):
-        types = [question_type]
-    else:
-        types = []
-
-    # --------------------
-    syllabus_id = db_interview.get("syllabus_id")
-    selected_chunk_ids = select_chunks_randomly_by_syllabus(syllabus_id, 3)
-    if not selected_chunk_ids:
-        return jsonify({"error": "No valid chunks found"}), 404
-
-    texts = load_texts_by_chunk_ids(selected_chunk_ids)
-    if not texts:
-        return jsonify({"error": "No valid chunks found"}), 404
-
-    context_formatted = "\n\n".join([f"[{t['cid']}]: {t['text']}" for t in texts])
-    summary = interview.get("summary", "")
-    recent_qa = interview.get("qa_log", [])[-4:]
-
-    prompt = prompt_generate_question_with_session(
-        summary=summary,
-        recent_qa=recent_qa,
-        context_formatted=context_formatted,
-        difficulty=difficulty,
-        types=types,
-        additional=additional,
-    )
-
     try:
-        obj = call_llm_json(prompt)
+        obj, prompt = next_question_for_session(session_id, interview, system=False)
+    except QuestionGenerationError as e:
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
-        if "429" in str(e) or "RATE_LIMIT_EXCEEDED" in str(e):
-            return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
-        else:
-            return jsonify({"error": "LLM error", "detail": str(e)}), 500
+        return llm_error_response(e)
 
     return jsonify({
         "result": obj,
@@ -397,60 +671,52 @@ def next_question_system():
     if not interview:
         return jsonify({"error": "Interview not started or not in cache"}), 404
 
-    interview_id = interview.get("interview_id")
-    db_interview = interviews_col.find_one({"_id": interview_id})
-    if not db_interview:
-        return jsonify({"error": "Interview not found in DB"}), 404
+    try:
+        obj, _ = next_question_for_session(session_id, interview, system=True)
+    except QuestionGenerationError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    except Exception as e:
+        return llm_error_response(e)
 
-    subject = system_curriculums_col.find_one({"uuid": db_interview["syllabus_id"]})
+    return jsonify(obj), 200
 
-    difficulty = db_interview.get("difficulty")
-    question_type = db_interview.get("questionType")
-    additional = db_interview.get("additional", "")
 
-    # --------------------
-    # Chọn ngẫu nhiên 1 loại question_type
-    if isinstance(question_type, list) and question_type:
-        types = [random.choice(question_type)]
-    elif isinstance(question_type, str):
-        types = [question_type]
-    else:
-        types = []
+@interview_bp.route("/next_question_stream", methods=["POST"])
+def next_question_stream():
+    """
+    Bản SSE của next_question: event "delta" chứa phần text câu hỏi vừa sinh,
+    event "result" chứa object hoàn chỉnh (answer, options, source).
+    """
+    data = request.get_json(force=True)
+    session_id = data.get("session_id")
 
-    # --------------------
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
 
-    syllabus_id = db_interview.get("syllabus_id")
-    selected_chunk_ids = select_chunks_randomly_by_system_syllabus(syllabus_id, 3)
-    if not selected_chunk_ids:
-        return jsonify({"error": "No valid chunks found"}), 404
+    interview = INTERVIEW_CACHE.get(session_id)
+    if not interview:
+        return jsonify({"error": "Interview not started or not in cache"}), 404
 
-    texts = load_texts_by_system_chunk_ids(selected_chunk_ids)
-    if not texts:
-        return jsonify({"error": "No valid chunks found"}), 404
-
-    context_formatted = "\n\n".join([f"[{t['cid']}]: {t['text']}" for t in texts])
-    summary = interview.get("summary", "")
-    recent_qa = interview.get("qa_log", [])[-4:]
-
-    prompt = prompt_generate_question_from_system_curriculum_with_session(
-        summary=summary,
-        recent_qa=recent_qa,
-        context_formatted=context_formatted,
-        difficulty=difficulty,
-        types=types,
-        additional=additional,
-        subject=subject["title"],
-    )
+    system = interview.get("is_system_curriculum", False)
+    ready = pop_ready_question(session_id, interview, system)
+    prompt = None
+    if ready is None:
+        try:
+            prompt = build_question_prompt(interview, system)
+        except QuestionGenerationError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        # câu hiện tại được stream, batch cho các câu sau sinh song song
+        prefetch_next_question(session_id, system)
 
-    try:
-        obj = call_llm_json(prompt)
-    except Exception as e:
-        if "429" in str(e) or "RATE_LIMIT_EXCEEDED" in str(e):
-            return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
-        else:
-            return jsonify({"error": "LLM error", "detail": str(e)}), 500
+    def events():
+        if ready is not None:
+            obj = ready["question"]
+            yield sse_event("delta", {"text": obj.get("question", "")})
+            yield sse_event("result", obj)
+            return
+        yield from llm_question_events(prompt)
 
-    return jsonify(obj), 200
+    return sse_response(events())
 
 
 @interview_bp.route("/answer", methods=["POST"])
@@ -467,34 +733,25 @@ def answer():
     if not interview:
         return jsonify({"error": "Interview not found"}), 404
 
-    qa_item = {
-        "question": q,
-        "answer": a,
-    }
-
-    interview["qa_log"].append(qa_item)
-    interview["questions"].append(q)
-    interview["answers"].append(a)
-
+    qa_len = INTERVIEW_CACHE.append_answer(session_id, q, a)
+    if qa_len is None:
+        return jsonify({"error": "Interview not found"}), 404
+    answer_writer.append("interview_session", session_id, q, a)
 
-    qa_log = interview.get("qa_log", [])
-    summary = interview.get("summary", "")
-    summary_updated = False
+    system = interview.get("is_system_curriculum", False)
+    prefetch_next_question(session_id, system)
 
-    if len(qa_log) > 6:
-        new_pairs = qa_log[-6:]
-        try:
-            new_summary = summarize(summary, new_pairs)
-            keep_tail = qa_log[-4:]
-            interview["summary"] = new_summary
-            interview["qa_log"] = keep_tail
-            summary_updated = True
-        except Exception as e:
-            print("Summarize error:", e)
+    # Tóm tắt chạy ở background, xong thì prefetch lại với summary mới
+    summary_scheduled = schedule_rolling_summary(
+        INTERVIEW_CACHE,
+        session_id,
+        qa_len,
+        on_done=lambda: prefetch_next_question(session_id, system, replace=True),
+    )
 
     updated = {"status": "saved"}
-    if summary_updated:
-        updated["summary_updated"] = True
+    if summary_scheduled:
+        updated["summary_scheduled"] = True
 
     return jsonify(updated), 200
 
@@ -506,22 +763,22 @@ def end():
     if not session_id:
         return jsonify({"error": "session_id is required"}), 400
 
-    interview = INTERVIEW_CACHE.get(session_id)
+    interview = INTERVIEW_CACHE.delete(session_id)
     if not interview:
         return jsonify({"error": "Interview not found"}), 404
 
+    # câu trả lời đã được ghi dần, /end chỉ flush phần còn chờ và chốt kết quả
+    answer_writer.flush("interview_session", session_id)
     interview_session_col.update_one(
         {"_id": session_id},
         {"$set": {
-            "questions": interview.get("questions", []),
-            "answers": interview.get("answers", []),
             "point": interview.get("point", 0.0),
             "feedback": interview.get("feedback", ""),
             "end_time": now_utc(),
         }}
     )
 
-    INTERVIEW_CACHE.pop(session_id, None)
+    question_prefetcher.cancel(session_id)
 
     result = {
         "status": "finished",
@@ -529,6 +786,23 @@ def end():
     }
     return jsonify(result), 200
 
+@interview_bp.route("/pool_status/<interview_id>", methods=["GET"])
+def get_pool_status(interview_id):
+    """
+    Mức độ sinh sẵn của pool câu hỏi dùng chung cho interview
+    """
+    try:
+        status = question_pool.status(interview_id)
+        if not status:
+            return jsonify({"error": "Question pool not found"}), 404
+
+        status["interview_id"] = status.pop("_id")
+        status["updated_at"] = to_iso(status.get("updated_at"))
+        return jsonify(status), 200
+
+    except Exception as e:
+        return jsonify({"error": "Server error", "detail": str(e)}), 500
+
 @interview_bp.route("/user_interviews/<user_id>", methods=["GET"])
 def get_user_interviews(user_id):
     try:
@@ -542,38 +816,24 @@ def get_user_interviews(user_id):
         if not interview_ids:
             return jsonify([]), 200
 
-        # query trực tiếp từ bảng interviews
-        interviews = list(interviews_col.find({"_id": {"$in": interview_ids}}))
+        # query trực tiếp từ bảng interviews, có phân trang/lọc
+        query = {"_id": {"$in": interview_ids}}
+        query.update(equality_filters(request.args, INTERVIEW_FILTER_FIELDS))
+        query.update(date_range_filter(request.args, "created_at"))
+        interviews, next_cursor = find_page(
+            interviews_col, query, request.args,
+            projection=parse_fields(request.args),
+        )
 
         now = now_utc()
-        updated_ids = []
 
         for iv in interviews:
-            available_at = iv.get("available_at")
-            status = iv.get("status", "Unavailable")
-
-            # parse datetime
-            if isinstance(available_at, str):
-                available_at_dt = parse_iso_to_utc(available_at)
-            elif isinstance(available_at, datetime.datetime):
-                available_at_dt = available_at
-            else:
-                available_at_dt = None
-
-            # update status nếu tới giờ
-            if available_at_dt and now >= available_at_dt and status == "Unavailable":
-                interviews_col.update_one(
-                    {"_id": iv["_id"]},
-                    {"$set": {"status": "Available"}}
-                )
-                iv["status"] = "Available"
-                updated_ids.append(iv["_id"])
-
-            iv["available_at"] = to_iso(available_at_dt)
-            iv["created_at"] = to_iso(iv.get("created_at"))
-
-        return jsonify(interviews), 200
+            overlay_interview_status(iv, now)
+
+        return with_next_cursor(jsonify(interviews), next_cursor), 200
 
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Server error", "detail": str(e)}), 500
 
@@ -581,35 +841,25 @@ def get_user_interviews(user_id):
 def get_all_interviews():
     try:
         now = now_utc()
-        interviews = list(interviews_col.find({}))
-        updated_ids = []
+        query = equality_filters(request.args, INTERVIEW_FILTER_FIELDS)
+        query.update(date_range_filter(request.args, "created_at"))
+        projection = parse_fields(request.args)
+
+        if wants_stream(request.args):
+            return json_array_response(
+                find_all(interviews_col, query, request.args, projection),
+                transform=lambda iv: overlay_interview_status(iv, now),
+            )
+
+        interviews, next_cursor = find_page(interviews_col, query, request.args, projection)
 
         for iv in interviews:
-            available_at = iv.get("available_at")
-            status = iv.get("status", "Unavailable")
-
-            # parse datetime
-            if isinstance(available_at, str):
-                available_at_dt = parse_iso_to_utc(available_at)
-            elif isinstance(available_at, datetime.datetime):
-                available_at_dt = available_at
-            else:
-                available_at_dt = None
-
-            # cập nhật trạng thái nếu đến giờ
-            if available_at_dt and now >= available_at_dt and status == "Unavailable":
-                interviews_col.update_one(
-                    {"_id": iv["_id"]},
-                    {"$set": {"status": "Available"}}
-                )
-                iv["status"] = "Available"
-                updated_ids.append(iv["_id"])
-
-            iv["available_at"] = to_iso(available_at_dt)
-            iv["created_at"] = to_iso(iv.get("created_at"))
-
-        return jsonify(interviews), 200
+            overlay_interview_status(iv, now)
+
+        return with_next_cursor(jsonify(interviews), next_cursor), 200
 
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Server error", "detail": str(e)}), 500
 
@@ -645,19 +895,31 @@ def get_sessions_by_interview(interview_id):
     Lấy tất cả các session thuộc về 1 interview cụ thể
     """
     try:
-        sessions = list(interview_session_col.find({"interview_id": interview_id}))
+        query = {"interview_id": interview_id}
+        query.update(equality_filters(request.args, ["participant_id"]))
+        query.update(date_range_filter(request.args, "start_time"))
+        projection = parse_fields(request.args)
+
+        # session có cả qa_log nên stream từng document thay vì dựng cả list
+        if wants_stream(request.args):
+            return json_array_response(find_all(interview_session_col, query, request.args, projection))
+
+        sessions, next_cursor = find_page(interview_session_col, query, request.args, projection)
         if not sessions:
             return jsonify([]), 200
 
         for s in sessions:
             s["_id"] = str(s["_id"])
-            s["interview_id"] = str(s["interview_id"])
+            if "interview_id" in s:
+                s["interview_id"] = str(s["interview_id"])
             if "start_time" in s and isinstance(s["start_time"], datetime.datetime):
                 s["start_time"] = to_iso(s["start_time"])
             if "end_time" in s and isinstance(s["end_time"], datetime.datetime):
                 s["end_time"] = to_iso(s["end_time"])
 
-        return jsonify(sessions), 200
+        return with_next_cursor(jsonify(sessions), next_cursor), 200
 
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Server error", "detail": str(e)}), 500
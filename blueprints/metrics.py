@@ -0,0 +1,89 @@
+from flask import Blueprint, jsonify
+
+from blueprints.interview import INTERVIEW_CACHE
+from blueprints.revision import REVISION_CACHE
+from extensions.llm import LLM
+from extensions.llm_cache import llm_cache
+from extensions.llm_parse import parse_stats
+from extensions.scheduler import status_scheduler
+from extensions.write_behind import answer_writer
+from utils.chunk_cache import chunk_text_cache, system_chunk_text_cache
+from utils.chunk_index import syllabus_chunk_index, book_chunk_index
+from utils.context_builder import prompt_stats
+from utils.ingestion import ingestion_queue
+from utils.prefetch import question_prefetcher
+from utils.retrieval import syllabus_retrieval, book_retrieval
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/prefetch", methods=["GET"])
+def prefetch_metrics():
+    return jsonify(question_prefetcher.stats()), 200
+
+
+@metrics_bp.route("/llm_cache", methods=["GET"])
+def llm_cache_metrics():
+    return jsonify(llm_cache.stats()), 200
+
+
+@metrics_bp.route("/llm_rate_limit", methods=["GET"])
+def llm_rate_limit_metrics():
+    return jsonify(LLM.stats()), 200
+
+
+@metrics_bp.route("/chunk_index", methods=["GET"])
+def chunk_index_metrics():
+    return jsonify({
+        "chunks": syllabus_chunk_index.stats(),
+        "system_book_chunks": book_chunk_index.stats(),
+    }), 200
+
+
+@metrics_bp.route("/chunk_cache", methods=["GET"])
+def chunk_cache_metrics():
+    return jsonify({
+        "chunks": chunk_text_cache.stats(),
+        "system_book_chunks": system_chunk_text_cache.stats(),
+    }), 200
+
+
+@metrics_bp.route("/sessions", methods=["GET"])
+def session_metrics():
+    return jsonify({
+        "interview": INTERVIEW_CACHE.stats(),
+        "revision": REVISION_CACHE.stats(),
+    }), 200
+
+
+@metrics_bp.route("/write_behind", methods=["GET"])
+def write_behind_metrics():
+    return jsonify(answer_writer.stats()), 200
+
+
+@metrics_bp.route("/scheduler", methods=["GET"])
+def scheduler_metrics():
+    return jsonify(status_scheduler.stats()), 200
+
+
+@metrics_bp.route("/llm_parse", methods=["GET"])
+def llm_parse_metrics():
+    return jsonify(parse_stats()), 200
+
+
+@metrics_bp.route("/prompt", methods=["GET"])
+def prompt_metrics():
+    return jsonify(prompt_stats.stats()), 200
+
+
+@metrics_bp.route("/retrieval", methods=["GET"])
+def retrieval_metrics():
+    return jsonify({
+        "syllabus": syllabus_retrieval.stats(),
+        "book": book_retrieval.stats(),
+    }), 200
+
+
+@metrics_bp.route("/ingestion", methods=["GET"])
+def ingestion_metrics():
+    return jsonify(ingestion_queue.stats()), 200
@@ -1,20 +1,8 @@
 from flask import Blueprint, request, jsonify
-from bson import ObjectId
 
-from extensions.mongo import db
-chunks_col = db["chunks"]
+from utils.chunk_cache import chunk_text_cache
 
 question_bp = Blueprint("question", __name__)
 
 def load_texts_by_chunk_ids(chunk_ids):
-    texts = []
-    for cid in chunk_ids:
-        try:
-            oid = ObjectId(cid)
-        except Exception:
-            continue
-        doc = chunks_col.find_one({"_id": oid})
-        if doc:
-            texts.append({"cid": cid, "text": doc.get("text", "")})
-    return texts
-
+    return chunk_text_cache.load(chunk_ids)
@@ -7,7 +7,11 @@ import random
 from flask import Blueprint, request, jsonify
 
 from extensions.llm import call_llm_json
-from utils.summarize import summarize
+from extensions.rate_limit import is_rate_limit_error
+from extensions.session_store import SessionStore, make_session_store
+from extensions.write_behind import answer_writer
+from utils.summarize import schedule_rolling_summary
+from utils.sse import sse_response, llm_question_events
 
 # ==== MongoDB setup ====
 from extensions.mongo import db
@@ -18,8 +22,8 @@ users_col = db["users"]
 # ==== Blueprint ====
 revision_bp = Blueprint("revision", __name__)
 
-# ==== In-memory cache ====
-REVISION_CACHE: Dict[str, dict] = {}
+# ==== Session store ====
+REVISION_CACHE: SessionStore = make_session_store("revision")
 
 # ==== Utils ====
 def now_utc():
@@ -71,6 +75,22 @@ Quy tắc:
 - Dựa vào câu trả lời trước đó của người dùng để ra câu hỏi tiếp theo cho phù hợp
 """.strip()
 
+def flush_evicted_session(revision: dict) -> None:
+    """
+    Lưu lại session bị bỏ dở (hết idle TTL / vượt quota) trước khi bị xoá khỏi store.
+    """
+    answer_writer.flush("revision_session", revision.get("id"))
+    revision_session_col.update_one(
+        {"_id": revision.get("id")},
+        {"$set": {
+            "point": revision.get("point", 0.0),
+            "feedback": revision.get("feedback", ""),
+            "evicted_at": now_utc(),
+        }}
+    )
+
+REVISION_CACHE.on_evict = flush_evicted_session
+
 # ==== Routes ====
 
 @revision_bp.route("/create", methods=["POST"])
@@ -154,38 +174,41 @@ def start_revision():
         "end_time": None,
     })
 
-    REVISION_CACHE[session_id] = {
+    REVISION_CACHE.create({
         "id": session_id,
         "revision_id": revision_id,
         "subject": subject,
-        "questions": [],
-        "answers": [],
+        "config": revision_config(db_revision),
         "qa_log": [],
         "summary": "",
-    }
+    })
 
     return jsonify({"session_id": session_id}), 200
 
-@revision_bp.route("/next_question", methods=["POST"])
-def next_revision_question():
-    data = request.get_json(force=True)
-    session_id = data.get("session_id")
-
-    if not session_id:
-        return jsonify({"error": "session_id is required"}), 400
-
-    revision = REVISION_CACHE.get(session_id)
-    if not revision:
-        return jsonify({"error": "Revision not started or not in cache"}), 404
-
-    revision_id = revision.get("revision_id")
-    db_revision = revisions_col.find_one({"_id": revision_id})
-    if not db_revision:
-        return jsonify({"error": "Revision not found in DB"}), 404
+def revision_config(db_revision: dict) -> dict:
+    """
+    Snapshot cấu hình revision cần để sinh câu hỏi, lấy 1 lần lúc /start.
+    """
+    return {
+        "difficulty": db_revision.get("difficulty"),
+        "questionType": db_revision.get("questionType"),
+        "additional": db_revision.get("additional", ""),
+    }
 
-    difficulty = db_revision.get("difficulty")
-    question_type = db_revision.get("questionType")
-    additional = db_revision.get("additional", "")
+def build_revision_question_prompt(revision: dict):
+    """
+    Dựng prompt sinh câu hỏi ôn tập. Trả None nếu revision không còn trong DB.
+    """
+    config = revision.get("config")
+    if config is None:
+        db_revision = revisions_col.find_one({"_id": revision.get("revision_id")})
+        if not db_revision:
+            return None
+        config = revision_config(db_revision)
+
+    difficulty = config.get("difficulty")
+    question_type = config.get("questionType")
+    additional = config.get("additional", "")
     subject = revision.get("subject", "Unknown")
 
     # chọn 1 type ngẫu nhiên
@@ -199,7 +222,7 @@ def next_revision_question():
     summary = revision.get("summary", "")
     recent_qa = revision.get("qa_log", [])[-4:]
 
-    prompt = prompt_generate_general_knowledge_question(
+    return prompt_generate_general_knowledge_question(
         summary=summary,
         subject=subject,
         recent_qa=recent_qa,
@@ -208,16 +231,54 @@ def next_revision_question():
         additional=additional,
     )
 
+@revision_bp.route("/next_question", methods=["POST"])
+def next_revision_question():
+    data = request.get_json(force=True)
+    session_id = data.get("session_id")
+
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
+
+    revision = REVISION_CACHE.get(session_id)
+    if not revision:
+        return jsonify({"error": "Revision not started or not in cache"}), 404
+
+    prompt = build_revision_question_prompt(revision)
+    if prompt is None:
+        return jsonify({"error": "Revision not found in DB"}), 404
+
     try:
         obj = call_llm_json(prompt)
     except Exception as e:
-        if "429" in str(e) or "RATE_LIMIT_EXCEEDED" in str(e):
+        if is_rate_limit_error(e):
             return jsonify({"error": "Rate limit exceeded. Please try again later."}), 429
         else:
             return jsonify({"error": "LLM error", "detail": str(e)}), 500
 
     return jsonify(obj), 200
 
+@revision_bp.route("/next_question_stream", methods=["POST"])
+def next_revision_question_stream():
+    """
+    Bản SSE của next_question: event "delta" chứa phần text câu hỏi vừa sinh,
+    event "result" chứa object hoàn chỉnh.
+    """
+    data = request.get_json(force=True)
+    session_id = data.get("session_id")
+
+    if not session_id:
+        return jsonify({"error": "session_id is required"}), 400
+
+    revision = REVISION_CACHE.get(session_id)
+    if not revision:
+        return jsonify({"error": "Revision not started or not in cache"}), 404
+
+    prompt = build_revision_question_prompt(revision)
+    if prompt is None:
+        return jsonify({"error": "Revision not found in DB"}), 404
+
+    return sse_response(llm_question_events(prompt))
+
 @revision_bp.route("/answer", methods=["POST"])
 def answer_revision():
     data = request.get_json(force=True)
@@ -228,32 +289,16 @@ def answer_revision():
     if not session_id or not q:
         return jsonify({"error": "session_id and question are required"}), 400
 
-    revision = REVISION_CACHE.get(session_id)
-    if not revision:
+    qa_len = REVISION_CACHE.append_answer(session_id, q, a)
+    if qa_len is None:
         return jsonify({"error": "Revision not found"}), 404
+    answer_writer.append("revision_session", session_id, q, a)
 
-    qa_item = {"question": q, "answer": a}
-    revision["qa_log"].append(qa_item)
-    revision["questions"].append(q)
-    revision["answers"].append(a)
-
-    summary_updated = False
-    qa_log = revision.get("qa_log", [])
-    summary = revision.get("summary", "")
-
-    if len(qa_log) > 6:
-        new_pairs = qa_log[-6:]
-        try:
-            new_summary = summarize(summary, new_pairs)
-            revision["summary"] = new_summary
-            revision["qa_log"] = qa_log[-4:]
-            summary_updated = True
-        except Exception as e:
-            print("Summarize error:", e)
+    summary_scheduled = schedule_rolling_summary(REVISION_CACHE, session_id, qa_len)
 
     updated = {"status": "saved"}
-    if summary_updated:
-        updated["summary_updated"] = True
+    if summary_scheduled:
+        updated["summary_scheduled"] = True
 
     return jsonify(updated), 200
 
@@ -265,23 +310,21 @@ def end_revision():
     if not session_id:
         return jsonify({"error": "session_id is required"}), 400
 
-    revision = REVISION_CACHE.get(session_id)
+    revision = REVISION_CACHE.delete(session_id)
     if not revision:
         return jsonify({"error": "Revision not found"}), 404
 
+    # câu trả lời đã được ghi dần, /end chỉ flush phần còn chờ và chốt kết quả
+    answer_writer.flush("revision_session", session_id)
     revision_session_col.update_one(
         {"_id": session_id},
         {"$set": {
-            "questions": revision.get("questions", []),
-            "answers": revision.get("answers", []),
             "point": revision.get("point", 0.0),
             "feedback": revision.get("feedback", ""),
             "end_time": now_utc(),
         }}
     )
 
-    REVISION_CACHE.pop(session_id, None)
-
     return jsonify({
         "status": "finished",
         "end_time": now_utc().isoformat() + "Z",
@@ -305,8 +348,8 @@ def get_user_revisions(user_id):
             available_at = rv.get("available_at")
             status = rv.get("status", "Unavailable")
             if available_at and isinstance(available_at, datetime.datetime):
+                # chỉ hiển thị; scheduler mới là nơi ghi trạng thái
                 if now >= available_at and status == "Unavailable":
-                    revisions_col.update_one({"_id": rv["_id"]}, {"$set": {"status": "Available"}})
                     rv["status"] = "Available"
             rv["available_at"] = to_iso(available_at)
             rv["created_at"] = to_iso(rv.get("created_at"))
@@ -1,13 +1,20 @@
 from flask import Blueprint, request, jsonify, send_file
-from pdfminer.high_level import extract_text
-from utils.chunking import chunk_syllabus
+from utils.chunk_cache import chunk_text_cache
+from utils.chunk_index import syllabus_chunk_index
+from utils.ingestion import ingestion_queue
+from utils.retrieval import syllabus_retrieval
 import os, datetime
+import hashlib
 import uuid
 from extensions.mongo import db
 syllabus_bp = Blueprint('syllabus', __name__)
 chunks_col = db['chunks']
 syllabus_col = db['syllabus']
 users_col = db['users']
+syllabus_blobs_col = db['syllabus_blobs']
+
+UPLOAD_DIR = "uploads"
+UPLOAD_READ_SIZE = 1024 * 1024
 
 
 @syllabus_bp.route('/upload-syllabus-pdf', methods=['POST'])
@@ -27,69 +34,128 @@ def upload_syllabus_pdf():
     # Tạo syllabus_id duy nhất
     syllabus_id = str(uuid.uuid4())
 
-    # Lưu file vật lý bằng syllabus_id.pdf
-    os.makedirs("uploads", exist_ok=True)
-    stored_filename = f"{syllabus_id}.pdf"
-    save_path = os.path.join("uploads", stored_filename)
-    file.save(save_path)
-
-    # Trích xuất text từ PDF
-    try:
-        text = extract_text(save_path)
-    except Exception as e:
-        return jsonify({"error": f"Cannot extract text from PDF: {str(e)}"}), 500
+    # Lưu file vật lý theo sha256 nội dung: file trùng nhau dùng chung 1 bản trên đĩa
+    content_sha256 = save_upload_by_hash(file.stream, UPLOAD_DIR)
+    stored_filename = f"{content_sha256}.pdf"
+    save_path = os.path.join(UPLOAD_DIR, stored_filename)
 
-    # Chunk PDF
-    chunked = chunk_syllabus(text, chunk_size=5000)
-
-    # Insert vào bảng syllabus
-    syllabus_doc = {
-        "_id": syllabus_id,
+    job = {
+        "syllabus_id": syllabus_id,
         "user_id": user_id,
         "name": name,
         "original_filename": original_filename,
         "stored_filename": stored_filename,
-        "num_chunks": len(chunked),
-        "created_at": datetime.datetime.utcnow()
+        "path": os.path.abspath(save_path),
+        "content_sha256": content_sha256,
     }
-    syllabus_col.insert_one(syllabus_doc)
 
-    # Insert vào bảng chunks
-    to_insert = [{
-        "text": item["content"],
-        "metadata": {
+    # Đã ingest file này rồi: trỏ syllabus mới tới bộ chunk có sẵn, không trích xuất/chunk lại
+    blob = syllabus_blobs_col.find_one({"_id": content_sha256})
+    if blob:
+        link_existing_chunks(job, blob)
+        job_id = ingestion_queue.record_done(job, blob.get("num_chunks"))
+        return jsonify({
+            "job_id": job_id,
+            "status": "done",
             "syllabus_id": syllabus_id,
-            "start_offset": item["start_offset"],
-            "end_offset": item["end_offset"]
-        }
-    } for item in chunked]
+            "syllabus_name": syllabus_name,
+            "num_chunks": blob.get("num_chunks"),
+            "user_id": user_id
+        }), 200
+
+    # Trích xuất + chunk chạy ở process pool, trả job_id ngay để client theo dõi
+    job_id = ingestion_queue.submit(job, on_done=on_syllabus_ingested)
+
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "syllabus_id": syllabus_id,
+        "syllabus_name": syllabus_name,
+        "user_id": user_id
+    }), 202
 
-    if to_insert:
-        chunks_col.insert_many(to_insert)
 
-    # Cập nhật syllabus vào documents của user
+def save_upload_by_hash(stream, directory: str) -> str:
+    """
+    Ghi stream upload ra file tạm, tính sha256 trong lúc ghi, rồi đổi tên thành <sha256>.pdf.
+    Nếu file cùng nội dung đã có thì bỏ bản tạm. Trả về sha256 (hex).
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(directory, f".{uuid.uuid4()}.tmp")
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                block = stream.read(UPLOAD_READ_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+        content_sha256 = digest.hexdigest()
+        final_path = os.path.join(directory, f"{content_sha256}.pdf")
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, final_path)
+        return content_sha256
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def link_existing_chunks(job: dict, blob: dict) -> None:
+    """
+    Tạo syllabus mới dùng chung chunk của syllabus đã ingest cùng file (chunk_owner_id).
+    """
+    now = datetime.datetime.utcnow()
+    syllabus_col.insert_one({
+        "_id": job["syllabus_id"],
+        "user_id": job["user_id"],
+        "name": job["name"],
+        "original_filename": job["original_filename"],
+        "stored_filename": job["stored_filename"],
+        "chunk_owner_id": blob["chunk_owner_id"],
+        "num_chunks": blob.get("num_chunks"),
+        "num_pages": blob.get("num_pages"),
+        "content_sha256": job["content_sha256"],
+        "created_at": now
+    })
     users_col.update_one(
-        {"_id": user_id},
+        {"_id": job["user_id"]},
         {
-            "$setOnInsert": {"_id": user_id},
+            "$setOnInsert": {"_id": job["user_id"]},
             "$push": {
                 "documents": {
-                    "syllabus_id": syllabus_id,
-                    "name": name,
-                    "original_filename": original_filename,
-                    "uploaded_at": datetime.datetime.utcnow()
+                    "syllabus_id": job["syllabus_id"],
+                    "name": job["name"],
+                    "original_filename": job["original_filename"],
+                    "uploaded_at": now
                 }
             }
         },
         upsert=True
     )
 
-    return jsonify({
-        "syllabus_id": syllabus_id,
-        "syllabus_name": syllabus_name,
-        "num_chunks": len(to_insert),
-        "user_id": user_id
-    }), 200
+
+def on_syllabus_ingested(job: dict) -> None:
+    syllabus_id = job["syllabus_id"]
+    syllabus_chunk_index.invalidate(syllabus_id)
+    chunk_text_cache.invalidate_owner(syllabus_id)
+    syllabus_retrieval.schedule_rebuild(syllabus_id)
+
+
+@syllabus_bp.route('/job/<job_id>', methods=['GET'])
+def get_ingestion_job(job_id):
+    job = ingestion_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    job["job_id"] = job.pop("_id")
+    for key in ("created_at", "updated_at", "started_at", "finished_at"):
+        if isinstance(job.get(key), datetime.datetime):
+            job[key] = job[key].isoformat() + "Z"
+    return jsonify(job), 200
 
 
 @syllabus_bp.route('/get-user-documents/<user_id>', methods=['GET'])
@@ -111,7 +177,7 @@ def download_syllabus_pdf(syllabus_id):
 
     stored_filename = doc.get("stored_filename")
     original_filename = doc.get("original_filename", "file.pdf")
-    file_path = os.path.join("uploads", stored_filename)
+    file_path = os.path.join(UPLOAD_DIR, stored_filename)
 
     if not os.path.exists(file_path):
         return jsonify({"error": "File not found"}), 404
@@ -2,11 +2,15 @@ from flask import Blueprint, request, jsonify
 import pandas as pd
 import uuid
 import io
-from bson import ObjectId
-import math
 import requests
 
+from config import CHUNK_OVERLAP, CHUNK_SNAP
 from utils.chunking import chunk_syllabus
+from utils.chunk_cache import system_chunk_text_cache
+from utils.chunk_index import book_chunk_index
+from utils.json_stream import json_array_response, to_jsonable, wants_stream
+from utils.pagination import PaginationError, equality_filters, find_all, find_page, parse_fields, with_next_cursor
+from utils.retrieval import book_retrieval
 from extensions.mongo import db
 curriculum_bp = Blueprint('curriculum', __name__)
 
@@ -14,6 +18,9 @@ system_curriculum_col = db['systemCurriculum']
 book_embeddings_col = db['bookEmbeddings']
 system_book_chunks_col = db['system_book_chunks']
 
+# Các field được lọc bằng query string ở /get-curriculum
+CURRICULUM_FILTER_FIELDS = ['subject', 'major', 'faculty', 'category', 'type', 'uploaded_by']
+
 
 @curriculum_bp.route('/upload-curriculum-excel', methods=['POST'])
 def upload_curriculum_excel():
@@ -76,24 +83,22 @@ def upload_curriculum_excel():
 @curriculum_bp.route('/get-curriculum', methods=['GET'])
 def get_curriculum():
     try:
-        curriculums = list(system_curriculum_col.find({}))
-
-        clean_curriculums = []
-        for c in curriculums:
-            clean_doc = {}
-            for k, v in c.items():
-                # Chuyển ObjectId -> str
-                if isinstance(v, ObjectId):
-                    clean_doc[k] = str(v)
-                # Chuyển NaN -> None
-                elif isinstance(v, float) and math.isnan(v):
-                    clean_doc[k] = None
-                else:
-                    clean_doc[k] = v
-            clean_curriculums.append(clean_doc)
-
-        return jsonify(clean_curriculums), 200
+        query = equality_filters(request.args, CURRICULUM_FILTER_FIELDS)
+        projection = parse_fields(request.args)
+
+        # ?stream=1: duyệt cursor và ghi mảng JSON dần dần thay vì dựng cả list trong RAM
+        if wants_stream(request.args):
+            return json_array_response(find_all(system_curriculum_col, query, request.args, projection))
+
+        curriculums, next_cursor = find_page(system_curriculum_col, query, request.args, projection)
+
+        # ObjectId -> str, NaN -> None
+        clean_curriculums = [to_jsonable(c) for c in curriculums]
 
+        return with_next_cursor(jsonify(clean_curriculums), next_cursor), 200
+
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"Cannot fetch data: {str(e)}"}), 500
 
@@ -154,20 +159,16 @@ def save_book_embedding():
 
         full_text = "\n\n".join([e.get("text", "") for e in embeddings]).strip()
 
-        existing = book_embeddings_col.find_one({"bookId": book_id})
-        if existing:
-            book_embeddings_col.update_one(
-                {"bookId": book_id},
-                {"$set": {"text": full_text}}
-            )
-            action = "updated"
-        else:
-            book_embeddings_col.insert_one({
-                "_id": str(uuid.uuid4()),
-                "bookId": book_id,
-                "text": full_text
-            })
-            action = "inserted"
+        # 1 upsert thay cho find + update/insert (bookId là unique index)
+        result = book_embeddings_col.update_one(
+            {"bookId": book_id},
+            {
+                "$set": {"text": full_text},
+                "$setOnInsert": {"_id": str(uuid.uuid4())},
+            },
+            upsert=True,
+        )
+        action = "inserted" if result.upserted_id is not None else "updated"
 
         return jsonify({
             "message": f"Book embedding {action} successfully",
@@ -203,18 +204,22 @@ def chunk_book(book_id):
         if not text.strip():
             return jsonify({"error": "Empty text"}), 400
 
-        chunks = chunk_syllabus(text)
+        chunks = chunk_syllabus(text, overlap=CHUNK_OVERLAP, snap=CHUNK_SNAP)
 
         system_book_chunks_col.delete_many({"bookId": book_id})
-        for c in chunks:
-            system_book_chunks_col.insert_one({
-                "_id": str(uuid.uuid4()),
-                "bookId": book_id,
-                "chapter": c.get("chapter"),
-                "content": c.get("content"),
-                "start_offset": c.get("start_offset"),
-                "end_offset": c.get("end_offset")
-            })
+        to_insert = [{
+            "_id": str(uuid.uuid4()),
+            "bookId": book_id,
+            "chapter": c.get("chapter"),
+            "content": c.get("content"),
+            "start_offset": c.get("start_offset"),
+            "end_offset": c.get("end_offset")
+        } for c in chunks]
+        if to_insert:
+            system_book_chunks_col.insert_many(to_insert)
+        book_chunk_index.invalidate(book_id)
+        system_chunk_text_cache.invalidate_owner(book_id)
+        book_retrieval.schedule_rebuild(book_id, [(d["_id"], d["content"] or "") for d in to_insert])
 
         return jsonify({
             "bookId": book_id,
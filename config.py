@@ -6,4 +6,93 @@ import os
 MONGO_URI = os.getenv("MONGO_URI", "")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
-GEMINI_MODEL = os.getenv("GEMINI_MODEL", "")
\ No newline at end of file
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "")
+
+# ==== Prefetch câu hỏi ====
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+PREFETCH_WAIT_SECONDS = float(os.getenv("PREFETCH_WAIT_SECONDS", "30"))
+
+# ==== LLM cache ====
+# Tắt mặc định; khi bật chỉ các lời gọi use_cache=True (tóm tắt session) dùng cache,
+# sinh câu hỏi luôn gọi LLM để kết quả khác nhau giữa các lần
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "2048"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_DOCS = int(os.getenv("LLM_CACHE_MAX_DOCS", "100000"))
+LLM_CACHE_MAX_ENTRY_BYTES = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", str(64 * 1024)))
+
+# ==== Rate limit Gemini (0 = không giới hạn) ====
+LLM_RPM = int(os.getenv("LLM_RPM", "60"))
+LLM_TPM = int(os.getenv("LLM_TPM", "1000000"))
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "512"))
+LLM_QUEUE_DEADLINE_SECONDS = float(os.getenv("LLM_QUEUE_DEADLINE_SECONDS", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "16"))
+
+# ==== Rolling summary ====
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "2"))
+
+# ==== Batch sinh câu hỏi ====
+QUESTION_BATCH_SIZE = int(os.getenv("QUESTION_BATCH_SIZE", "3"))
+QUESTION_QUEUE_LOW_WATERMARK = int(os.getenv("QUESTION_QUEUE_LOW_WATERMARK", "1"))
+
+# ==== Question pool cho cả interview ====
+# Opt-in: số câu sinh sẵn cho mỗi loại câu hỏi, sinh ở lần /start đầu tiên. 0 = tắt
+QUESTION_POOL_PER_TYPE = int(os.getenv("QUESTION_POOL_PER_TYPE", "0"))
+QUESTION_POOL_WORKERS = int(os.getenv("QUESTION_POOL_WORKERS", "2"))
+
+# ==== Chunk sampling ====
+# "cache": giữ mảng _id chunk theo syllabus trong process, "sample": dùng $sample của Mongo
+CHUNK_SAMPLER = os.getenv("CHUNK_SAMPLER", "cache")
+CHUNK_INDEX_TTL_SECONDS = int(os.getenv("CHUNK_INDEX_TTL_SECONDS", "300"))
+CHUNK_INDEX_MAX_OWNERS = int(os.getenv("CHUNK_INDEX_MAX_OWNERS", "512"))
+CHUNK_TEXT_CACHE_MAX_BYTES = int(os.getenv("CHUNK_TEXT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+# ==== Session store ====
+# "memory": dict trong process (1 worker), "mongo": dùng chung giữa nhiều worker/node
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_STORE_LOCAL_TTL_SECONDS = float(os.getenv("SESSION_STORE_LOCAL_TTL_SECONDS", "2"))
+SESSION_IDLE_TTL_SECONDS = int(os.getenv("SESSION_IDLE_TTL_SECONDS", str(3 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "20000"))
+SESSION_SWEEP_INTERVAL_SECONDS = int(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+
+# ==== Write-behind lưu câu trả lời ====
+# Buffer trong process chỉ đúng khi 1 worker giữ mọi session, nên luôn tắt (ghi thẳng) khi SESSION_STORE=mongo
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1") == "1" and SESSION_STORE != "mongo"
+WRITE_BEHIND_FLUSH_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_SECONDS", "1"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+
+# ==== Scheduler chuyển trạng thái Unavailable -> Available ====
+STATUS_SCHEDULER_ENABLED = os.getenv("STATUS_SCHEDULER_ENABLED", "1") == "1"
+STATUS_SCHEDULER_INTERVAL_SECONDS = float(os.getenv("STATUS_SCHEDULER_INTERVAL_SECONDS", "30"))
+
+# ==== Phân trang cho các API danh sách ====
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", "50"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "200"))
+
+# ==== Ngân sách token cho prompt sinh câu hỏi ====
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+# Phần tối đa của ngân sách (sau khi trừ template) dành cho summary và recent Q&A
+PROMPT_SUMMARY_SHARE = float(os.getenv("PROMPT_SUMMARY_SHARE", "0.15"))
+PROMPT_RECENT_QA_SHARE = float(os.getenv("PROMPT_RECENT_QA_SHARE", "0.2"))
+
+# ==== Retrieval BM25 theo syllabus/book ====
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "1") == "1"
+RETRIEVAL_MAX_OWNERS = int(os.getenv("RETRIEVAL_MAX_OWNERS", "64"))
+RETRIEVAL_WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "1"))
+# Số chunk liên quan nhất được giữ làm ứng viên trước khi bốc ngẫu nhiên
+RETRIEVAL_CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "10"))
+
+# ==== Ingest syllabus bất đồng bộ ====
+# Số process trích xuất/chunk PDF, mặc định = số core
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# ==== Chunking ====
+# Ranh giới cắt chunk: "none" (mặc định, cắt đúng 5000 ký tự như trước), "whitespace" hoặc "sentence".
+# Đổi sang "sentence"/"whitespace" làm offset chunk của syllabus mới khác syllabus đã ingest.
+CHUNK_SNAP = os.getenv("CHUNK_SNAP", "none")
+CHUNK_SNAP = None if CHUNK_SNAP in ("", "none") else CHUNK_SNAP
+# Số ký tự chunk sau lặp lại từ cuối chunk trước
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "0"))
@@ -0,0 +1,136 @@
+# Registry index cho toàn bộ collection.
+# - Khi app khởi động: create_app() gọi ensure_indexes().
+# - Chạy tay: python -m extensions.indexes [--verify] [--dry-run]
+#   --verify chạy explain() trên các query nóng và báo lỗi nếu có COLLSCAN.
+import argparse
+import datetime
+import sys
+from typing import List, Optional
+
+from pymongo import ASCENDING
+
+from extensions.mongo import db
+
+# (collection, keys, options)
+INDEXES = [
+    # users: đăng nhập/đăng ký theo email. User tạo qua upsert (creator/participant) có thể
+    # chưa có email nên chỉ unique trên document có field email.
+    ("users", [("email", ASCENDING)], {
+        "unique": True,
+        "partialFilterExpression": {"email": {"$exists": True}},
+    }),
+
+    # chunk theo syllabus/book, sắp theo _id để lấy mẫu (ChunkIdIndex)
+    ("chunks", [("metadata.syllabus_id", ASCENDING), ("_id", ASCENDING)], {}),
+    ("system_book_chunks", [("bookId", ASCENDING), ("_id", ASCENDING)], {}),
+
+    # sách hệ thống
+    ("systemCurriculum", [("uuid", ASCENDING)], {}),
+    ("systemCurriculum", [("subject", ASCENDING), ("_id", ASCENDING)], {}),
+    ("systemCurriculum", [("uploaded_by", ASCENDING), ("_id", ASCENDING)], {}),
+    ("bookEmbeddings", [("bookId", ASCENDING)], {"unique": True}),
+
+    # interview + phân trang danh sách + scheduler chuyển trạng thái
+    ("interviews", [("status", ASCENDING), ("_id", ASCENDING)], {}),
+    ("interviews", [("status", ASCENDING), ("available_at", ASCENDING)], {}),
+    ("interviews", [("creator_id", ASCENDING), ("_id", ASCENDING)], {}),
+    ("interviews", [("created_at", ASCENDING)], {}),
+    ("interview_session", [("interview_id", ASCENDING), ("_id", ASCENDING)], {}),
+    ("revisions", [("status", ASCENDING), ("available_at", ASCENDING)], {}),
+
+    # session store Mongo: quét session hết hạn theo updated_at
+    ("active_interview_sessions", [("updated_at", ASCENDING)], {}),
+    ("active_revision_sessions", [("updated_at", ASCENDING)], {}),
+]
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# (collection, filter, sort) của các query nóng, dùng để kiểm tra query plan
+HOT_QUERIES = [
+    ("users", {"email": "someone@example.com"}, None),
+    ("chunks", {"metadata.syllabus_id": "syllabus-id"}, [("_id", ASCENDING)]),
+    ("system_book_chunks", {"bookId": "book-id"}, [("_id", ASCENDING)]),
+    ("systemCurriculum", {"uuid": "book-uuid"}, None),
+    ("bookEmbeddings", {"bookId": "book-id"}, None),
+    ("interview_session", {"interview_id": "interview-id"}, [("_id", ASCENDING)]),
+    ("interviews", {"status": "Unavailable"}, [("_id", ASCENDING)]),
+    ("interviews", {"creator_id": "user-id"}, [("_id", ASCENDING)]),
+    ("interviews", {"status": "Unavailable", "available_at": {"$gt": _EPOCH}}, [("available_at", ASCENDING)]),
+    ("revisions", {"status": "Unavailable", "available_at": {"$gt": _EPOCH}}, [("available_at", ASCENDING)]),
+    ("active_interview_sessions", {"updated_at": {"$lt": _EPOCH}}, None),
+    ("active_revision_sessions", {"updated_at": {"$lt": _EPOCH}}, None),
+]
+
+
+def ensure_indexes(database=db, dry_run: bool = False) -> List[str]:
+    """
+    Tạo index nếu chưa có (create_index idempotent). Lỗi không chặn app khởi động,
+    chỉ được in ra và trả về danh sách lỗi.
+    """
+    errors = []
+    for name, keys, options in INDEXES:
+        if dry_run:
+            print(f"[dry-run] {name} {keys} {options}")
+            continue
+        try:
+            database[name].create_index(keys, **options)
+        except Exception as e:
+            msg = f"Cannot create index on {name} {keys}: {e}"
+            print(msg)
+            errors.append(msg)
+    return errors
+
+
+def _plan_stages(plan) -> List[str]:
+    """
+    Liệt kê stage trong 1 query plan (cả dạng cũ inputStage(s) lẫn dạng SBE queryPlan).
+    """
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for key in ("inputStage", "queryPlan"):
+            if key in plan:
+                stages.extend(_plan_stages(plan[key]))
+        for child in plan.get("inputStages", []):
+            stages.extend(_plan_stages(child))
+    return stages
+
+
+def verify_query_plans(database=db) -> List[str]:
+    """
+    Chạy explain() trên từng query nóng; trả về các query có winning plan là COLLSCAN.
+    """
+    failures = []
+    for name, query, sort in HOT_QUERIES:
+        cursor = database[name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(winning)
+        if "COLLSCAN" in stages:
+            failures.append(f"{name} {query} sort={sort}: COLLSCAN ({' <- '.join(stages)})")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes and check hot query plans")
+    parser.add_argument("--verify", action="store_true", help="run explain() on hot queries, fail on COLLSCAN")
+    parser.add_argument("--dry-run", action="store_true", help="only print the indexes that would be created")
+    args = parser.parse_args(argv)
+
+    errors = ensure_indexes(dry_run=args.dry_run)
+    if args.verify and not args.dry_run:
+        failures = verify_query_plans()
+        for f in failures:
+            print(f)
+        errors.extend(failures)
+
+    if errors:
+        return 1
+    print("Indexes OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,38 +1,179 @@
-import json
 import re
 import google.generativeai as genai
 from google.generativeai.types import GenerationConfig
-from config import GEMINI_API_KEY, GEMINI_MODEL
+from config import (
+    GEMINI_API_KEY,
+    GEMINI_MODEL,
+    LLM_RPM,
+    LLM_TPM,
+    LLM_EXPECTED_OUTPUT_TOKENS,
+    LLM_QUEUE_DEADLINE_SECONDS,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+)
+from extensions.llm_cache import llm_cache, make_cache_key
+from extensions.llm_parse import safe_parse_llm_output
+from extensions.rate_limit import RateLimitedModel
 
 genai.configure(api_key=GEMINI_API_KEY)
 
-LLM = genai.GenerativeModel(
-    GEMINI_MODEL,
-    generation_config=GenerationConfig(response_mime_type="application/json")
+GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+LLM = RateLimitedModel(
+    genai.GenerativeModel(
+        GEMINI_MODEL,
+        generation_config=GenerationConfig(**GENERATION_CONFIG)
+    ),
+    rpm=LLM_RPM,
+    tpm=LLM_TPM,
+    expected_output_tokens=LLM_EXPECTED_OUTPUT_TOKENS,
+    deadline=LLM_QUEUE_DEADLINE_SECONDS,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE_SECONDS,
+    backoff_max=LLM_BACKOFF_MAX_SECONDS,
 )
 
-def safe_parse_llm_output(raw: str) -> dict:
+def _cache_key(prompt: str, use_cache: bool):
+    if not (use_cache and llm_cache.enabled):
+        return None
+    return make_cache_key(GEMINI_MODEL, GENERATION_CONFIG, prompt)
+
+def call_llm_json(prompt: str, use_cache: bool = False) -> dict:
     """
-    Loại bỏ code block và escape backslash chưa hợp lệ,
-    sau đó parse JSON an toàn.
+    Gọi LLM và parse JSON an toàn, giữ LaTeX và ký hiệu tập hợp.
+    use_cache=True chỉ dùng cho prompt mà kết quả giống nhau là chấp nhận được (vd tóm tắt);
+    sinh câu hỏi cần kết quả khác nhau giữa các lần gọi nên không cache.
     """
-    # 1. Loại bỏ code block ```json ... ```
-    cleaned = re.sub(r"^```(?:json)?|```$", "", raw.strip(), flags=re.MULTILINE).strip()
+    key = _cache_key(prompt, use_cache)
+
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return safe_parse_llm_output(cached)
+
+    resp = LLM.generate_content(prompt)
+    raw = (resp.text or "").strip()
+    obj = safe_parse_llm_output(raw)
+
+    # Chỉ cache output đã parse được
+    if key:
+        llm_cache.put(key, raw)
+    return obj
 
-    # 2. Escape backslash đơn không hợp lệ
-    # (?<!\\)\\(?![\\"]) -> tìm \ không có \ trước và không đứng trước \ hoặc "
-    cleaned = re.sub(r'(?<!\\)\\(?![\\"])', r'\\\\', cleaned)
 
-    # 3. Parse JSON
+_JSON_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+def _decode_unicode_escape(buf: str, i: int):
+    """
+    Giải mã \\uXXXX tại buf[i], ghép cặp surrogate (\\ud83d\\ude00 -> 1 emoji).
+    Trả về (ký tự, số ký tự đã đọc), hoặc None nếu cần chờ chunk sau để biết có nửa sau của cặp không.
+    Surrogate lẻ được thay bằng U+FFFD để text vẫn encode UTF-8 được.
+    """
     try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"Cannot parse LLM output as JSON: {e}\nRaw output: {raw}")
+        code = int(buf[i + 2:i + 6], 16)
+    except ValueError:
+        return buf[i:i + 6], 6
+    if 0xDC00 <= code <= 0xDFFF:
+        return "\ufffd", 6
+    if not 0xD800 <= code <= 0xDBFF:
+        return chr(code), 6
 
-def call_llm_json(prompt: str) -> dict:
+    tail = buf[i + 6:i + 12]
+    if len(tail) < 6 and "\\u".startswith(tail[:2]):
+        return None
+    if tail.startswith("\\u"):
+        try:
+            low = int(tail[2:6], 16)
+        except ValueError:
+            low = None
+        if low is not None and 0xDC00 <= low <= 0xDFFF:
+            return chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)), 12
+    return "\ufffd", 6
+
+
+class JsonFieldStreamer:
     """
-    Gọi LLM và parse JSON an toàn, giữ LaTeX và ký hiệu tập hợp.
+    Đọc dần output JSON đang được stream và trả về phần text mới của 1 field string
+    (mặc định "question") ngay khi nó xuất hiện.
     """
-    resp = LLM.generate_content(prompt)
-    raw = (resp.text or "").strip()
-    return safe_parse_llm_output(raw)
+
+    def __init__(self, field: str = "question"):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buf = ""
+        self._pos = None
+        self.done = False
+
+    def feed(self, text: str) -> str:
+        if self.done:
+            return ""
+        self._buf += text
+
+        if self._pos is None:
+            m = self._key.search(self._buf)
+            if not m:
+                return ""
+            self._pos = m.end()
+
+        out = []
+        i = self._pos
+        buf = self._buf
+        while i < len(buf):
+            ch = buf[i]
+            if ch == '"':
+                self.done = True
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # escape chưa nhận đủ thì chờ chunk sau
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc == "u":
+                if i + 6 > len(buf):
+                    break
+                decoded = _decode_unicode_escape(buf, i)
+                if decoded is None:
+                    break
+                ch, size = decoded
+                out.append(ch)
+                i += size
+            else:
+                out.append(_JSON_ESCAPES.get(esc, esc))
+                i += 2
+        self._pos = i
+        return "".join(out)
+
+def stream_llm_json(prompt: str, field: str = "question", use_cache: bool = False, model=None):
+    """
+    Stream output của LLM. Yield ("delta", text) cho field đang sinh,
+    cuối cùng yield ("result", obj) là object JSON đã parse.
+    Truyền model để dùng model giả lập khi test.
+    """
+    key = _cache_key(prompt, use_cache) if model is None else None
+    if key:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            obj = safe_parse_llm_output(cached)
+            if isinstance(obj, dict) and obj.get(field):
+                yield "delta", str(obj[field])
+            yield "result", obj
+            return
+
+    streamer = JsonFieldStreamer(field)
+    parts = []
+    for chunk in (model or LLM).generate_content(prompt, stream=True):
+        text = getattr(chunk, "text", "") or ""
+        parts.append(text)
+        delta = streamer.feed(text)
+        if delta:
+            yield "delta", delta
+
+    raw = "".join(parts).strip()
+    obj = safe_parse_llm_output(raw)
+    if key:
+        llm_cache.put(key, raw)
+    yield "result", obj
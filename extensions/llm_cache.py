@@ -0,0 +1,171 @@
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MEMORY_ENTRIES,
+    LLM_CACHE_TTL_SECONDS,
+    LLM_CACHE_MAX_DOCS,
+    LLM_CACHE_MAX_ENTRY_BYTES,
+)
+from extensions.mongo import db
+
+
+def make_cache_key(model: str, generation_config: dict, prompt: str) -> str:
+    payload = json.dumps(
+        {"model": model, "config": generation_config, "prompt": prompt},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Cache 2 tầng cho output thô của LLM, key = sha256(model, config, prompt):
+    - Tầng 1: LRU trong process.
+    - Tầng 2: collection Mongo, hết hạn bằng TTL index, giới hạn số document.
+    """
+
+    TRIM_EVERY = 100
+
+    def __init__(self, collection, max_entries: int, ttl_seconds: int,
+                 max_docs: int, max_entry_bytes: int, enabled: bool = True):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_docs = max_docs
+        self.max_entry_bytes = max_entry_bytes
+        self._col = collection
+        self._lock = threading.Lock()
+        # key -> (created_at, raw): tầng nhớ cũng hết hạn theo ttl_seconds như tầng Mongo
+        self._lru: "OrderedDict[str, Tuple[datetime.datetime, str]]" = OrderedDict()
+        self._index_ready = False
+        self._stats = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "skipped_large": 0,
+            "mongo_errors": 0,
+        }
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    del self._lru[key]
+                else:
+                    self._lru.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+
+        try:
+            doc = self._col.find_one({"_id": key}, {"response": 1, "created_at": 1})
+        except Exception as e:
+            print("LLM cache read error:", e)
+            self._bump("mongo_errors")
+            doc = None
+
+        # TTL monitor của Mongo chỉ chạy mỗi ~60s nên tự kiểm tra hạn ở đây
+        if doc and not self._expired(doc.get("created_at")):
+            self._remember(key, doc["response"], doc.get("created_at"))
+            self._bump("mongo_hits")
+            return doc["response"]
+
+        self._bump("misses")
+        return None
+
+    def put(self, key: str, raw: str) -> None:
+        if len(raw.encode("utf-8")) > self.max_entry_bytes:
+            self._bump("skipped_large")
+            return
+
+        created_at = datetime.datetime.utcnow()
+        self._remember(key, raw, created_at)
+        try:
+            self._ensure_index()
+            self._col.replace_one(
+                {"_id": key},
+                {"_id": key, "response": raw, "created_at": created_at},
+                upsert=True,
+            )
+        except Exception as e:
+            print("LLM cache write error:", e)
+            self._bump("mongo_errors")
+            return
+
+        with self._lock:
+            self._stats["stores"] += 1
+            should_trim = self._stats["stores"] % self.TRIM_EVERY == 0
+        if should_trim:
+            self._trim()
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._lru)
+        hits = stats["memory_hits"] + stats["mongo_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    def _remember(self, key: str, raw: str, created_at: Optional[datetime.datetime]) -> None:
+        if not isinstance(created_at, datetime.datetime):
+            created_at = datetime.datetime.utcnow()
+        with self._lock:
+            self._lru[key] = (created_at, raw)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _expired(self, created_at) -> bool:
+        if not isinstance(created_at, datetime.datetime):
+            return False
+        age = datetime.datetime.utcnow() - created_at
+        return age.total_seconds() > self.ttl_seconds
+
+    def _ensure_index(self) -> None:
+        if self._index_ready:
+            return
+        self._col.create_index("created_at", expireAfterSeconds=self.ttl_seconds)
+        self._index_ready = True
+
+    def _trim(self) -> None:
+        """
+        Xoá các entry cũ nhất khi tầng Mongo vượt quá max_docs.
+        """
+        try:
+            excess = self._col.estimated_document_count() - self.max_docs
+            if excess <= 0:
+                return
+            old_ids = [d["_id"] for d in self._col.find({}, {"_id": 1}).sort("created_at", 1).limit(excess)]
+            if old_ids:
+                self._col.delete_many({"_id": {"$in": old_ids}})
+        except Exception as e:
+            print("LLM cache trim error:", e)
+            self._bump("mongo_errors")
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+
+llm_cache = LLMResponseCache(
+    db["llm_cache"],
+    max_entries=LLM_CACHE_MEMORY_ENTRIES,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    max_docs=LLM_CACHE_MAX_DOCS,
+    max_entry_bytes=LLM_CACHE_MAX_ENTRY_BYTES,
+    enabled=LLM_CACHE_ENABLED,
+)
@@ -0,0 +1,134 @@
+import json
+import re
+import threading
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    JSON_BACKEND = "orjson"
+except ImportError:
+    _loads = json.loads
+    JSON_BACKEND = "json"
+
+
+# Lệnh LaTeX bắt đầu bằng chữ trùng escape JSON hợp lệ (\t, \n, \r). Nếu model viết \theta với
+# 1 backslash thì json.loads vẫn "thành công" nhưng ra tab + "heta", nên phải sửa trước khi parse.
+_LATEX_ESCAPE_COMMANDS = frozenset([
+    "times", "theta", "tau", "tan", "text", "textbf", "tilde", "to", "top", "triangle",
+    "neq", "ne", "nu", "nabla", "not", "ni", "newline", "norm",
+    "rho", "right", "rightarrow", "rangle", "rm", "rceil", "rfloor",
+])
+
+# \b, \f (hầu như không xuất hiện trong văn bản thật) hoặc 1 lệnh ở trên, với số backslash lẻ.
+# Bắt đầu bằng ký tự backslash (lookbehind đặt sau) để regex chỉ thử tại vị trí có backslash,
+# không thử ở từng ký tự của output.
+_LATEX_HINT = re.compile(
+    r"\\(?<!\\\\)(?:\\\\)*(?:[bf]|(?:"
+    + "|".join(sorted(_LATEX_ESCAPE_COMMANDS, key=len, reverse=True))
+    + r")(?![a-zA-Z]))"
+)
+
+# Quét từng escape từ trái sang phải để "\\" được tiêu thụ theo cặp
+_ESCAPE = re.compile(r'\\(\\|["/]|u[0-9a-fA-F]{4}|[bfnrt][a-zA-Z]*)?')
+
+# Cách sửa cũ: escape mọi backslash không đứng trước \ hoặc "
+_LEGACY_ESCAPE = re.compile(r'(?<!\\)\\(?![\\"])')
+
+_lock = threading.Lock()
+_stats = {"strict": 0, "fence": 0, "repair": 0, "legacy": 0, "failed": 0, "latex_hint": 0}
+
+
+def _count(tier: str) -> None:
+    with _lock:
+        _stats[tier] += 1
+
+
+def _strip_fence(text: str) -> str:
+    """
+    Bỏ ```json ... ``` bao ngoài (nếu có).
+    """
+    if not text.startswith("```"):
+        return text
+    text = text[3:]
+    if text.startswith("json"):
+        text = text[4:]
+    if text.rstrip().endswith("```"):
+        text = text.rstrip()[:-3]
+    return text.strip()
+
+
+def _fix_escape(m) -> str:
+    esc = m.group(1)
+    if esc is None:
+        # escape không hợp lệ (\alpha, \( ...) -> backslash literal
+        return "\\\\"
+    if esc[0] in "bf" or (esc[0] in "tnr" and esc in _LATEX_ESCAPE_COMMANDS):
+        return "\\\\" + esc
+    return m.group(0)
+
+
+def repair_escapes(text: str) -> str:
+    """
+    Chỉ escape lại backslash không tạo thành escape JSON hợp lệ hoặc là lệnh LaTeX;
+    giữ nguyên \\n, \\", \\uXXXX... hợp lệ.
+    """
+    return _ESCAPE.sub(_fix_escape, text)
+
+
+def safe_parse_llm_output(raw: str) -> dict:
+    """
+    Parse JSON từ output LLM theo từng tầng, rẻ trước:
+    1. strict: json.loads thẳng (orjson nếu có)
+    2. fence: bỏ ```json ... ``` rồi parse
+    3. repair: escape lại backslash không hợp lệ / lệnh LaTeX, giữ escape hợp lệ
+    4. legacy: escape mọi backslash như cách cũ
+    Nếu output có dấu hiệu LaTeX 1 backslash thì bỏ qua tầng 1-2 vì parse "thành công" sẽ làm hỏng LaTeX.
+    """
+    text = raw.strip()
+    latex = _LATEX_HINT.search(text) is not None
+
+    if latex:
+        _count("latex_hint")
+        text = _strip_fence(text)
+    else:
+        try:
+            obj = _loads(text)
+            _count("strict")
+            return obj
+        except ValueError:
+            pass
+
+        if text.startswith("```"):
+            text = _strip_fence(text)
+            try:
+                obj = _loads(text)
+                _count("fence")
+                return obj
+            except ValueError:
+                pass
+
+    try:
+        obj = _loads(repair_escapes(text))
+        _count("repair")
+        return obj
+    except ValueError:
+        pass
+
+    try:
+        obj = json.loads(_LEGACY_ESCAPE.sub(r"\\\\", text))
+        _count("legacy")
+        return obj
+    except json.JSONDecodeError as e:
+        _count("failed")
+        raise ValueError(f"Cannot parse LLM output as JSON: {e}\nRaw output: {raw}")
+
+
+def parse_stats() -> dict:
+    with _lock:
+        stats = dict(_stats)
+    total = sum(stats[t] for t in ("strict", "fence", "repair", "legacy", "failed"))
+    stats["total"] = total
+    stats["repair_rate"] = (stats["repair"] + stats["legacy"]) / total if total else 0.0
+    stats["backend"] = JSON_BACKEND
+    return stats
@@ -0,0 +1,211 @@
+import random
+import threading
+import time
+from typing import Callable
+
+
+class RateLimitExceeded(Exception):
+    """
+    Hết hạn chờ quota hoặc Gemini vẫn trả 429 sau khi đã retry.
+    """
+
+
+def is_rate_limit_error(e: Exception) -> bool:
+    msg = str(e)
+    return (
+        isinstance(e, RateLimitExceeded)
+        or type(e).__name__ in ("ResourceExhausted", "TooManyRequests")
+        or "429" in msg
+        or "RATE_LIMIT_EXCEEDED" in msg
+        or "RESOURCE_EXHAUSTED" in msg
+    )
+
+
+class TokenEstimator:
+    """
+    Đếm token cục bộ (không gọi API count_tokens): số ký tự / tỉ lệ ký tự mỗi token.
+    Tỉ lệ được hiệu chỉnh dần theo usage_metadata.prompt_token_count Gemini trả về
+    và giữ lại cho các lần ước lượng sau.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, alpha: float = 0.1,
+                 min_ratio: float = 1.5, max_ratio: float = 8.0):
+        self.chars_per_token = chars_per_token
+        self.alpha = alpha
+        self.min_ratio = min_ratio
+        self.max_ratio = max_ratio
+        self._lock = threading.Lock()
+        self._observations = 0
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return max(1, int(len(text) / self.chars_per_token + 0.5))
+
+    def chars_for(self, tokens: int) -> int:
+        return max(0, int(tokens * self.chars_per_token))
+
+    def observe(self, chars: int, tokens: int) -> None:
+        if chars <= 0 or tokens <= 0:
+            return
+        ratio = min(self.max_ratio, max(self.min_ratio, chars / tokens))
+        with self._lock:
+            self.chars_per_token += self.alpha * (ratio - self.chars_per_token)
+            self._observations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"chars_per_token": self.chars_per_token, "observations": self._observations}
+
+
+token_estimator = TokenEstimator()
+
+
+def estimate_prompt_tokens(prompt) -> int:
+    # Ước lượng theo tỉ lệ ký tự/token đã hiệu chỉnh, đủ cho việc chia quota
+    if isinstance(prompt, str):
+        return max(1, token_estimator.count(prompt))
+    if isinstance(prompt, (list, tuple)):
+        return sum(estimate_prompt_tokens(p) for p in prompt)
+    return 1
+
+
+class TokenBucket:
+    """
+    Token bucket theo phút. Cho phép số dư âm: mỗi lần reserve trả về thời gian
+    caller phải chờ, nhờ vậy các caller được xếp hàng theo thứ tự reserve.
+    """
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = float(per_minute)
+        self._clock = clock
+        self._updated = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount: float) -> float:
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        deficit = min(amount, self.capacity) - self.tokens
+        return deficit / self.rate if deficit > 0 else 0.0
+
+    def consume(self, amount: float) -> None:
+        if not self.unlimited:
+            self.tokens -= min(amount, self.capacity)
+
+
+class RateLimitedModel:
+    """
+    Bọc model Gemini: giới hạn requests/phút và tokens/phút dùng chung cho cả process,
+    xếp hàng caller tới deadline và retry 429 với backoff có jitter.
+    """
+
+    def __init__(self, model, rpm: int, tpm: int,
+                 expected_output_tokens: int = 512,
+                 deadline: float = 30.0,
+                 max_retries: int = 4,
+                 backoff_base: float = 1.0,
+                 backoff_max: float = 16.0,
+                 clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self._model = model
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm, clock)
+        self._tokens = TokenBucket(tpm, clock)
+        self.expected_output_tokens = expected_output_tokens
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stats = {
+            "calls": 0,
+            "queue_depth": 0,
+            "max_queue_depth": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "retries": 0,
+            "rejected": 0,
+        }
+
+    def generate_content(self, prompt, **kwargs):
+        deadline_at = self._clock() + self.deadline
+        cost = estimate_prompt_tokens(prompt) + self.expected_output_tokens
+        attempt = 0
+
+        while True:
+            self._acquire(cost, deadline_at)
+            try:
+                resp = self._model.generate_content(prompt, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                if attempt >= self.max_retries:
+                    self._bump("rejected")
+                    raise RateLimitExceeded(f"Gemini rate limit after {attempt} retries: {e}") from e
+
+                attempt += 1
+                cap = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                delay = random.uniform(cap / 2, cap)
+                if self._clock() + delay > deadline_at:
+                    self._bump("rejected")
+                    raise RateLimitExceeded(f"Gemini rate limit, deadline exceeded: {e}") from e
+
+                self._bump("retries")
+                self._sleep(delay)
+                continue
+
+            if isinstance(prompt, str) and not kwargs.get("stream"):
+                self._observe_usage(prompt, resp)
+            return resp
+
+    def _observe_usage(self, prompt: str, resp) -> None:
+        usage = getattr(resp, "usage_metadata", None)
+        tokens = getattr(usage, "prompt_token_count", 0) if usage is not None else 0
+        if isinstance(tokens, int) and tokens > 0:
+            token_estimator.observe(len(prompt), tokens)
+
+    def _acquire(self, cost: float, deadline_at: float) -> None:
+        with self._lock:
+            wait = max(self._requests.wait_for(1), self._tokens.wait_for(cost))
+            if self._clock() + wait > deadline_at:
+                self._stats["rejected"] += 1
+                raise RateLimitExceeded("Rate limit queue deadline exceeded")
+            self._requests.consume(1)
+            self._tokens.consume(cost)
+            self._stats["calls"] += 1
+            self._stats["total_wait_seconds"] += wait
+            self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+            if wait > 0:
+                self._stats["queue_depth"] += 1
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queue_depth"])
+
+        if wait > 0:
+            try:
+                self._sleep(wait)
+            finally:
+                self._bump("queue_depth", -1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_wait_seconds"] = stats["total_wait_seconds"] / stats["calls"] if stats["calls"] else 0.0
+        return stats
+
+    def _bump(self, key: str, delta=1) -> None:
+        with self._lock:
+            self._stats[key] += delta
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
@@ -0,0 +1,135 @@
+import datetime
+import os
+import socket
+import threading
+import uuid
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import STATUS_SCHEDULER_ENABLED, STATUS_SCHEDULER_INTERVAL_SECONDS
+from extensions.mongo import db
+
+
+class LeaderLease:
+    """
+    Lease trong Mongo để khi chạy nhiều worker chỉ 1 worker làm job định kỳ.
+    """
+
+    def __init__(self, collection, name: str, ttl_seconds: float):
+        self._col = collection
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self) -> bool:
+        now = datetime.datetime.utcnow()
+        try:
+            doc = self._col.find_one_and_update(
+                {"_id": self.name, "$or": [{"expires_at": {"$lt": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "expires_at": now + datetime.timedelta(seconds=self.ttl_seconds)}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # worker khác đang giữ lease
+            return False
+        return bool(doc) and doc.get("owner") == self.owner
+
+
+class StatusScheduler:
+    """
+    Định kỳ chuyển interview/revision tới giờ available_at từ Unavailable sang Available
+    bằng 1 update_many mỗi collection. Ngủ tới đúng thời điểm đến hạn gần nhất
+    nếu nó sớm hơn interval.
+    """
+
+    def __init__(self, database, interval: float = 30.0, enabled: bool = True):
+        self._db = database
+        self.interval = interval
+        self.enabled = enabled
+        self.collections = ["interviews", "revisions"]
+        self._lease = LeaderLease(database["scheduler_leases"], "status_flip", ttl_seconds=interval * 3)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"runs": 0, "led_runs": 0, "flipped": 0, "errors": 0, "last_run": None}
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="status-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> int:
+        """
+        Chạy 1 lượt nếu giữ được lease. Trả về số document đã chuyển trạng thái.
+        """
+        now = datetime.datetime.utcnow()
+        flipped = 0
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["last_run"] = now.isoformat() + "Z"
+        if not self._lease.acquire():
+            return 0
+
+        for name in self.collections:
+            result = self._db[name].update_many(
+                {"status": "Unavailable", "available_at": {"$lte": now}},
+                {"$set": {"status": "Available"}},
+            )
+            flipped += result.modified_count
+
+        with self._lock:
+            self._stats["led_runs"] += 1
+            self._stats["flipped"] += flipped
+        return flipped
+
+    def next_due_in(self) -> float:
+        """
+        Số giây tới document Unavailable đến hạn sớm nhất, tối đa interval.
+        """
+        now = datetime.datetime.utcnow()
+        wait = self.interval
+        for name in self.collections:
+            doc = self._db[name].find_one(
+                {"status": "Unavailable", "available_at": {"$gt": now}},
+                {"available_at": 1},
+                sort=[("available_at", 1)],
+            )
+            if doc and isinstance(doc.get("available_at"), datetime.datetime):
+                wait = min(wait, (doc["available_at"] - now).total_seconds())
+        return max(wait, 0.5)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["owner"] = self._lease.owner
+        stats["interval_seconds"] = self.interval
+        return stats
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            wait = self.interval
+            try:
+                self.run_once()
+                wait = self.next_due_in()
+            except Exception as e:
+                print("Status scheduler error:", e)
+                with self._lock:
+                    self._stats["errors"] += 1
+            self._stop.wait(wait)
+
+
+status_scheduler = StatusScheduler(
+    db,
+    interval=STATUS_SCHEDULER_INTERVAL_SECONDS,
+    enabled=STATUS_SCHEDULER_ENABLED,
+)
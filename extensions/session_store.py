@@ -0,0 +1,415 @@
+import datetime
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from config import (
+    SESSION_STORE,
+    SESSION_STORE_LOCAL_TTL_SECONDS,
+    SESSION_IDLE_TTL_SECONDS,
+    SESSION_MAX_ENTRIES,
+    SESSION_SWEEP_INTERVAL_SECONDS,
+)
+from extensions.mongo import db
+
+
+class SessionStore(ABC):
+    """
+    Lưu trạng thái các session interview/revision đang diễn ra.
+    Session trả về từ get() chỉ để đọc, mọi thay đổi phải đi qua các thao tác atomic bên dưới.
+
+    Session bị bỏ dở (không gọi /end) được dọn theo idle TTL và số entry tối đa;
+    on_evict(session) được gọi để lưu trạng thái trước khi bỏ.
+    """
+
+    def __init__(self, idle_ttl: float = 3 * 3600, max_entries: int = 20000, sweep_interval: float = 60):
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.on_evict: Optional[Callable[[dict], None]] = None
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+        self._sweeping = False
+        self._evictions = {"idle": 0, "capacity": 0, "flush_errors": 0}
+
+    def maybe_sweep(self) -> None:
+        """
+        Chạy sweep ở thread nền nếu đã tới hạn, không chặn request hiện tại.
+        """
+        now = time.monotonic()
+        with self._sweep_lock:
+            if self._sweeping or now - self._last_sweep < self.sweep_interval:
+                return
+            self._sweeping = True
+            self._last_sweep = now
+        threading.Thread(target=self.sweep, name="session-sweep", daemon=True).start()
+
+    def sweep(self) -> int:
+        try:
+            evicted = self._collect_evicted()
+            for session, reason in evicted:
+                self._evictions[reason] += 1
+                if self.on_evict is None:
+                    continue
+                try:
+                    self.on_evict(session)
+                except Exception as e:
+                    print("Session evict flush error:", e)
+                    self._evictions["flush_errors"] += 1
+            return len(evicted)
+        finally:
+            with self._sweep_lock:
+                self._sweeping = False
+
+    def stats(self) -> dict:
+        entries, approx_bytes = self._usage()
+        return {
+            "entries": entries,
+            "approx_bytes": approx_bytes,
+            "evictions": dict(self._evictions),
+            "idle_ttl_seconds": self.idle_ttl,
+            "max_entries": self.max_entries,
+        }
+
+    @abstractmethod
+    def _collect_evicted(self) -> List[Tuple[dict, str]]:
+        """
+        Gỡ các session hết hạn/vượt quota khỏi store, trả về [(session, lý do)].
+        """
+
+    @abstractmethod
+    def _usage(self) -> Tuple[int, int]:
+        """
+        Trả về (số session, số byte ước lượng) cho stats().
+        """
+
+    @abstractmethod
+    def create(self, session: dict) -> None:
+        """
+        Thêm session mới, session["id"] là khoá.
+        """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[dict]:
+        """
+        Đọc session (chỉ đọc) và làm mới thời điểm truy cập để session đang dùng không bị dọn.
+        """
+
+    @abstractmethod
+    def append_answer(self, session_id: str, question, answer) -> Optional[int]:
+        """
+        Thêm 1 lượt hỏi/đáp vào qa_log (chỉ phần chưa tóm tắt; lịch sử đầy đủ được answer_writer
+        ghi vào document session). Trả về độ dài qa_log sau khi thêm, None nếu không có session.
+        """
+
+    @abstractmethod
+    def replace_summary(self, session_id: str, summary: str, version: int, drop: int) -> bool:
+        """
+        Đặt summary mới và bỏ drop phần tử đầu qa_log, chỉ khi summary_version vẫn là version
+        (tránh 2 worker cùng tóm tắt 1 đoạn). Trả True nếu đã áp dụng.
+        """
+
+    @abstractmethod
+    def replace_coverage(self, session_id: str, coverage: dict, version: int) -> bool:
+        """
+        Đặt trạng thái phủ chunk mới, chỉ khi coverage_version vẫn là version (đọc - rút - ghi
+        của request và prefetch không ghi đè nhau). Trả True nếu đã áp dụng.
+        """
+
+    @abstractmethod
+    def pop_question(self, session_id: str) -> Optional[dict]:
+        """
+        Lấy câu hỏi đầu hàng đợi question_queue, None nếu hàng đợi rỗng.
+        """
+
+    @abstractmethod
+    def push_questions(self, session_id: str, items: List[dict]) -> None:
+        """
+        Thêm các câu hỏi vào cuối hàng đợi question_queue.
+        """
+
+    @abstractmethod
+    def update(self, session_id: str, fields: dict) -> None:
+        """
+        Ghi đè các field top-level của session.
+        """
+
+    @abstractmethod
+    def delete(self, session_id: str) -> Optional[dict]:
+        """
+        Gỡ session khỏi store, trả về session đã gỡ (None nếu không có).
+        """
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Dict trong process, như INTERVIEW_CACHE/REVISION_CACHE trước đây. Chỉ dùng với 1 worker.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # thứ tự theo lần truy cập cuối, cũ nhất ở đầu
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def create(self, session: dict) -> None:
+        session.setdefault("summary_version", 0)
+        session.setdefault("coverage_version", 0)
+        with self._lock:
+            self._sessions[session["id"]] = session
+            self._touch(session["id"])
+        self.maybe_sweep()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._touch(session_id)
+        self.maybe_sweep()
+        return session
+
+    def append_answer(self, session_id, question, answer):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            session["qa_log"].append({"question": question, "answer": answer})
+            self._touch(session_id)
+            return len(session["qa_log"])
+
+    def replace_summary(self, session_id, summary, version, drop):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.get("summary_version", 0) != version:
+                return False
+            session["summary"] = summary
+            session["qa_log"] = session["qa_log"][drop:]
+            session["summary_version"] = version + 1
+            return True
+
+    def replace_coverage(self, session_id, coverage, version):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.get("coverage_version", 0) != version:
+                return False
+            session["coverage"] = coverage
+            session["coverage_version"] = version + 1
+            return True
+
+    def pop_question(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            self._touch(session_id)
+            queue = session.get("question_queue")
+            return queue.pop(0) if queue else None
+
+    def push_questions(self, session_id, items):
+        if not items:
+            return
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.setdefault("question_queue", []).extend(items)
+
+    def update(self, session_id, fields):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.update(fields)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._touched.pop(session_id, None)
+            return self._sessions.pop(session_id, None)
+
+    def _touch(self, session_id):
+        self._touched[session_id] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+
+    def _collect_evicted(self):
+        cutoff = time.monotonic() - self.idle_ttl
+        evicted = []
+        with self._lock:
+            while self._sessions:
+                session_id = next(iter(self._sessions))
+                over_capacity = len(self._sessions) > self.max_entries
+                idle = self._touched.get(session_id, 0) < cutoff
+                if not (over_capacity or idle):
+                    break
+                self._touched.pop(session_id, None)
+                evicted.append((self._sessions.pop(session_id), "idle" if idle else "capacity"))
+        return evicted
+
+    def _usage(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        approx = sum(len(json.dumps(s, ensure_ascii=False, default=str)) for s in sessions)
+        return len(sessions), approx
+
+
+class MongoSessionStore(SessionStore):
+    """
+    Session lưu trong Mongo để mọi worker đều thấy, thao tác cập nhật là atomic trên 1 document.
+    Có thêm tầng đọc trong process với TTL ngắn, bị xoá ngay khi process tự ghi.
+    """
+
+    def __init__(self, collection, local_ttl: float = 2.0, **kwargs):
+        super().__init__(**kwargs)
+        self._col = collection
+        self.local_ttl = local_ttl
+        self._local: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def create(self, session: dict) -> None:
+        doc = dict(session)
+        doc["_id"] = session["id"]
+        doc.setdefault("summary_version", 0)
+        doc.setdefault("coverage_version", 0)
+        doc["updated_at"] = datetime.datetime.utcnow()
+        self._col.insert_one(doc)
+        self.maybe_sweep()
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(session_id)
+            if entry and now - entry[0] < self.local_ttl:
+                return entry[1]
+
+        self.maybe_sweep()
+        # đọc cũng tính là hoạt động (như MemorySessionStore), tránh bị dọn theo idle TTL khi đang dùng
+        doc = self._col.find_one_and_update(
+            {"_id": session_id},
+            {"$currentDate": {"updated_at": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc is not None:
+            doc.pop("_id", None)
+            with self._lock:
+                self._local[session_id] = (now, doc)
+        return doc
+
+    def append_answer(self, session_id, question, answer):
+        doc = self._col.find_one_and_update(
+            {"_id": session_id},
+            {
+                "$push": {"qa_log": {"question": question, "answer": answer}},
+                "$currentDate": {"updated_at": True},
+            },
+            projection={"qa_log": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        self._forget(session_id)
+        return len(doc["qa_log"]) if doc else None
+
+    def replace_summary(self, session_id, summary, version, drop):
+        result = self._col.update_one(
+            {"_id": session_id, "summary_version": version},
+            [{"$set": {
+                "summary": summary,
+                "qa_log": {"$slice": ["$qa_log", drop, {"$max": [{"$size": "$qa_log"}, 1]}]},
+                "summary_version": version + 1,
+                "updated_at": "$$NOW",
+            }}],
+        )
+        self._forget(session_id)
+        return result.modified_count == 1
+
+    def replace_coverage(self, session_id, coverage, version):
+        result = self._col.update_one(
+            {"_id": session_id, "coverage_version": version},
+            {"$set": {"coverage": coverage, "coverage_version": version + 1}, "$currentDate": {"updated_at": True}},
+        )
+        # thua thì bỏ bản đọc trong process để lần thử lại đọc version mới từ Mongo
+        self._forget(session_id)
+        return result.modified_count == 1
+
+    def pop_question(self, session_id):
+        doc = self._col.find_one_and_update(
+            {"_id": session_id, "question_queue.0": {"$exists": True}},
+            {"$pop": {"question_queue": -1}, "$currentDate": {"updated_at": True}},
+            projection={"question_queue": {"$slice": 1}},
+            return_document=ReturnDocument.BEFORE,
+        )
+        self._forget(session_id)
+        if not doc or not doc.get("question_queue"):
+            return None
+        return doc["question_queue"][0]
+
+    def push_questions(self, session_id, items):
+        if not items:
+            return
+        self._col.update_one(
+            {"_id": session_id},
+            {"$push": {"question_queue": {"$each": list(items)}}, "$currentDate": {"updated_at": True}},
+        )
+        self._forget(session_id)
+
+    def update(self, session_id, fields):
+        self._col.update_one(
+            {"_id": session_id},
+            {"$set": dict(fields), "$currentDate": {"updated_at": True}},
+        )
+        self._forget(session_id)
+
+    def delete(self, session_id):
+        doc = self._col.find_one_and_delete({"_id": session_id})
+        self._forget(session_id)
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
+
+    def _forget(self, session_id):
+        with self._lock:
+            self._local.pop(session_id, None)
+
+    def _collect_evicted(self):
+        # find_one_and_delete để chỉ 1 worker nhận và flush mỗi session
+        evicted = []
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.idle_ttl)
+        for doc in self._col.find({"updated_at": {"$lt": cutoff}}, {"_id": 1}):
+            session = self.delete(doc["_id"])
+            if session is not None:
+                evicted.append((session, "idle"))
+
+        excess = self._col.estimated_document_count() - self.max_entries
+        if excess > 0:
+            for doc in self._col.find({}, {"_id": 1}).sort("updated_at", 1).limit(excess):
+                session = self.delete(doc["_id"])
+                if session is not None:
+                    evicted.append((session, "capacity"))
+        return evicted
+
+    def _usage(self):
+        result = list(self._col.aggregate([
+            {"$group": {"_id": None, "count": {"$sum": 1}, "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}},
+        ]))
+        if not result:
+            return 0, 0
+        return result[0]["count"], result[0]["bytes"]
+
+
+def make_session_store(name: str) -> SessionStore:
+    limits = {
+        "idle_ttl": SESSION_IDLE_TTL_SECONDS,
+        "max_entries": SESSION_MAX_ENTRIES,
+        "sweep_interval": SESSION_SWEEP_INTERVAL_SECONDS,
+    }
+    if SESSION_STORE == "mongo":
+        return MongoSessionStore(
+            db[f"active_{name}_sessions"],
+            local_ttl=SESSION_STORE_LOCAL_TTL_SECONDS,
+            **limits,
+        )
+    return MemorySessionStore(**limits)
@@ -0,0 +1,170 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from config import WRITE_BEHIND_ENABLED, WRITE_BEHIND_FLUSH_SECONDS, WRITE_BEHIND_MAX_BATCH
+from extensions.mongo import db
+
+
+class WriteBehindBuffer:
+    """
+    Gom các câu trả lời mới theo (collection, session) rồi ghi xuống Mongo theo lô
+    bằng bulk_write $push mỗi flush_interval giây. Flush lại lần cuối khi process tắt.
+
+    Buffer nằm trong process nên chỉ an toàn khi 1 worker giữ toàn bộ session (SESSION_STORE=memory):
+    /end ở worker khác không flush được phần đang chờ ở worker này. Với enabled=False (luôn như vậy
+    khi SESSION_STORE=mongo) append ghi thẳng xuống Mongo.
+    """
+
+    def __init__(self, database, flush_interval: float = 1.0, max_batch: int = 500, enabled: bool = True,
+                 max_attempts: int = 5):
+        self._db = database
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.enabled = enabled
+        # số lần ghi lỗi tối đa của 1 session trước khi bỏ phần đang chờ (vd: document vượt 16 MB)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # flush tuần tự để các $push của cùng 1 session không bị đảo thứ tự
+        self._flush_lock = threading.Lock()
+        self._pending: "OrderedDict[Tuple[str, str], Dict[str, list]]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "appended": 0, "flushes": 0, "ops_written": 0, "errors": 0,
+            "ops_failed": 0, "ops_requeued": 0, "ops_dropped": 0, "direct_writes": 0,
+        }
+        self._last_error: Optional[str] = None
+        atexit.register(self.flush)
+
+    def append(self, collection_name: str, session_id: str, question, answer) -> None:
+        if not self.enabled:
+            self._db[collection_name].update_one(
+                {"_id": session_id},
+                {"$push": {"questions": question, "answers": answer}},
+            )
+            with self._lock:
+                self._stats["appended"] += 1
+                self._stats["direct_writes"] += 1
+            return
+
+        with self._lock:
+            entry = self._pending.setdefault(
+                (collection_name, session_id), {"questions": [], "answers": [], "attempts": 0},
+            )
+            entry["questions"].append(question)
+            entry["answers"].append(answer)
+            self._stats["appended"] += 1
+            pending_ops = len(self._pending)
+        self._ensure_thread()
+        if pending_ops >= self.max_batch:
+            threading.Thread(target=self.flush, daemon=True).start()
+
+    def flush(self, collection_name: Optional[str] = None, session_id: Optional[str] = None) -> int:
+        """
+        Ghi phần đang chờ. Truyền collection_name + session_id để chỉ flush 1 session (vd: khi /end).
+        Trả về số session đã ghi.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if session_id is not None:
+                    key = (collection_name, session_id)
+                    batch = {key: self._pending.pop(key)} if key in self._pending else {}
+                else:
+                    batch = dict(self._pending)
+                    self._pending.clear()
+            if not batch:
+                return 0
+
+            # ops[i] ứng với keys[i] để map index trong writeErrors về session
+            by_collection: Dict[str, Tuple[list, list]] = {}
+            for key, entry in batch.items():
+                keys, ops = by_collection.setdefault(key[0], ([], []))
+                keys.append(key)
+                ops.append(UpdateOne(
+                    {"_id": key[1]},
+                    {"$push": {
+                        "questions": {"$each": entry["questions"]},
+                        "answers": {"$each": entry["answers"]},
+                    }},
+                ))
+
+            written = 0
+            for col_name, (keys, ops) in by_collection.items():
+                try:
+                    self._db[col_name].bulk_write(ops, ordered=False)
+                    written += len(ops)
+                except BulkWriteError as e:
+                    # ordered=False: các op không có trong writeErrors đã được ghi
+                    failed = [keys[err["index"]] for err in e.details.get("writeErrors", [])]
+                    written += len(ops) - len(failed)
+                    self._record_error(e, len(failed))
+                    self._requeue(failed, batch)
+                except Exception as e:
+                    # lỗi kết nối/timeout: không biết op nào đã ghi, đưa lại cả lô
+                    self._record_error(e, len(ops))
+                    self._requeue(keys, batch)
+
+            with self._lock:
+                self._stats["flushes"] += 1
+                self._stats["ops_written"] += written
+            return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_sessions"] = len(self._pending)
+            stats["last_error"] = self._last_error
+            stats["enabled"] = self.enabled
+        return stats
+
+    def _record_error(self, error: Exception, failed_ops: int) -> None:
+        with self._lock:
+            self._stats["errors"] += 1
+            self._stats["ops_failed"] += failed_ops
+            self._last_error = f"{type(error).__name__}: {error}"
+
+    def _requeue(self, keys: list, batch: dict) -> None:
+        # đưa phần ghi lỗi về trước phần mới được thêm trong lúc flush
+        with self._lock:
+            for key in keys:
+                entry = batch[key]
+                if entry["attempts"] + 1 >= self.max_attempts:
+                    self._stats["ops_dropped"] += 1
+                    continue
+                newer = self._pending.pop(key, {"questions": [], "answers": []})
+                self._pending[key] = {
+                    "questions": entry["questions"] + newer["questions"],
+                    "answers": entry["answers"] + newer["answers"],
+                    "attempts": entry["attempts"] + 1,
+                }
+                self._stats["ops_requeued"] += 1
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                self._record_error(e, 0)
+
+
+answer_writer = WriteBehindBuffer(
+    db,
+    flush_interval=WRITE_BEHIND_FLUSH_SECONDS,
+    max_batch=WRITE_BEHIND_MAX_BATCH,
+    enabled=WRITE_BEHIND_ENABLED,
+)
@@ -0,0 +1,63 @@
+# Benchmark làm sạch + chunk trên văn bản tiếng Việt tổng hợp 1 MB, 10 MB, 50 MB.
+#   python -m pytest tests/benchmarks --benchmark-only
+# Bỏ qua khi chạy test thường: python -m pytest --benchmark-skip
+import random
+
+import pytest
+
+from utils.chunking import chunk_syllabus, clean_text_keep_printable
+
+pytest.importorskip("pytest_benchmark")
+
+MB = 1_000_000
+SIZES_MB = [1, 10, 50]
+
+_WORDS = ["học", "máy", "tính", "toán", "dữ", "liệu", "mô", "hình", "đạo", "hàm", "giải", "thuật",
+          "cấu", "trúc", "mạng", "nơ-ron", "xác", "suất", "thống", "kê", "biến", "đổi", "ma", "trận"]
+_ENDINGS = [". ", ". ", "? ", "! ", "\n", ", "]
+_TEXTS = {}
+
+
+def vietnamese_text(size_mb: int) -> str:
+    """
+    Văn bản tổng hợp size_mb MB (theo số ký tự): 1 MB câu ngẫu nhiên, lặp lại tới đủ độ dài.
+    """
+    if size_mb not in _TEXTS:
+        if 1 not in _TEXTS:
+            rng = random.Random(0)
+            parts = []
+            size = 0
+            while size < MB:
+                sentence = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(5, 20)))
+                sentence = sentence.capitalize() + rng.choice(_ENDINGS)
+                parts.append(sentence)
+                size += len(sentence)
+            _TEXTS[1] = "".join(parts)[:MB]
+        _TEXTS[size_mb] = _TEXTS[1] * size_mb
+    return _TEXTS[size_mb]
+
+
+def _rounds(size_mb: int) -> int:
+    return max(1, 10 // size_mb)
+
+
+@pytest.mark.parametrize("size_mb", SIZES_MB)
+def test_clean_text(benchmark, size_mb):
+    text = vietnamese_text(size_mb)
+    result = benchmark.pedantic(clean_text_keep_printable, args=(text,), rounds=_rounds(size_mb), iterations=1)
+    assert len(result) == len(text)
+
+
+@pytest.mark.parametrize("snap,overlap", [(None, 0), ("sentence", 0), ("sentence", 200)])
+@pytest.mark.parametrize("size_mb", SIZES_MB)
+def test_chunk_syllabus(benchmark, size_mb, snap, overlap):
+    text = vietnamese_text(size_mb)
+    chunks = benchmark.pedantic(
+        chunk_syllabus,
+        args=(text,),
+        kwargs={"chunk_size": 5000, "overlap": overlap, "snap": snap},
+        rounds=_rounds(size_mb),
+        iterations=1,
+    )
+    assert chunks[-1]["end_offset"] == len(text)
+    assert len(chunks) >= size_mb * MB // 5000
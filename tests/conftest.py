@@ -0,0 +1,43 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# config.py đọc biến môi trường lúc import; test dùng Mongo local và DB riêng
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI", "mongodb://localhost:27017")
+MONGO_TEST_DB = os.getenv("MONGO_TEST_DB", "ainterview_test")
+os.environ.setdefault("MONGO_URI", MONGO_TEST_URI)
+os.environ.setdefault("MONGO_DB_NAME", MONGO_TEST_DB)
+
+
+@pytest.fixture(scope="session")
+def mongo_client():
+    """
+    MongoClient tới Mongo local (MONGO_TEST_URI), kiểm tra kết nối 1 lần. Skip nếu không có mongod.
+    """
+    from pymongo import MongoClient
+    from pymongo.errors import PyMongoError
+
+    client = MongoClient(MONGO_TEST_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"no MongoDB at {MONGO_TEST_URI}: {e}")
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mongo_collection(mongo_client):
+    """
+    Collection tạm trong MONGO_TEST_DB, xoá sau test.
+    """
+    col = mongo_client[MONGO_TEST_DB][f"test_{uuid.uuid4().hex}"]
+    yield col
+    col.drop()
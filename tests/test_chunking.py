@@ -0,0 +1,80 @@
+import pytest
+
+from utils.chunking import chunk_syllabus, clean_text_keep_printable, iter_chunks
+
+WORDS = ["học", "máy", "tính", "toán", "dữ", "liệu", "mô", "hình", "đạo", "hàm"]
+
+
+def make_text(n_words: int) -> str:
+    sentences = []
+    for i in range(0, n_words, 12):
+        words = [WORDS[(i * 7 + j * 3) % len(WORDS)] for j in range(12)]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def assert_offsets(cleaned: str, chunks: list) -> None:
+    # content là đoạn text đã làm sạch [start_offset, end_offset) bỏ khoảng trắng hai đầu
+    for c in chunks:
+        assert c["content"]
+        assert cleaned[c["start_offset"]:c["end_offset"]].strip() == c["content"]
+
+
+def test_clean_text_replaces_line_breaks_and_drops_control_chars():
+    assert clean_text_keep_printable("dòng 1\ndòng\t2\r\n\x00\x07ok​😀") == "dòng 1 dòng 2  ok😀"
+
+
+@pytest.mark.parametrize("snap", [None, "whitespace", "sentence"])
+@pytest.mark.parametrize("overlap", [0, 100])
+def test_chunks_keep_offset_contract(snap, overlap):
+    text = make_text(3000)
+    chunks = chunk_syllabus(text, chunk_size=1000, overlap=overlap, snap=snap)
+
+    assert_offsets(clean_text_keep_printable(text), chunks)
+    assert chunks[0]["start_offset"] == 0
+    assert chunks[-1]["end_offset"] == len(text)
+    for prev, cur in zip(chunks, chunks[1:]):
+        assert cur["end_offset"] > prev["end_offset"]
+        assert cur["start_offset"] <= prev["end_offset"]
+        if not overlap:
+            assert cur["start_offset"] == prev["end_offset"]
+
+
+def test_no_snap_cuts_exactly_at_chunk_size():
+    text = "a" * 2500
+    chunks = chunk_syllabus(text, chunk_size=1000)
+    assert [(c["start_offset"], c["end_offset"]) for c in chunks] == [(0, 1000), (1000, 2000), (2000, 2500)]
+
+
+def test_sentence_snap_ends_chunks_on_sentence_boundary():
+    chunks = chunk_syllabus(make_text(3000), chunk_size=1000, snap="sentence")
+    for c in chunks[:-1]:
+        assert c["content"].endswith(".")
+
+
+def test_overlap_does_not_emit_pure_overlap_tail():
+    text = ("abcd " * 400)[:1900]
+    chunks = chunk_syllabus(text, chunk_size=1000, overlap=100)
+    assert [(c["start_offset"], c["end_offset"]) for c in chunks] == [(0, 1000), (900, 1900)]
+
+
+def test_pages_are_tracked_across_chunk_boundaries():
+    pages = [(n, make_text(300)) for n in range(1, 6)]
+    cleaned = "".join(clean_text_keep_printable(t) for _, t in pages)
+    page_starts = []
+    offset = 0
+    for _, t in pages:
+        page_starts.append(offset)
+        offset += len(clean_text_keep_printable(t))
+
+    chunks = list(iter_chunks(pages, chunk_size=1000, snap="sentence"))
+    assert_offsets(cleaned, chunks)
+    for c in chunks:
+        expected_start = max(n for n, start in enumerate(page_starts, 1) if start <= c["start_offset"])
+        expected_end = max(n for n, start in enumerate(page_starts, 1) if start <= c["end_offset"] - 1)
+        assert (c["page_start"], c["page_end"]) == (expected_start, expected_end)
+
+
+def test_empty_and_blank_input():
+    assert chunk_syllabus("") == []
+    assert chunk_syllabus(" \n\t ") == []
@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+import blueprints.interview as interview_bp
+from extensions.session_store import MemorySessionStore
+from utils.coverage import draw_positions
+
+N_CHUNKS = 120
+
+
+class FakeChunkIndex:
+    strategy = "cache"
+
+    def ids(self, owner_id):
+        return [f"c{i}" for i in range(N_CHUNKS)]
+
+
+class NoRetrieval:
+    def top_positions(self, owner_id, query, k, n):
+        return []
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(interview_bp, "INTERVIEW_CACHE", store)
+    monkeypatch.setattr(interview_bp, "syllabus_chunk_index", FakeChunkIndex())
+    monkeypatch.setattr(interview_bp, "syllabus_retrieval", NoRetrieval())
+
+    def slow_draw(*args, **kwargs):
+        # nới rộng khoảng đọc - ghi để các thread chắc chắn chen nhau
+        result = draw_positions(*args, **kwargs)
+        time.sleep(0.002)
+        return result
+
+    monkeypatch.setattr(interview_bp, "draw_positions", slow_draw)
+    return store
+
+
+def test_draw_positions_covers_every_chunk_once_per_round():
+    state, seen = None, []
+    for _ in range(N_CHUNKS // 3):
+        state, positions = draw_positions(state, N_CHUNKS, 3, [5, 7])
+        seen.extend(positions)
+    assert sorted(seen) == list(range(N_CHUNKS))
+
+
+def test_concurrent_draws_do_not_reuse_chunks(store):
+    store.create({"id": "s1", "coverage": None})
+    threads_n, draws_per_thread, k = 4, 10, 3
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(draws_per_thread):
+            # mỗi lượt giống request/prefetch: snapshot riêng chỉ mang session id
+            chunks = interview_bp.select_chunks_for_question({"id": "s1"}, "syl", "", system=False, k=k)
+            with lock:
+                results.extend(chunks)
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # 4 * 10 * 3 = 120 = N_CHUNKS: đúng 1 vòng, không chunk nào bị rút 2 lần
+    assert len(results) == N_CHUNKS
+    assert len(set(results)) == N_CHUNKS
+    assert store.get("s1")["coverage_version"] == threads_n * draws_per_thread
+
+
+def test_replace_coverage_rejects_stale_version():
+    store = MemorySessionStore()
+    store.create({"id": "s1", "coverage": None})
+
+    assert store.replace_coverage("s1", {"cursor": 3}, 0) is True
+    assert store.replace_coverage("s1", {"cursor": 6}, 0) is False
+    assert store.get("s1")["coverage"] == {"cursor": 3}
+    assert store.replace_coverage("missing", {"cursor": 1}, 0) is False
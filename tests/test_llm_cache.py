@@ -0,0 +1,63 @@
+import datetime
+
+from extensions.llm_cache import LLMResponseCache
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = dict(doc)
+
+    def create_index(self, *args, **kwargs):
+        pass
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+
+def make_cache(ttl_seconds=60):
+    return LLMResponseCache(FakeCollection(), max_entries=10, ttl_seconds=ttl_seconds,
+                            max_docs=100, max_entry_bytes=10_000)
+
+
+def age(cache, key, seconds):
+    created_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=seconds)
+    cache._lru[key] = (created_at, cache._lru[key][1])
+    cache._col.docs[key]["created_at"] = created_at
+
+
+def test_memory_hit_within_ttl():
+    cache = make_cache()
+    cache.put("k", '{"a": 1}')
+    assert cache.get("k") == '{"a": 1}'
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_memory_tier_expires_with_ttl():
+    cache = make_cache(ttl_seconds=60)
+    cache.put("k", '{"a": 1}')
+    age(cache, "k", 120)
+
+    assert cache.get("k") is None
+    assert cache.stats()["memory_entries"] == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_mongo_hit_keeps_original_created_at():
+    cache = make_cache(ttl_seconds=60)
+    cache.put("k", '{"a": 1}')
+    age(cache, "k", 50)
+    cache.clear_memory()
+
+    assert cache.get("k") == '{"a": 1}'
+    assert cache.stats()["mongo_hits"] == 1
+    # entry nạp lại từ Mongo vẫn hết hạn theo thời điểm tạo ban đầu
+    cache._lru["k"] = (cache._lru["k"][0] - datetime.timedelta(seconds=20), cache._lru["k"][1])
+    cache._col.docs["k"]["created_at"] = cache._lru["k"][0]
+    assert cache.get("k") is None
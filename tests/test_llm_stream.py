@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+import extensions.llm as llm
+from extensions.llm import JsonFieldStreamer, stream_llm_json
+from utils.sse import llm_question_events
+
+# Output JSON thô như Gemini stream: có \", \\ và emoji dạng cặp surrogate \ud83d\ude00
+RAW = (
+    '{"question": "Giải thích \\"deadlock\\" trong C:\\\\Windows \\ud83d\\ude00 và \\u00e9\\nhết", '
+    '"question_type": "open_ended", "answer": "..."}'
+)
+QUESTION = 'Giải thích "deadlock" trong C:\\Windows 😀 và é\nhết'
+
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStreamingModel:
+    def __init__(self, pieces):
+        self.pieces = pieces
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        assert stream
+        return iter([Chunk(p) for p in self.pieces])
+
+
+def split_every(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def split_at(text: str, *cuts):
+    bounds = [0, *cuts, len(text)]
+    return [text[a:b] for a, b in zip(bounds, bounds[1:])]
+
+
+def parse_sse(frames):
+    events = []
+    for frame in frames:
+        assert frame.endswith("\n\n")
+        event_line, data_line = frame[:-2].split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+@pytest.mark.parametrize("size", range(1, 16))
+def test_streamer_decodes_field_for_any_chunking(size):
+    streamer = JsonFieldStreamer("question")
+    out = "".join(streamer.feed(piece) for piece in split_every(RAW, size))
+    assert out == QUESTION
+    assert streamer.done
+    out.encode("utf-8")
+
+
+@pytest.mark.parametrize("marker,offset", [
+    ('\\"deadlock', 1),      # giữa \ và "
+    ('\\\\Windows', 1),      # giữa 2 backslash
+    ("\\ud83d", 3),          # giữa \uXXXX
+    ("\\ude00", 0),          # giữa nửa đầu và nửa sau của cặp surrogate
+    ("\\ude00", 1),          # sau backslash của nửa sau
+    ("\\ude00", 4),          # giữa hex của nửa sau
+])
+def test_streamer_waits_for_split_escapes(marker, offset):
+    cut = RAW.index(marker) + offset
+    streamer = JsonFieldStreamer("question")
+    first, second = (streamer.feed(piece) for piece in split_at(RAW, cut))
+    assert first + second == QUESTION
+    # phần đã trả ra luôn là text hoàn chỉnh, không có surrogate lẻ
+    first.encode("utf-8")
+
+
+def test_streamer_replaces_lone_surrogate():
+    streamer = JsonFieldStreamer("question")
+    out = streamer.feed('{"question": "a \\ud83d b \\ude00 c"}')
+    assert out == "a \ufffd b \ufffd c"
+
+
+def test_stream_llm_json_yields_deltas_then_result():
+    model = FakeStreamingModel(split_every(RAW, 5))
+    events = list(stream_llm_json("prompt", model=model))
+
+    assert events[-1] == ("result", json.loads(RAW))
+    deltas = [payload for kind, payload in events[:-1]]
+    assert all(kind == "delta" for kind, _ in events[:-1])
+    assert "".join(deltas) == QUESTION
+
+
+def test_question_events_sse_framing(monkeypatch):
+    cut = RAW.index("\\ude00") + 2
+    monkeypatch.setattr(llm, "LLM", FakeStreamingModel(split_at(RAW, 20, cut, cut + 9)))
+
+    frames = list(llm_question_events("prompt"))
+    for frame in frames:
+        frame.encode("utf-8")
+    events = parse_sse(frames)
+
+    assert [name for name, _ in events[:-1]] == ["delta"] * (len(events) - 1)
+    assert "".join(data["text"] for _, data in events[:-1]) == QUESTION
+    assert events[-1] == ("result", json.loads(RAW))
+
+
+def test_question_events_error_when_question_missing(monkeypatch):
+    monkeypatch.setattr(llm, "LLM", FakeStreamingModel(['{"answer": "x"}']))
+    events = parse_sse(list(llm_question_events("prompt")))
+    assert events == [("error", {"error": "LLM error", "detail": "Missing question in LLM output"})]
+
+
+def test_question_events_rate_limit_error(monkeypatch):
+    class RateLimitedStream:
+        def generate_content(self, prompt, stream=False, **kwargs):
+            raise RuntimeError("429 RESOURCE_EXHAUSTED")
+
+    monkeypatch.setattr(llm, "LLM", RateLimitedStream())
+    (name, data), = parse_sse(list(llm_question_events("prompt")))
+    assert name == "error"
+    assert data["status"] == 429
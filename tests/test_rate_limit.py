@@ -0,0 +1,163 @@
+import pytest
+
+from extensions.rate_limit import RateLimitExceeded, RateLimitedModel, TokenBucket, is_rate_limit_error
+
+
+class FakeClock:
+    """
+    Đồng hồ giả: sleep() chỉ cộng thời gian và ghi lại độ dài mỗi lần chờ.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ResourceExhausted(Exception):
+    pass
+
+
+class FakeModel:
+    """
+    Trả 429 failures lần đầu rồi thành công.
+    """
+
+    def __init__(self, failures: int = 0, error: Exception = None):
+        self.failures = failures
+        self.error = error or ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+        self.calls = 0
+
+    def generate_content(self, prompt, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+
+def make_model(fake, clock, **kwargs):
+    options = dict(rpm=0, tpm=0, expected_output_tokens=0, deadline=300.0, max_retries=4,
+                   backoff_base=1.0, backoff_max=16.0)
+    options.update(kwargs)
+    return RateLimitedModel(fake, clock=clock, sleep=clock.sleep, **options)
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(ResourceExhausted("quota"))
+    assert is_rate_limit_error(RuntimeError("HTTP 429 Too Many Requests"))
+    assert is_rate_limit_error(RateLimitExceeded("deadline"))
+    assert not is_rate_limit_error(ValueError("bad prompt"))
+
+
+def test_retries_429_then_succeeds_with_jittered_backoff():
+    clock = FakeClock()
+    fake = FakeModel(failures=3)
+    model = make_model(fake, clock)
+
+    assert model.generate_content("prompt") == "ok"
+    assert fake.calls == 4
+    assert model.stats()["retries"] == 3
+
+    # lần retry thứ n chờ trong [cap/2, cap], cap = min(backoff_max, base * 2^n)
+    assert len(clock.sleeps) == 3
+    for attempt, delay in enumerate(clock.sleeps, start=1):
+        cap = min(16.0, 1.0 * 2 ** attempt)
+        assert cap / 2 <= delay <= cap
+
+
+def test_backoff_is_capped_by_backoff_max():
+    clock = FakeClock()
+    model = make_model(FakeModel(failures=6), clock, max_retries=6, backoff_max=5.0)
+
+    assert model.generate_content("prompt") == "ok"
+    assert all(2.5 <= delay <= 5.0 for delay in clock.sleeps[2:])
+
+
+def test_gives_up_after_max_retries():
+    clock = FakeClock()
+    fake = FakeModel(failures=100)
+    model = make_model(fake, clock, max_retries=2)
+
+    with pytest.raises(RateLimitExceeded, match="after 2 retries"):
+        model.generate_content("prompt")
+    assert fake.calls == 3
+    assert model.stats()["rejected"] == 1
+
+
+def test_gives_up_when_backoff_would_pass_deadline():
+    clock = FakeClock()
+    fake = FakeModel(failures=100)
+    # retry 1 chờ 1-2s (còn trong hạn), retry 2 chờ thêm 2-4s thì vượt deadline 2.5s
+    model = make_model(fake, clock, deadline=2.5, backoff_base=1.0)
+
+    with pytest.raises(RateLimitExceeded, match="deadline"):
+        model.generate_content("prompt")
+    assert fake.calls == 2
+    assert clock.now - 1000.0 <= 2.5
+
+
+def test_other_errors_are_not_retried():
+    clock = FakeClock()
+    fake = FakeModel(failures=1, error=ValueError("invalid argument"))
+    model = make_model(fake, clock)
+
+    with pytest.raises(ValueError):
+        model.generate_content("prompt")
+    assert fake.calls == 1
+    assert clock.sleeps == []
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)  # 1 token/giây
+
+    bucket.consume(60)
+    assert bucket.wait_for(1) == pytest.approx(1.0)
+    clock.now += 10
+    assert bucket.wait_for(10) == pytest.approx(0.0)
+    bucket.consume(10)
+    assert bucket.wait_for(5) == pytest.approx(5.0)
+
+
+def test_requests_per_minute_are_queued():
+    clock = FakeClock()
+    model = make_model(FakeModel(), clock, rpm=2)
+
+    start = clock.now
+    for _ in range(4):
+        model.generate_content("prompt")
+
+    # 2 request đầu dùng quota sẵn có, mỗi request sau chờ 30s (2 request/phút)
+    assert clock.sleeps == pytest.approx([30.0, 30.0])
+    assert clock.now - start == pytest.approx(60.0)
+    assert model.stats()["calls"] == 4
+
+
+def test_tokens_per_minute_are_enforced():
+    clock = FakeClock()
+    model = make_model(FakeModel(), clock, tpm=600, expected_output_tokens=299)
+
+    model.generate_content("abcd")  # 1 token prompt + 299 output = 300
+    model.generate_content("abcd")
+    assert clock.sleeps == []
+    model.generate_content("abcd")
+    # hết 600 token/phút: chờ 300 token với tốc độ 10 token/giây
+    assert clock.sleeps == pytest.approx([30.0])
+
+
+def test_queue_wait_past_deadline_is_rejected():
+    clock = FakeClock()
+    fake = FakeModel()
+    model = make_model(fake, clock, rpm=1, deadline=10.0)
+
+    model.generate_content("prompt")
+    with pytest.raises(RateLimitExceeded, match="queue deadline"):
+        model.generate_content("prompt")
+    assert fake.calls == 1
+    assert clock.sleeps == []
@@ -0,0 +1,100 @@
+from utils.retrieval import Bm25Index, RetrievalIndex
+
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda d: d[key], reverse=direction < 0))
+
+
+class FakeChunks:
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        (field, value), = query.items()
+        return FakeCursor(d for d in self.docs if d.get(field) == value)
+
+
+class FakeStore:
+    def __init__(self):
+        self.docs = {}
+
+    def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = doc
+
+    def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+
+def make_index(chunks):
+    return RetrievalIndex("t", chunks, FakeStore(), owner_field="owner", text_field="text")
+
+
+def wait_builds(index):
+    index._executor.shutdown(wait=True)
+    index._executor = type(index._executor)(max_workers=1)
+
+
+def test_bm25_ranks_matching_chunks():
+    index = Bm25Index.build([
+        ("a", "deadlock xảy ra khi các tiến trình chờ nhau"),
+        ("b", "bảng băm và hàm băm"),
+        ("c", "tránh deadlock bằng thứ tự khoá, deadlock deadlock"),
+    ])
+    assert [cid for cid, _ in index.top_k("deadlock", 3)] == ["c", "a"]
+    assert index.top_k("không có", 3) == []
+
+
+def test_owner_without_chunks_is_cached_as_empty_index():
+    chunks = FakeChunks()
+    index = make_index(chunks)
+
+    assert index.get("empty") is None
+    wait_builds(index)
+    for _ in range(5):
+        assert len(index.get("empty")) == 0
+        assert index.top_positions("empty", "deadlock", 3, 0) == []
+
+    stats = index.stats()
+    assert stats["builds"] == 1
+    assert stats["empty_owners"] == 1
+    assert chunks.finds == 1
+
+
+def test_cached_empty_index_is_rebuilt_when_chunks_appear():
+    chunks = FakeChunks()
+    index = make_index(chunks)
+    index.rebuild("s1")
+
+    chunks.docs = [{"_id": f"c{i}", "owner": "s1", "text": f"đoạn {i} về deadlock"} for i in range(3)]
+    assert index.top_positions("s1", "deadlock", 3, 3) == []
+    wait_builds(index)
+    assert sorted(index.top_positions("s1", "deadlock", 3, 3)) == [0, 1, 2]
+
+
+def test_rechunk_to_nothing_drops_persisted_index():
+    chunks = FakeChunks([{"_id": "c1", "owner": "s1", "text": "deadlock"}])
+    index = make_index(chunks)
+    index.rebuild("s1")
+    assert "t:s1" in index._store_col.docs
+
+    index.rebuild("s1", [])
+    assert "t:s1" not in index._store_col.docs
+    assert len(index.get("s1")) == 0
+
+
+def test_persisted_index_round_trip():
+    chunks = FakeChunks([{"_id": f"c{i}", "owner": "s1", "text": t} for i, t in enumerate(["ma trận", "đạo hàm riêng"])])
+    index = make_index(chunks)
+    built = index.rebuild("s1")
+    index.invalidate("s1")
+
+    loaded = index.get("s1")
+    assert loaded.chunk_ids == built.chunk_ids
+    assert loaded.top_k("đạo hàm", 2) == built.top_k("đạo hàm", 2)
+    assert index.stats()["loads"] == 1
@@ -0,0 +1,164 @@
+# Nhiều worker (process riêng, MongoClient riêng) cùng thao tác trên 1 session trong MongoSessionStore.
+# Cần mongod local: MONGO_TEST_URI (mặc định mongodb://localhost:27017), không có thì skip.
+import multiprocessing
+
+import pytest
+
+from conftest import MONGO_TEST_DB, MONGO_TEST_URI
+
+WORKERS = 2
+TIMEOUT = 60
+
+
+def _store(collection_name: str):
+    from pymongo import MongoClient
+    from extensions.session_store import MongoSessionStore
+
+    client = MongoClient(MONGO_TEST_URI)
+    # local_ttl=0: không đọc tầng cache trong process, luôn thấy dữ liệu của worker khác
+    return client, MongoSessionStore(client[MONGO_TEST_DB][collection_name], local_ttl=0)
+
+
+def _append_worker(collection_name, session_id, worker_no, count, start, results):
+    client, store = _store(collection_name)
+    start.wait(TIMEOUT)
+    lengths = [store.append_answer(session_id, f"q{worker_no}-{i}", f"a{worker_no}-{i}") for i in range(count)]
+    client.close()
+    results.put(lengths)
+
+
+def _summary_worker(collection_name, session_id, worker_no, version, drop, start, results):
+    client, store = _store(collection_name)
+    start.wait(TIMEOUT)
+    applied = store.replace_summary(session_id, f"summary from {worker_no}", version, drop)
+    client.close()
+    results.put((worker_no, applied))
+
+
+def _pop_worker(collection_name, session_id, worker_no, start, results):
+    client, store = _store(collection_name)
+    start.wait(TIMEOUT)
+    popped = []
+    while True:
+        item = store.pop_question(session_id)
+        if item is None:
+            break
+        popped.append(item["n"])
+    client.close()
+    results.put(popped)
+
+
+def _run(target, args_per_worker):
+    """
+    Chạy mỗi worker ở 1 process spawn, thả cùng lúc bằng Event, trả về kết quả của các worker.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    start = ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=target, args=(*args, start, results)) for args in args_per_worker]
+    for p in procs:
+        p.start()
+    start.set()
+    out = [results.get(timeout=TIMEOUT) for _ in procs]
+    for p in procs:
+        p.join(TIMEOUT)
+        assert p.exitcode == 0
+    return out
+
+
+@pytest.fixture
+def store(mongo_collection):
+    from extensions.session_store import MongoSessionStore
+
+    return MongoSessionStore(mongo_collection, local_ttl=0)
+
+
+def test_append_answer_is_atomic_across_workers(store, mongo_collection):
+    store.create({"id": "s1", "qa_log": [], "summary": ""})
+    count = 50
+
+    results = _run(_append_worker, [(mongo_collection.name, "s1", w, count) for w in range(WORKERS)])
+
+    # mỗi lần append thấy đúng 1 độ dài khác nhau: không lượt nào bị ghi đè
+    lengths = sorted(n for worker_lengths in results for n in worker_lengths)
+    assert lengths == list(range(1, WORKERS * count + 1))
+    for worker_lengths in results:
+        assert worker_lengths == sorted(worker_lengths)
+
+    qa_log = store.get("s1")["qa_log"]
+    assert len(qa_log) == WORKERS * count
+    for w in range(WORKERS):
+        mine = [qa["question"] for qa in qa_log if qa["question"].startswith(f"q{w}-")]
+        assert mine == [f"q{w}-{i}" for i in range(count)]
+
+
+@pytest.mark.parametrize("round_no", range(5))
+def test_replace_summary_only_one_worker_wins(store, mongo_collection, round_no):
+    qa_log = [{"question": f"q{i}", "answer": f"a{i}"} for i in range(10)]
+    store.create({"id": "s1", "qa_log": qa_log, "summary": ""})
+
+    results = _run(_summary_worker, [(mongo_collection.name, "s1", w, 0, 4) for w in range(WORKERS)])
+
+    winners = [w for w, applied in results if applied]
+    assert len(winners) == 1
+    session = store.get("s1")
+    assert session["summary"] == f"summary from {winners[0]}"
+    assert session["summary_version"] == 1
+    assert session["qa_log"] == qa_log[4:]
+
+    # version cũ không còn áp dụng được nữa
+    assert store.replace_summary("s1", "stale", 0, 4) is False
+    assert store.get("s1")["qa_log"] == qa_log[4:]
+
+
+def test_pop_question_hands_each_question_to_one_worker(store, mongo_collection):
+    total = 200
+    store.create({"id": "s1", "qa_log": [], "question_queue": []})
+    store.push_questions("s1", [{"n": i} for i in range(total)])
+
+    results = _run(_pop_worker, [(mongo_collection.name, "s1", w) for w in range(WORKERS)])
+
+    popped = [n for worker_popped in results for n in worker_popped]
+    assert sorted(popped) == list(range(total))
+    # mỗi worker lấy theo đúng thứ tự hàng đợi
+    for worker_popped in results:
+        assert worker_popped == sorted(worker_popped)
+    assert store.pop_question("s1") is None
+
+
+def test_mongo_get_keeps_session_from_idle_eviction(store, mongo_collection):
+    import datetime
+
+    store.create({"id": "s1", "qa_log": []})
+    store.create({"id": "s2", "qa_log": []})
+    stale = datetime.datetime.utcnow() - datetime.timedelta(seconds=store.idle_ttl + 60)
+    mongo_collection.update_many({}, {"$set": {"updated_at": stale}})
+
+    # s1 vẫn đang được đọc (vd: /next_question) thì không bị dọn
+    assert store.get("s1") is not None
+    evicted = {session["id"] for session, _ in store._collect_evicted()}
+    assert evicted == {"s2"}
+    assert store.get("s1") is not None
+
+
+def test_memory_reads_refresh_idle_timer():
+    from extensions.session_store import MemorySessionStore
+
+    store = MemorySessionStore(idle_ttl=60)
+    store.create({"id": "s1", "qa_log": [], "question_queue": [{"n": 1}]})
+    store.create({"id": "s2", "qa_log": []})
+    store._touched = {sid: t - 120 for sid, t in store._touched.items()}
+
+    assert store.pop_question("s1") == {"n": 1}
+    evicted = {session["id"] for session, _ in store._collect_evicted()}
+    assert evicted == {"s2"}
+
+
+def test_mongo_replace_coverage_is_versioned(store):
+    store.create({"id": "s1", "qa_log": [], "coverage": None})
+
+    assert store.replace_coverage("s1", {"cursor": 3}, 0) is True
+    assert store.replace_coverage("s1", {"cursor": 6}, 0) is False
+    session = store.get("s1")
+    assert session["coverage"] == {"cursor": 3}
+    assert session["coverage_version"] == 1
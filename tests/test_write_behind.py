@@ -0,0 +1,101 @@
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from extensions.write_behind import WriteBehindBuffer
+
+
+class FakeCollection:
+    """
+    bulk_write lỗi theo kịch bản: fail_ids -> writeErrors cho các op đó, error -> lỗi cả lô.
+    """
+
+    def __init__(self):
+        self.docs = {}
+        self.fail_ids = set()
+        self.error = None
+
+    def bulk_write(self, ops, ordered=True):
+        if self.error is not None:
+            raise self.error
+        write_errors = []
+        for i, op in enumerate(ops):
+            sid = op._filter["_id"]
+            if sid in self.fail_ids:
+                write_errors.append({"index": i, "code": 17419, "errmsg": "document too large"})
+                continue
+            self._push(sid, op._doc["$push"]["questions"]["$each"], op._doc["$push"]["answers"]["$each"])
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": 0})
+
+    def update_one(self, query, update):
+        self._push(query["_id"], [update["$push"]["questions"]], [update["$push"]["answers"]])
+
+    def _push(self, sid, questions, answers):
+        doc = self.docs.setdefault(sid, {"questions": [], "answers": []})
+        doc["questions"].extend(questions)
+        doc["answers"].extend(answers)
+
+
+def make_buffer(col, **kwargs):
+    buffer = WriteBehindBuffer({"s": col}, flush_interval=3600, **kwargs)
+    buffer._ensure_thread = lambda: None
+    return buffer
+
+
+def test_bulk_write_error_requeues_only_failed_sessions():
+    col = FakeCollection()
+    buffer = make_buffer(col)
+    for sid in ("a", "b", "c"):
+        buffer.append("s", sid, f"q-{sid}", f"a-{sid}")
+    col.fail_ids = {"b"}
+
+    assert buffer.flush() == 2
+    assert set(col.docs) == {"a", "c"}
+    stats = buffer.stats()
+    assert stats["pending_sessions"] == 1
+    assert stats["ops_failed"] == 1 and stats["ops_requeued"] == 1
+    assert "BulkWriteError" in stats["last_error"]
+
+    # phần lỗi được ghi trước phần thêm sau, không bị ghi lặp ở a/c
+    buffer.append("s", "b", "q-b2", "a-b2")
+    col.fail_ids = set()
+    assert buffer.flush() == 1
+    assert col.docs["b"]["questions"] == ["q-b", "q-b2"]
+    assert col.docs["a"]["questions"] == ["q-a"]
+
+
+def test_connection_error_requeues_whole_batch():
+    col = FakeCollection()
+    buffer = make_buffer(col)
+    buffer.append("s", "a", "q1", "a1")
+    buffer.append("s", "b", "q1", "a1")
+    col.error = AutoReconnect("connection reset")
+
+    assert buffer.flush() == 0
+    assert buffer.stats()["pending_sessions"] == 2
+
+    col.error = None
+    assert buffer.flush() == 2
+    assert col.docs["a"]["questions"] == ["q1"]
+
+
+def test_gives_up_after_max_attempts():
+    col = FakeCollection()
+    buffer = make_buffer(col, max_attempts=2)
+    buffer.append("s", "a", "q1", "a1")
+    col.fail_ids = {"a"}
+
+    buffer.flush()
+    buffer.flush()
+    stats = buffer.stats()
+    assert stats["pending_sessions"] == 0
+    assert stats["ops_dropped"] == 1
+
+
+def test_disabled_buffer_writes_through():
+    col = FakeCollection()
+    buffer = make_buffer(col, enabled=False)
+    buffer.append("s", "a", "q1", "a1")
+
+    assert col.docs["a"] == {"questions": ["q1"], "answers": ["a1"]}
+    assert buffer.stats()["pending_sessions"] == 0
+    assert buffer.flush("s", "a") == 0
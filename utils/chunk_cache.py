@@ -0,0 +1,134 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Set
+
+from bson import ObjectId
+
+from config import CHUNK_TEXT_CACHE_MAX_BYTES
+from extensions.mongo import db
+
+
+def _get_path(doc: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+class ChunkTextCache:
+    """
+    Đọc text của chunk theo lô (1 query $in cho các id chưa có) và giữ lại trong LRU
+    giới hạn theo số byte. Entry được xoá theo owner (syllabus/book) khi re-chunk.
+    """
+
+    def __init__(self, collection, text_field: str, owner_field: str,
+                 id_cast: Callable = lambda x: x, max_bytes: int = 128 * 1024 * 1024):
+        self._col = collection
+        self.text_field = text_field
+        self.owner_field = owner_field
+        self._id_cast = id_cast
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._by_owner: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "queries": 0, "evictions": 0}
+
+    def load(self, chunk_ids) -> List[dict]:
+        """
+        Trả [{"cid", "text"}] theo đúng thứ tự chunk_ids, bỏ qua id không hợp lệ/không tồn tại.
+        """
+        found: Dict[str, str] = {}
+        missing = []
+        with self._lock:
+            for cid in chunk_ids:
+                entry = self._entries.get(cid)
+                if entry is not None:
+                    self._entries.move_to_end(cid)
+                    found[cid] = entry[0]
+                    self._stats["hits"] += 1
+                else:
+                    missing.append(cid)
+                    self._stats["misses"] += 1
+
+        if missing:
+            keys = {}
+            for cid in missing:
+                try:
+                    keys[self._id_cast(cid)] = cid
+                except Exception:
+                    continue
+            if keys:
+                cursor = self._col.find(
+                    {"_id": {"$in": list(keys)}},
+                    {self.text_field: 1, self.owner_field: 1},
+                )
+                with self._lock:
+                    self._stats["queries"] += 1
+                for doc in cursor:
+                    cid = keys.get(doc["_id"])
+                    if cid is None:
+                        continue
+                    text = doc.get(self.text_field, "") or ""
+                    found[cid] = text
+                    self._put(cid, text, _get_path(doc, self.owner_field))
+
+        return [{"cid": cid, "text": found[cid]} for cid in chunk_ids if cid in found]
+
+    def invalidate_owner(self, owner_id: str) -> None:
+        with self._lock:
+            for cid in self._by_owner.pop(owner_id, set()):
+                entry = self._entries.pop(cid, None)
+                if entry is not None:
+                    self._bytes -= entry[2]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _put(self, cid: str, text: str, owner) -> None:
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(cid, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[cid] = (text, owner, size)
+            self._bytes += size
+            if owner is not None:
+                self._by_owner.setdefault(owner, set()).add(cid)
+
+            while self._bytes > self.max_bytes and self._entries:
+                old_cid, (_, old_owner, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._stats["evictions"] += 1
+                owned = self._by_owner.get(old_owner)
+                if owned is not None:
+                    owned.discard(old_cid)
+                    if not owned:
+                        self._by_owner.pop(old_owner, None)
+
+
+chunk_text_cache = ChunkTextCache(
+    db["chunks"],
+    text_field="text",
+    owner_field="metadata.syllabus_id",
+    id_cast=ObjectId,
+    max_bytes=CHUNK_TEXT_CACHE_MAX_BYTES,
+)
+
+system_chunk_text_cache = ChunkTextCache(
+    db["system_book_chunks"],
+    text_field="content",
+    owner_field="bookId",
+    max_bytes=CHUNK_TEXT_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,110 @@
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import List
+
+from config import CHUNK_SAMPLER, CHUNK_INDEX_TTL_SECONDS, CHUNK_INDEX_MAX_OWNERS
+from extensions.mongo import db
+
+
+class ChunkIdIndex:
+    """
+    Danh sách _id chunk theo từng syllabus/book (owner), sắp theo _id, dùng để lấy mẫu chunk
+    mà không phải kéo cả cursor từ Mongo mỗi câu hỏi.
+    - strategy "cache": giữ tuple _id trong LRU theo owner, có TTL, invalidate khi re-chunk.
+    - strategy "sample": để Mongo tự lấy mẫu bằng $sample.
+    """
+
+    def __init__(self, collection, owner_field: str, as_str: bool = False,
+                 strategy: str = "cache", ttl_seconds: int = 300, max_owners: int = 512):
+        self._col = collection
+        self.owner_field = owner_field
+        self.as_str = as_str
+        self.strategy = strategy
+        self.ttl_seconds = ttl_seconds
+        self.max_owners = max_owners
+        self._lock = threading.Lock()
+        self._ids: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {"hits": 0, "loads": 0, "invalidations": 0, "mongo_samples": 0}
+
+    def ids(self, owner_id: str) -> tuple:
+        """
+        Toàn bộ _id chunk của owner, thứ tự ổn định (theo _id).
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._ids.get(owner_id)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._ids.move_to_end(owner_id)
+                self._stats["hits"] += 1
+                return entry[1]
+
+        cursor = self._col.find({self.owner_field: owner_id}, {"_id": 1}).sort("_id", 1)
+        ids = tuple(self._format(c["_id"]) for c in cursor)
+
+        with self._lock:
+            self._stats["loads"] += 1
+            # không cache owner rỗng: chunk có thể đang được ghi
+            if ids:
+                self._ids[owner_id] = (now, ids)
+                self._ids.move_to_end(owner_id)
+                while len(self._ids) > self.max_owners:
+                    self._ids.popitem(last=False)
+        return ids
+
+    def sample(self, owner_id: str, k: int = 3) -> List:
+        """
+        Lấy ngẫu nhiên k chunk khác nhau của owner.
+        """
+        if self.strategy == "sample":
+            return self._mongo_sample(owner_id, k)
+
+        ids = self.ids(owner_id)
+        if not ids:
+            return []
+        return random.sample(ids, min(k, len(ids)))
+
+    def invalidate(self, owner_id: str) -> None:
+        with self._lock:
+            self._ids.pop(owner_id, None)
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["owners"] = len(self._ids)
+            stats["ids_held"] = sum(len(e[1]) for e in self._ids.values())
+        stats["strategy"] = self.strategy
+        return stats
+
+    def _mongo_sample(self, owner_id: str, k: int) -> List:
+        cursor = self._col.aggregate([
+            {"$match": {self.owner_field: owner_id}},
+            {"$sample": {"size": k}},
+            {"$project": {"_id": 1}},
+        ])
+        with self._lock:
+            self._stats["mongo_samples"] += 1
+        return [self._format(c["_id"]) for c in cursor]
+
+    def _format(self, _id):
+        return str(_id) if self.as_str else _id
+
+
+syllabus_chunk_index = ChunkIdIndex(
+    db["chunks"],
+    "metadata.syllabus_id",
+    as_str=True,
+    strategy=CHUNK_SAMPLER,
+    ttl_seconds=CHUNK_INDEX_TTL_SECONDS,
+    max_owners=CHUNK_INDEX_MAX_OWNERS,
+)
+
+book_chunk_index = ChunkIdIndex(
+    db["system_book_chunks"],
+    "bookId",
+    strategy=CHUNK_SAMPLER,
+    ttl_seconds=CHUNK_INDEX_TTL_SECONDS,
+    max_owners=CHUNK_INDEX_MAX_OWNERS,
+)
@@ -1,53 +1,134 @@
+import re
 import unicodedata
 
+# Dấu kết thúc câu (kèm khoảng trắng phía sau) dùng khi snap="sentence"
+_SENTENCE_ENDS = (". ", "? ", "! ", "… ", ".\" ", ": ")
+
+# Chỉ tìm điểm cắt trong phần cuối chunk (tỉ lệ theo chunk_size) để chunk không quá ngắn
+SNAP_WINDOW = 0.2
+
+
+def _build_control_chars_re():
+    """
+    Regex các ký tự category C* trong BMP (dựng 1 lần thành bảng tra), cộng cả dải ngoài BMP;
+    ký tự ngoài BMP (hiếm, vd emoji) được kiểm tra lại từng ký tự khi thay thế.
+    """
+    ranges = []
+    start = None
+    for cp in range(0x10000):
+        if unicodedata.category(chr(cp))[0] == "C":
+            if start is None:
+                start = cp
+        elif start is not None:
+            ranges.append((start, cp - 1))
+            start = None
+    if start is not None:
+        ranges.append((start, 0xFFFF))
+
+    parts = [re.escape(chr(lo)) if lo == hi else f"{re.escape(chr(lo))}-{re.escape(chr(hi))}"
+             for lo, hi in ranges]
+    return re.compile("[" + "".join(parts) + "\U00010000-\U0010FFFF]+")
+
+
+_CONTROL_CHARS = _build_control_chars_re()
+
+
+def _drop_control(m):
+    run = m.group()
+    if run.isascii() or max(run) <= "\uffff":
+        return ""
+    return "".join(ch for ch in run if unicodedata.category(ch)[0] != "C")
+
+
 def clean_text_keep_printable(s):
-    cleaned = []
-    for ch in s:
-        # Loại bỏ ký tự "Control"
-        if unicodedata.category(ch).startswith('C'):
+    # Thay các ký tự xuống dòng/tab bằng khoảng trắng (để không dính chữ giữa 2 dòng),
+    # rồi loại bỏ các ký tự "Control" còn lại
+    text = s.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+    return _CONTROL_CHARS.sub(_drop_control, text)
+
+
+def _find_cut(text, start, end, snap):
+    """
+    Vị trí cắt chunk text[start:end]: cuối câu (snap="sentence") hoặc khoảng trắng
+    (snap="whitespace") gần end nhất trong cửa sổ cuối chunk; không thấy thì cắt đúng end.
+    """
+    if not snap:
+        return end
+    lo = start + int((end - start) * (1 - SNAP_WINDOW))
+    if snap == "sentence":
+        best = max(text.rfind(p, lo, end) for p in _SENTENCE_ENDS)
+        if best != -1:
+            return best + text[best:end].index(" ")
+    space = text.rfind(" ", lo, end)
+    return space if space > start else end
+
+
+def _page_at(page_marks, offset):
+    page = None
+    for mark_offset, page_no in page_marks:
+        if mark_offset > offset:
+            break
+        page = page_no
+    return page
+
+
+def iter_chunks(pages, chunk_size=5000, overlap=0, snap=None):
+    """
+    Chunk dần theo từng trang: pages là iterable (page_no, text), mỗi trang được làm sạch riêng.
+    Yield {"content", "start_offset", "end_offset"} với offset trên text đã làm sạch (nối liền các trang),
+    kèm page_start/page_end nếu biết số trang. Cắt bằng offset, không cộng dồn chuỗi.
+    - snap: None (cắt đúng chunk_size), "whitespace" hoặc "sentence" (lùi về ranh giới gần nhất).
+    - overlap: số ký tự chunk sau lặp lại từ cuối chunk trước.
+    Chỉ giữ phần chưa thành chunk (< chunk_size) + 1 trang trong bộ nhớ.
+    """
+    overlap = max(0, min(overlap, chunk_size // 2))
+    pending = ""
+    base = 0  # offset toàn cục của pending[0]
+    last_end = 0  # offset toàn cục cuối chunk gần nhất đã yield
+    page_marks = []  # (offset toàn cục đầu trang, page_no) của các trang còn nằm trong pending
+
+    def make_chunk(pos, cut):
+        chunk = {
+            "content": pending[pos:cut].strip(),
+            "start_offset": base + pos,
+            "end_offset": base + cut
+        }
+        if page_marks and page_marks[0][1] is not None:
+            chunk["page_start"] = _page_at(page_marks, base + pos)
+            chunk["page_end"] = _page_at(page_marks, base + cut - 1)
+        return chunk
+
+    for page_no, page_text in pages:
+        text = clean_text_keep_printable(page_text)
+        if not text:
             continue
-        cleaned.append(ch)
-    text = "".join(cleaned)
-
-    # Thay các ký tự xuống dòng/tab bằng khoảng trắng
-    text = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
-    return text
-
-
-def chunk_syllabus(text, chunk_size=5000):
-    text = clean_text_keep_printable(text)
-
-    chunks = []
-    buffer = ""
-    total_offset = 0
-    buffer_start_offset = 0
-
-    idx = 0
-    while idx < len(text):
-        remaining = chunk_size - len(buffer)
-        part = text[idx: idx + remaining]
-
-        if not buffer:
-            buffer_start_offset = total_offset
-
-        buffer += part
-        idx += len(part)
-        total_offset += len(part)
-
-        if len(buffer) >= chunk_size:
-            chunks.append({
-                "content": buffer.strip(),
-                "start_offset": buffer_start_offset,
-                "end_offset": total_offset
-            })
-            buffer = ""
-
-    # Xử lý phần còn lại
-    if buffer.strip():
-        chunks.append({
-            "content": buffer.strip(),
-            "start_offset": buffer_start_offset,
-            "end_offset": total_offset
-        })
-
-    return chunks
+        page_marks.append((base + len(pending), page_no))
+        pending += text
+
+        pos = 0
+        while len(pending) - pos >= chunk_size:
+            cut = _find_cut(pending, pos, pos + chunk_size, snap)
+            chunk = make_chunk(pos, cut)
+            if chunk["content"]:
+                yield chunk
+                last_end = chunk["end_offset"]
+
+            next_pos = cut - overlap
+            if overlap and snap:
+                space = pending.find(" ", next_pos, cut)
+                if space != -1:
+                    next_pos = space + 1
+            pos = next_pos if next_pos > pos else cut
+
+        pending = pending[pos:]
+        base += pos
+        while len(page_marks) > 1 and page_marks[1][0] <= base:
+            page_marks.pop(0)
+
+    # Xử lý phần còn lại, bỏ qua nếu chỉ là phần overlap của chunk trước
+    if pending[max(0, last_end - base):].strip():
+        yield make_chunk(0, len(pending))
+
+
+def chunk_syllabus(text, chunk_size=5000, overlap=0, snap=None):
+    return list(iter_chunks([(None, text)], chunk_size, overlap, snap))
@@ -0,0 +1,145 @@
+import json
+import threading
+from collections import deque
+from typing import Dict, List
+
+from config import PROMPT_TOKEN_BUDGET, PROMPT_SUMMARY_SHARE, PROMPT_RECENT_QA_SHARE
+from extensions.rate_limit import token_estimator
+
+# Chunk được cấp ít hơn số token này thì bỏ hẳn (trừ chunk đầu tiên)
+MIN_CHUNK_TOKENS = 64
+
+
+def _truncate(text: str, tokens: int) -> str:
+    """
+    Cắt text còn khoảng tokens token, ưu tiên cắt ở khoảng trắng.
+    """
+    if token_estimator.count(text) <= tokens:
+        return text
+    limit = token_estimator.chars_for(tokens)
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + " ..."
+
+
+def _water_fill(sizes: List[int], budget: int) -> List[int]:
+    """
+    Chia budget cho các phần có kích thước sizes: phần nhỏ lấy đủ, phần còn lại chia đều.
+    """
+    alloc = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for n, i in enumerate(order):
+        share = remaining // (len(order) - n)
+        alloc[i] = min(sizes[i], share)
+        remaining -= alloc[i]
+    return alloc
+
+
+def _fit_recent_qa(recent_qa: List[Dict], budget: int) -> List[Dict]:
+    """
+    Bỏ dần lượt cũ nhất cho tới khi vừa budget; lượt mới nhất nếu vẫn quá thì cắt câu trả lời.
+    """
+    kept = []
+    used = 0
+    for qa in reversed(recent_qa):
+        cost = token_estimator.count(json.dumps(qa, ensure_ascii=False, indent=2))
+        if used + cost <= budget:
+            kept.append(qa)
+            used += cost
+            continue
+        if not kept and isinstance(qa, dict) and budget > 0:
+            trimmed = {k: _truncate(v, budget // 2) if isinstance(v, str) else v for k, v in qa.items()}
+            kept.append(trimmed)
+        break
+    kept.reverse()
+    return kept
+
+
+def build_prompt_context(texts: List[dict], summary: str, recent_qa: List[Dict],
+                         overhead_tokens: int, budget: int = PROMPT_TOKEN_BUDGET) -> dict:
+    """
+    Xếp chunk, summary và recent Q&A vào ngân sách token của prompt.
+    Ưu tiên: chunk (nguồn câu hỏi) > summary > recent Q&A. Summary và recent Q&A được giữ
+    tối đa 1 phần ngân sách; phần chunk không dùng hết được trả lại cho 2 phần này.
+    overhead_tokens là số token của template khi các phần trên để trống.
+    """
+    available = max(0, budget - overhead_tokens)
+    summary = summary or ""
+    recent_qa = list(recent_qa or [])
+
+    chunk_sizes = [token_estimator.count(f"[{t['cid']}]: {t['text']}") for t in texts]
+    summary_tokens = token_estimator.count(summary)
+    qa_tokens = token_estimator.count(json.dumps(recent_qa, ensure_ascii=False, indent=2)) if recent_qa else 0
+
+    summary_reserve = min(summary_tokens, int(available * PROMPT_SUMMARY_SHARE))
+    qa_reserve = min(qa_tokens, int(available * PROMPT_RECENT_QA_SHARE))
+    chunk_budget = available - summary_reserve - qa_reserve
+    chunk_alloc = _water_fill(chunk_sizes, chunk_budget)
+
+    # phần chunk còn thừa -> summary rồi tới recent Q&A
+    spare = chunk_budget - sum(chunk_alloc)
+    extra = min(spare, summary_tokens - summary_reserve)
+    summary_reserve += extra
+    qa_reserve += min(spare - extra, qa_tokens - qa_reserve)
+
+    parts = []
+    truncated = False
+    for i, (t, alloc) in enumerate(zip(texts, chunk_alloc)):
+        if alloc < chunk_sizes[i]:
+            truncated = True
+            if alloc < MIN_CHUNK_TOKENS and parts:
+                continue
+        label = f"[{t['cid']}]: "
+        body_tokens = max(alloc - token_estimator.count(label), MIN_CHUNK_TOKENS)
+        parts.append(label + _truncate(t["text"], body_tokens))
+
+    fitted_summary = _truncate(summary, summary_reserve) if summary else ""
+    fitted_qa = _fit_recent_qa(recent_qa, qa_reserve) if recent_qa else []
+    truncated = truncated or fitted_summary != summary or len(fitted_qa) != len(recent_qa)
+
+    return {
+        "context_formatted": "\n\n".join(parts),
+        "summary": fitted_summary,
+        "recent_qa": fitted_qa,
+        "chunks_used": len(parts),
+        "truncated": truncated,
+    }
+
+
+class PromptStats:
+    """
+    Thống kê số token (ước lượng) của prompt sinh câu hỏi, theo cửa sổ các lần gọi gần nhất.
+    """
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._stats = {"calls": 0, "truncated": 0, "over_budget": 0, "max_tokens": 0}
+
+    def record(self, tokens: int, truncated: bool, budget: int = PROMPT_TOKEN_BUDGET) -> None:
+        with self._lock:
+            self._recent.append(tokens)
+            self._stats["calls"] += 1
+            self._stats["max_tokens"] = max(self._stats["max_tokens"], tokens)
+            if truncated:
+                self._stats["truncated"] += 1
+            if tokens > budget:
+                self._stats["over_budget"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            recent = sorted(self._recent)
+        if recent:
+            stats["avg_tokens"] = sum(recent) / len(recent)
+            stats["p50_tokens"] = recent[len(recent) // 2]
+            stats["p95_tokens"] = recent[min(len(recent) - 1, int(len(recent) * 0.95))]
+        stats["budget"] = PROMPT_TOKEN_BUDGET
+        stats["estimator"] = token_estimator.stats()
+        return stats
+
+
+prompt_stats = PromptStats()
@@ -0,0 +1,90 @@
+import math
+import random
+from typing import List, Optional, Tuple
+
+# Trạng thái phủ chunk của 1 session, đủ nhỏ để lưu cùng session:
+# {"n", "a", "b", "cursor", "skip", "round"}
+# - Hoán vị affine j -> (a * j + b) % n với gcd(a, n) = 1 đi qua mọi vị trí 0..n-1 đúng 1 lần,
+#   nên chỉ cần lưu cursor thay vì cả mảng hoán vị.
+# - skip: các j >= cursor đã bị lấy sớm (chunk liên quan được ưu tiên), sẽ bỏ qua khi cursor tới.
+# Vị trí là chỉ số trong ChunkIdIndex.ids(owner) (thứ tự theo _id).
+
+
+def _coprime_multiplier(n: int, rng) -> int:
+    if n <= 3:
+        return 1
+    while True:
+        # bỏ a = 1 để hoán vị không chỉ là dịch vòng các chunk liền kề
+        a = rng.randrange(2, n)
+        if math.gcd(a, n) == 1:
+            return a
+
+
+def new_coverage(n: int, rng=random, round_no: int = 0) -> dict:
+    return {
+        "n": n,
+        "a": _coprime_multiplier(n, rng),
+        "b": rng.randrange(n) if n else 0,
+        "cursor": 0,
+        "skip": [],
+        "round": round_no,
+    }
+
+
+def draw_positions(state: Optional[dict], n: int, k: int, preferred: Optional[List[int]] = None,
+                   rng=random) -> Tuple[dict, List[int]]:
+    """
+    Lấy k vị trí chưa dùng trong vòng hiện tại, O(k + len(preferred)) mỗi lần.
+    preferred: vị trí ưu tiên (vd chunk liên quan nhất theo retrieval); chỉ lấy những vị trí chưa dùng,
+    phần còn lại đi tiếp theo hoán vị. Hết vòng thì sang hoán vị mới. Số chunk đổi (re-chunk) thì reset.
+    Trả về (state mới, danh sách vị trí).
+    """
+    if n <= 0:
+        return state or new_coverage(0, rng), []
+    if not state or state.get("n") != n:
+        state = new_coverage(n, rng)
+    else:
+        state = dict(state)
+
+    a, b, cursor = state["a"], state["b"], state["cursor"]
+    skip = set(state.get("skip") or [])
+    picked: List[int] = []
+
+    if preferred:
+        a_inv = pow(a, -1, n)
+        fresh = {}
+        for p in preferred:
+            j = a_inv * (p - b) % n
+            if j >= cursor and j not in skip:
+                fresh[p] = j
+        for p in rng.sample(list(fresh), min(k, len(fresh))):
+            picked.append(p)
+            skip.add(fresh[p])
+
+    while len(picked) < k and len(picked) < n:
+        if cursor >= n:
+            # đã phủ hết: sang vòng mới với hoán vị khác
+            state = new_coverage(n, rng, state.get("round", 0) + 1)
+            a, b, cursor = state["a"], state["b"], 0
+            skip = set()
+        j = cursor
+        cursor += 1
+        if j in skip:
+            skip.discard(j)
+            continue
+        p = (a * j + b) % n
+        if p not in picked:
+            picked.append(p)
+
+    state["cursor"] = cursor
+    state["skip"] = sorted(j for j in skip if j >= cursor)
+    return state, picked
+
+
+def coverage_ratio(state: Optional[dict]) -> float:
+    """
+    Tỉ lệ chunk đã dùng trong vòng hiện tại.
+    """
+    if not state or not state.get("n"):
+        return 0.0
+    return min(1.0, (state["cursor"] + len(state.get("skip") or [])) / state["n"])
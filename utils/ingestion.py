@@ -0,0 +1,118 @@
+import datetime
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from config import INGESTION_WORKERS
+from extensions.mongo import db
+from utils.ingestion_worker import JOB_QUEUED, JOB_DONE, JOB_FAILED, ingest_syllabus
+
+
+class IngestionQueue:
+    """
+    Đưa việc trích xuất/chunk PDF ra process pool (spawn) để request upload trả về ngay.
+    Trạng thái job (queued -> extracting -> chunking -> done/failed, progress 0..1)
+    nằm trong collection ingestion_jobs nên worker nào cũng đọc được.
+    """
+
+    def __init__(self, jobs_col, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._jobs_col = jobs_col
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stats = {"submitted": 0, "done": 0, "failed": 0, "running": 0, "deduplicated": 0}
+
+    def submit(self, job: dict, on_done: Optional[Callable[[dict], None]] = None) -> str:
+        """
+        job: các field ingest_syllabus cần (syllabus_id, user_id, name, filename, path...).
+        on_done(job) chạy trong process web sau khi ingest xong (vd: xoá cache).
+        """
+        job = dict(job)
+        job["_id"] = str(uuid.uuid4())
+        self._jobs_col.insert_one(self._job_doc(job, JOB_QUEUED, 0.0))
+
+        future = self._get_executor().submit(ingest_syllabus, job)
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._stats["running"] += 1
+        future.add_done_callback(lambda f: self._finish(job, f, on_done))
+        return job["_id"]
+
+    def record_done(self, job: dict, num_chunks: int) -> str:
+        """
+        Ghi job đã xong ngay (file trùng nội dung, dùng lại chunk có sẵn) để client vẫn theo dõi như bình thường.
+        """
+        job_id = str(uuid.uuid4())
+        doc = self._job_doc(dict(job, _id=job_id), JOB_DONE, 1.0)
+        doc.update({"num_chunks": num_chunks, "deduplicated": True, "finished_at": doc["created_at"]})
+        self._jobs_col.insert_one(doc)
+        with self._lock:
+            self._stats["deduplicated"] += 1
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        return self._jobs_col.find_one({"_id": job_id})
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["max_workers"] = self.max_workers
+        return stats
+
+    @staticmethod
+    def _job_doc(job: dict, status: str, progress: float) -> dict:
+        now = datetime.datetime.utcnow()
+        return {
+            "_id": job["_id"],
+            "syllabus_id": job["syllabus_id"],
+            "user_id": job["user_id"],
+            "name": job["name"],
+            "original_filename": job["original_filename"],
+            "status": status,
+            "progress": progress,
+            "num_chunks": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _finish(self, job: dict, future, on_done) -> None:
+        error = future.exception()
+        with self._lock:
+            self._stats["running"] -= 1
+            self._stats["failed" if error else "done"] += 1
+
+        if error is not None:
+            # process con chết hẳn (BrokenProcessPool...) thì chưa kịp ghi failed
+            self._jobs_col.update_one(
+                {"_id": job["_id"], "status": {"$ne": JOB_FAILED}},
+                {"$set": {
+                    "status": JOB_FAILED,
+                    "error": str(error),
+                    "updated_at": datetime.datetime.utcnow(),
+                }},
+            )
+            with self._lock:
+                if self._executor is not None and getattr(self._executor, "_broken", False):
+                    self._executor = None
+            return
+
+        if on_done is not None:
+            try:
+                on_done(job)
+            except Exception as e:
+                print("Ingestion on_done error:", e)
+
+
+ingestion_queue = IngestionQueue(db["ingestion_jobs"], max_workers=INGESTION_WORKERS)
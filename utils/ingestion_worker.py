@@ -0,0 +1,171 @@
+# Code chạy trong process con của pool ingest (spawn): không import Flask/blueprint,
+# tự mở MongoClient riêng vì client của process cha không dùng lại được sau khi tách process.
+import datetime
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+from config import MONGO_URI, MONGO_DB_NAME, CHUNK_SNAP, CHUNK_OVERLAP
+from utils.chunking import iter_chunks
+
+JOB_QUEUED = "queued"
+JOB_EXTRACTING = "extracting"
+JOB_CHUNKING = "chunking"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+INSERT_BATCH_SIZE = 50
+PROGRESS_EVERY_PAGES = 10
+
+
+def count_pdf_pages(path: str):
+    """
+    Số trang đọc từ catalog của PDF (không phân tích layout). None nếu không đọc được.
+    """
+    try:
+        with open(path, "rb") as fp:
+            doc = PDFDocument(PDFParser(fp))
+            return int(resolve1(doc.catalog["Pages"])["Count"])
+    except Exception:
+        return None
+
+
+def iter_pdf_pages(path: str):
+    """
+    Yield (số trang bắt đầu từ 1, text của trang) lần lượt từng trang.
+    """
+    for page_no, page in enumerate(extract_pages(path), start=1):
+        yield page_no, "".join(
+            element.get_text() for element in page if isinstance(element, LTTextContainer)
+        )
+
+
+def _set_status(jobs_col, job_id: str, status: str, progress: float, **fields) -> None:
+    fields.update({
+        "status": status,
+        "progress": round(progress, 3),
+        "updated_at": datetime.datetime.utcnow(),
+    })
+    jobs_col.update_one({"_id": job_id}, {"$set": fields})
+
+
+def ingest_syllabus(job: dict) -> int:
+    """
+    Trích xuất + chunk 1 file PDF đã lưu, ghi syllabus/chunks/documents của user.
+    job: {"_id", "syllabus_id", "user_id", "name", "original_filename", "stored_filename", "path",
+          "content_sha256"}.
+    Trả về số chunk.
+    """
+    client = MongoClient(MONGO_URI)
+    db = client[MONGO_DB_NAME]
+    jobs_col = db["ingestion_jobs"]
+    job_id = job["_id"]
+    syllabus_id = job["syllabus_id"]
+
+    try:
+        total_pages = count_pdf_pages(job["path"])
+        _set_status(jobs_col, job_id, JOB_EXTRACTING, 0.0, started_at=datetime.datetime.utcnow(),
+                    total_pages=total_pages)
+
+        chunks_col = db["chunks"]
+        pages_done = 0
+
+        def pages():
+            nonlocal pages_done
+            for page_no, text in iter_pdf_pages(job["path"]):
+                pages_done = page_no
+                if page_no % PROGRESS_EVERY_PAGES == 0:
+                    progress = 0.95 * page_no / total_pages if total_pages else 0.5
+                    _set_status(jobs_col, job_id, JOB_EXTRACTING, min(progress, 0.95), pages_done=page_no)
+                yield page_no, text
+
+        # Trích xuất từng trang -> chunk -> ghi theo lô, không giữ cả cuốn sách trong RAM
+        num_chunks = 0
+        batch = []
+        for item in iter_chunks(pages(), chunk_size=5000, overlap=CHUNK_OVERLAP, snap=CHUNK_SNAP):
+            batch.append({
+                "text": item["content"],
+                "metadata": {
+                    "syllabus_id": syllabus_id,
+                    "start_offset": item["start_offset"],
+                    "end_offset": item["end_offset"],
+                    "page_start": item.get("page_start"),
+                    "page_end": item.get("page_end")
+                }
+            })
+            if len(batch) >= INSERT_BATCH_SIZE:
+                chunks_col.insert_many(batch)
+                num_chunks += len(batch)
+                batch = []
+
+        _set_status(jobs_col, job_id, JOB_CHUNKING, 0.95, pages_done=pages_done)
+        if batch:
+            chunks_col.insert_many(batch)
+            num_chunks += len(batch)
+
+        db["syllabus"].insert_one({
+            "_id": syllabus_id,
+            "user_id": job["user_id"],
+            "name": job["name"],
+            "original_filename": job["original_filename"],
+            "stored_filename": job["stored_filename"],
+            "num_chunks": num_chunks,
+            "num_pages": pages_done,
+            "content_sha256": job.get("content_sha256"),
+            "created_at": datetime.datetime.utcnow()
+        })
+
+        if job.get("content_sha256"):
+            # file cùng nội dung upload sau này dùng lại bộ chunk này, không trích xuất lại
+            try:
+                db["syllabus_blobs"].update_one(
+                    {"_id": job["content_sha256"]},
+                    {"$setOnInsert": {
+                        "chunk_owner_id": syllabus_id,
+                        "stored_filename": job["stored_filename"],
+                        "num_chunks": num_chunks,
+                        "num_pages": pages_done,
+                        "created_at": datetime.datetime.utcnow()
+                    }},
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                pass
+
+        db["users"].update_one(
+            {"_id": job["user_id"]},
+            {
+                "$setOnInsert": {"_id": job["user_id"]},
+                "$push": {
+                    "documents": {
+                        "syllabus_id": syllabus_id,
+                        "name": job["name"],
+                        "original_filename": job["original_filename"],
+                        "uploaded_at": datetime.datetime.utcnow()
+                    }
+                }
+            },
+            upsert=True
+        )
+
+        _set_status(jobs_col, job_id, JOB_DONE, 1.0, num_chunks=num_chunks,
+                    finished_at=datetime.datetime.utcnow())
+        return num_chunks
+
+    except Exception as e:
+        # dọn phần đã ghi dở để syllabus không có bộ chunk thiếu
+        try:
+            db["chunks"].delete_many({"metadata.syllabus_id": syllabus_id})
+            db["syllabus"].delete_one({"_id": syllabus_id})
+        except Exception:
+            pass
+        _set_status(jobs_col, job_id, JOB_FAILED, 1.0, error=str(e),
+                    finished_at=datetime.datetime.utcnow())
+        raise
+    finally:
+        client.close()
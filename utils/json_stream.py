@@ -0,0 +1,69 @@
+import datetime
+import json
+import math
+from typing import Callable, Iterable, Optional
+
+from bson import ObjectId
+from flask import Response, stream_with_context
+
+# Gom các document thành từng khối khoảng chừng này byte trước khi ghi ra socket
+STREAM_BUFFER_BYTES = 64 * 1024
+
+
+def wants_stream(args) -> bool:
+    return args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def to_jsonable(value):
+    """
+    Chuyển giá trị từ Mongo sang kiểu JSON được: ObjectId -> str, NaN -> None,
+    datetime -> ISO (UTC). Đệ quy vào dict/list (vd qa_log).
+    """
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.replace(tzinfo=datetime.timezone.utc).isoformat()
+    return value
+
+
+def iter_json_array(docs: Iterable[dict], transform: Optional[Callable[[dict], None]] = None):
+    """
+    Sinh mảng JSON từng phần từ 1 cursor: mỗi lần chỉ giữ 1 document và 1 buffer nhỏ.
+    transform (nếu có) sửa document tại chỗ trước khi serialize.
+    """
+    buf = ["["]
+    size = 1
+    first = True
+    for doc in docs:
+        if transform is not None:
+            transform(doc)
+        part = json.dumps(to_jsonable(doc), ensure_ascii=False)
+        if not first:
+            part = "," + part
+        first = False
+        buf.append(part)
+        size += len(part)
+        if size >= STREAM_BUFFER_BYTES:
+            yield "".join(buf)
+            buf = []
+            size = 0
+    buf.append("]")
+    yield "".join(buf)
+
+
+def json_array_response(docs: Iterable[dict], transform: Optional[Callable[[dict], None]] = None,
+                        headers: Optional[dict] = None) -> Response:
+    """
+    Response application/json truyền theo chunked transfer thay vì jsonify cả list.
+    """
+    return Response(
+        stream_with_context(iter_json_array(docs, transform)),
+        mimetype="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,102 @@
+import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from config import PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_limit(args) -> int:
+    raw = args.get("limit")
+    if raw in (None, ""):
+        return PAGE_DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit <= 0:
+        raise PaginationError("limit must be positive")
+    return min(limit, PAGE_MAX_LIMIT)
+
+
+def parse_fields(args, allowed: Optional[Iterable[str]] = None) -> Optional[dict]:
+    """
+    ?fields=a,b,c -> projection Mongo. Không truyền thì trả về toàn bộ field.
+    """
+    raw = args.get("fields")
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    if allowed is not None:
+        unknown = [f for f in fields if f not in allowed]
+        if unknown:
+            raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    projection = {f: 1 for f in fields}
+    projection["_id"] = 1
+    return projection
+
+
+def _parse_datetime(value: str) -> datetime.datetime:
+    try:
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        dt = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise PaginationError(f"Invalid datetime: {value}")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def date_range_filter(args, field: str) -> dict:
+    """
+    ?from=...&to=... (ISO) -> điều kiện trên field, cận dưới gồm, cận trên không gồm.
+    """
+    cond = {}
+    if args.get("from"):
+        cond["$gte"] = _parse_datetime(args["from"])
+    if args.get("to"):
+        cond["$lt"] = _parse_datetime(args["to"])
+    return {field: cond} if cond else {}
+
+
+def equality_filters(args, fields: Iterable[str]) -> dict:
+    return {f: args[f] for f in fields if args.get(f) not in (None, "")}
+
+
+def after_query(query: dict, args) -> dict:
+    after = args.get("after")
+    if not after:
+        return query
+    return {"$and": [query, {"_id": {"$gt": after}}]} if query else {"_id": {"$gt": after}}
+
+
+def find_all(col, query: dict, args, projection: Optional[dict] = None, batch_size: int = 500):
+    """
+    Cursor theo cùng thứ tự _id nhưng không giới hạn limit, dùng cho chế độ stream.
+    """
+    return col.find(after_query(query, args), projection).sort("_id", 1).batch_size(batch_size)
+
+
+def find_page(col, query: dict, args, projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
+    """
+    Keyset pagination theo _id tăng dần: ?after=<_id cuối trang trước>&limit=N.
+    Lấy dư 1 document để biết còn trang sau; trả về (docs, cursor trang sau hoặc None).
+    """
+    limit = parse_limit(args)
+    docs = list(col.find(after_query(query, args), projection).sort("_id", 1).limit(limit + 1))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = str(docs[-1]["_id"])
+    return docs, next_cursor
+
+
+def with_next_cursor(response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
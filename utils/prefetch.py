@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from config import PREFETCH_ENABLED, PREFETCH_WORKERS, PREFETCH_WAIT_SECONDS
+
+
+class QuestionPrefetcher:
+    """
+    Sinh trước câu hỏi tiếp theo ở background cho từng session.
+    Mỗi session chỉ giữ 1 kết quả prefetch, gắn với loại câu hỏi (kind).
+    """
+
+    def __init__(self, max_workers: int = 4, wait_timeout: float = 30.0, enabled: bool = True):
+        self.enabled = enabled
+        self.wait_timeout = wait_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._futures: Dict[str, Tuple[str, Future]] = {}
+        self._stats = {
+            "scheduled": 0,
+            "queue_hits": 0,
+            "hits": 0,
+            "inflight_hits": 0,
+            "misses": 0,
+            "errors": 0,
+            "cancelled": 0,
+        }
+
+    def schedule(self, session_id: str, kind: str, fn: Callable[[], object], replace: bool = True) -> None:
+        """
+        Đưa job sinh câu hỏi vào hàng đợi. replace=False thì giữ job cùng loại đang chờ,
+        ngược lại thay thế kết quả prefetch cũ (nếu có).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            old = self._futures.get(session_id)
+            if old and not replace and old[0] == kind:
+                return
+            self._futures.pop(session_id, None)
+            if old:
+                old[1].cancel()
+            self._futures[session_id] = (kind, self._executor.submit(fn))
+            self._stats["scheduled"] += 1
+
+    def take(self, session_id: str, kind: str) -> Optional[object]:
+        """
+        Lấy kết quả prefetch của session. Trả None nếu miss (chưa có, sai loại hoặc lỗi),
+        khi đó caller tự gọi đồng bộ.
+        """
+        with self._lock:
+            entry = self._futures.pop(session_id, None)
+
+        if entry is None or entry[0] != kind:
+            if entry:
+                entry[1].cancel()
+            self._bump("misses")
+            return None
+
+        future = entry[1]
+        inflight = not future.done()
+        try:
+            result = future.result(timeout=self.wait_timeout)
+        except Exception as e:
+            print("Prefetch error:", e)
+            self._bump("errors")
+            self._bump("misses")
+            return None
+
+        self._bump("inflight_hits" if inflight else "hits")
+        return result
+
+    def record_queue_hit(self) -> None:
+        """
+        Câu hỏi được lấy thẳng từ hàng đợi của session, không cần tới prefetch.
+        """
+        self._bump("queue_hits")
+
+    def cancel(self, session_id: str) -> None:
+        """
+        Huỷ prefetch của session (gọi khi /end). Job đang chạy sẽ bị bỏ kết quả.
+        """
+        with self._lock:
+            entry = self._futures.pop(session_id, None)
+        if entry:
+            entry[1].cancel()
+            self._bump("cancelled")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._futures)
+        served = stats["queue_hits"] + stats["hits"] + stats["inflight_hits"]
+        total = served + stats["misses"]
+        stats["hit_rate"] = served / total if total else 0.0
+        return stats
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+
+question_prefetcher = QuestionPrefetcher(
+    max_workers=PREFETCH_WORKERS,
+    wait_timeout=PREFETCH_WAIT_SECONDS,
+    enabled=PREFETCH_ENABLED,
+)
@@ -0,0 +1,159 @@
+import datetime
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from config import QUESTION_BATCH_SIZE, QUESTION_POOL_PER_TYPE, QUESTION_POOL_WORKERS
+from extensions.mongo import db
+
+POOL_QUEUED = "queued"
+POOL_BUILDING = "building"
+POOL_READY = "ready"
+POOL_FAILED = "failed"
+
+
+class QuestionPool:
+    """
+    Pool câu hỏi dùng chung cho mọi session của 1 interview, bật khi QUESTION_POOL_PER_TYPE > 0.
+    Pool chỉ được sinh ở lần /start đầu tiên của interview (interview không ai làm thì không tốn LLM).
+    Mỗi session rút câu hỏi không lặp lại, câu ít được dùng nhất được rút trước.
+    """
+
+    def __init__(self, status_col, items_col, per_type: int, batch_size: int, max_workers: int):
+        self.per_type = per_type
+        self.batch_size = max(1, batch_size)
+        self._status_col = status_col
+        self._items_col = items_col
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="question-pool")
+        self._index_lock = threading.Lock()
+        self._index_ready = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_type > 0
+
+    def schedule_build(self, interview_id: str, difficulty: str, types: List[str],
+                       generate_fn: Callable[[str, int], List[dict]]) -> bool:
+        """
+        generate_fn(question_type, count) -> list câu hỏi (object JSON của LLM).
+        Chỉ lần gọi đầu tiên cho mỗi interview được lên lịch sinh, các lần sau trả False.
+        """
+        if not self.enabled or not types:
+            return False
+        self._ensure_indexes()
+        try:
+            result = self._status_col.update_one(
+                {"_id": interview_id},
+                {"$setOnInsert": {
+                    "status": POOL_QUEUED,
+                    "difficulty": difficulty,
+                    "types": types,
+                    "target": self.per_type * len(types),
+                    "built": 0,
+                    "error": None,
+                    "updated_at": datetime.datetime.utcnow(),
+                }},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # 2 request /start đầu tiên cùng upsert, request kia đã lên lịch
+            return False
+        if result.upserted_id is None:
+            return False
+        self._executor.submit(self._build, interview_id, difficulty, types, generate_fn)
+        return True
+
+    def _build(self, interview_id, difficulty, types, generate_fn):
+        self._set_status(interview_id, POOL_BUILDING)
+        try:
+            for question_type in types:
+                built = 0
+                while built < self.per_type:
+                    count = min(self.batch_size, self.per_type - built)
+                    questions = generate_fn(question_type, count)[:count]
+                    if not questions:
+                        break
+                    now = datetime.datetime.utcnow()
+                    self._items_col.insert_many([{
+                        "_id": str(uuid.uuid4()),
+                        "interview_id": interview_id,
+                        "difficulty": difficulty,
+                        "question_type": question_type,
+                        "question": q,
+                        "served": 0,
+                        "served_to": [],
+                        "created_at": now,
+                    } for q in questions])
+                    built += len(questions)
+                    self._status_col.update_one(
+                        {"_id": interview_id},
+                        {"$inc": {"built": len(questions)}, "$set": {"updated_at": now}},
+                    )
+            self._set_status(interview_id, POOL_READY)
+        except Exception as e:
+            print("Question pool build error:", e)
+            self._set_status(interview_id, POOL_FAILED, error=str(e))
+
+    def draw(self, interview_id: str, session_id: str, types: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        Rút 1 câu hỏi session chưa nhận. Trả None nếu pool đã cạn với session này.
+        """
+        query = {"interview_id": interview_id, "served_to": {"$ne": session_id}}
+        if types:
+            query["question_type"] = {"$in": types}
+        doc = self._items_col.find_one_and_update(
+            query,
+            {"$addToSet": {"served_to": session_id}, "$inc": {"served": 1}},
+            projection={"question": 1},
+            sort=[("served", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["question"] if doc else None
+
+    def status(self, interview_id: str) -> Optional[dict]:
+        doc = self._status_col.find_one({"_id": interview_id})
+        if not doc:
+            return None
+        counts = self._items_col.aggregate([
+            {"$match": {"interview_id": interview_id}},
+            {"$group": {"_id": "$question_type", "count": {"$sum": 1}, "served": {"$sum": "$served"}}},
+        ])
+        doc["by_type"] = {c["_id"]: {"count": c["count"], "served": c["served"]} for c in counts}
+        doc["fill"] = doc["built"] / doc["target"] if doc.get("target") else 0.0
+        return doc
+
+    def is_building(self, interview_id: str) -> bool:
+        doc = self._status_col.find_one({"_id": interview_id}, {"status": 1})
+        return bool(doc) and doc.get("status") in (POOL_QUEUED, POOL_BUILDING)
+
+    def has_pool(self, interview_id: str) -> bool:
+        doc = self._status_col.find_one({"_id": interview_id}, {"status": 1, "built": 1})
+        if not doc:
+            return False
+        return doc.get("status") != POOL_FAILED or doc.get("built", 0) > 0
+
+    def _set_status(self, interview_id, status, error=None):
+        self._status_col.update_one(
+            {"_id": interview_id},
+            {"$set": {"status": status, "error": error, "updated_at": datetime.datetime.utcnow()}},
+        )
+
+    def _ensure_indexes(self):
+        with self._index_lock:
+            if self._index_ready:
+                return
+            self._items_col.create_index([("interview_id", 1), ("question_type", 1), ("served", 1)])
+            self._index_ready = True
+
+
+question_pool = QuestionPool(
+    db["question_pools"],
+    db["question_pool_items"],
+    per_type=QUESTION_POOL_PER_TYPE,
+    batch_size=QUESTION_BATCH_SIZE,
+    max_workers=QUESTION_POOL_WORKERS,
+)
@@ -0,0 +1,356 @@
+import datetime
+import re
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import Binary
+
+from config import RETRIEVAL_ENABLED, RETRIEVAL_MAX_OWNERS, RETRIEVAL_WORKERS
+from extensions.mongo import db
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Document Mongo tối đa 16MB, chừa chỗ cho phần còn lại
+MAX_PERSIST_BYTES = 15 * 1024 * 1024
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def _pack(arr: np.ndarray) -> Binary:
+    return Binary(zlib.compress(arr.tobytes(), 6))
+
+
+def _unpack(data: bytes, dtype) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(data), dtype=dtype)
+
+
+class Bm25Index:
+    """
+    Chỉ mục BM25 của 1 owner (syllabus/book), postings theo term (CSR):
+    postings của term i nằm ở doc_ids/tfs[indptr[i]:indptr[i + 1]].
+    Thứ tự chunk_ids giống ChunkIdIndex.ids (theo _id).
+    """
+
+    def __init__(self, chunk_ids: List, terms: List[str], indptr: np.ndarray, doc_ids: np.ndarray,
+                 tfs: np.ndarray, doc_len: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.chunk_ids = list(chunk_ids)
+        self.terms = terms
+        self.term_ids = {t: i for i, t in enumerate(terms)}
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+
+        n = len(self.chunk_ids)
+        df = np.diff(indptr).astype(np.float32)
+        self.idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_len.mean()) if n else 0.0
+        self.norm = (k1 * (1 - b + b * doc_len / avgdl)).astype(np.float32) if avgdl else np.full(n, k1, np.float32)
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[object, str]]) -> "Bm25Index":
+        """
+        docs: (chunk_id, text) theo đúng thứ tự muốn lưu.
+        """
+        chunk_ids = []
+        doc_len = []
+        vocab = {}
+        term_col, doc_col, tf_col = [], [], []
+        for d, (cid, text) in enumerate(docs):
+            tokens = tokenize(text)
+            chunk_ids.append(cid)
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_col.append(vocab.setdefault(term, len(vocab)))
+                doc_col.append(d)
+                tf_col.append(tf)
+
+        term_arr = np.asarray(term_col, dtype=np.int32)
+        order = np.argsort(term_arr, kind="stable")
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int32)
+        np.cumsum(np.bincount(term_arr, minlength=len(vocab)), out=indptr[1:])
+        terms = [None] * len(vocab)
+        for term, i in vocab.items():
+            terms[i] = term
+
+        return cls(
+            chunk_ids,
+            terms,
+            indptr,
+            np.asarray(doc_col, dtype=np.int32)[order],
+            np.minimum(np.asarray(tf_col, dtype=np.int64)[order], 65535).astype(np.uint16),
+            np.asarray(doc_len, dtype=np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def scores(self, query: str) -> np.ndarray:
+        """
+        Điểm BM25 của query cho mọi chunk (mảng dài len(chunk_ids)).
+        """
+        scores = np.zeros(len(self.chunk_ids), dtype=np.float32)
+        for term in set(tokenize(query)):
+            i = self.term_ids.get(term)
+            if i is None:
+                continue
+            start, end = self.indptr[i], self.indptr[i + 1]
+            d = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            # mỗi chunk xuất hiện tối đa 1 lần trong postings của 1 term
+            scores[d] += self.idf[i] * tf * (self.k1 + 1) / (tf + self.norm[d])
+        return scores
+
+    def top_positions(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """
+        (vị trí chunk, điểm) của k chunk điểm cao nhất, chỉ lấy chunk có điểm > 0.
+        """
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(int(i), float(scores[i])) for i in idx if scores[i] > 0]
+
+    def top_k(self, query: str, k: int) -> List[Tuple[object, float]]:
+        return [(self.chunk_ids[i], score) for i, score in self.top_positions(query, k)]
+
+    def to_doc(self) -> dict:
+        return {
+            "chunk_ids": self.chunk_ids,
+            "terms": Binary(zlib.compress("\n".join(self.terms).encode("utf-8"), 6)),
+            "indptr": _pack(self.indptr),
+            "doc_ids": _pack(self.doc_ids),
+            "tfs": _pack(self.tfs),
+            "doc_len": _pack(self.doc_len),
+            "k1": self.k1,
+            "b": self.b,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "Bm25Index":
+        terms_blob = zlib.decompress(doc["terms"]).decode("utf-8")
+        return cls(
+            doc["chunk_ids"],
+            terms_blob.split("\n") if terms_blob else [],
+            _unpack(doc["indptr"], np.int32),
+            _unpack(doc["doc_ids"], np.int32),
+            _unpack(doc["tfs"], np.uint16),
+            _unpack(doc["doc_len"], np.float32),
+            k1=doc.get("k1", 1.5),
+            b=doc.get("b", 0.75),
+        )
+
+
+class RetrievalIndex:
+    """
+    Quản lý Bm25Index theo owner: LRU trong RAM -> bản lưu trong collection retrieval_indexes
+    -> dựng lại từ collection chunk nếu chưa có. Owner không có chunk được nhớ bằng index rỗng
+    (chỉ trong RAM) để không phải dựng lại ở mỗi lần tra.
+
+    Dựng lại cả owner khi re-chunk, không nối thêm postings: chunk của owner luôn được thay toàn bộ
+    (xoá rồi chèn lại với _id mới), và vị trí chunk theo thứ tự _id nên chunk mới xen vào giữa.
+    """
+
+    def __init__(self, name: str, chunk_col, store_col, owner_field: str, text_field: str,
+                 as_str: bool = False, max_owners: int = 64, max_workers: int = 1, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.owner_field = owner_field
+        self.text_field = text_field
+        self.as_str = as_str
+        self.max_owners = max_owners
+        self._chunk_col = chunk_col
+        self._store_col = store_col
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"retrieval-{name}")
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[str, Bm25Index]" = OrderedDict()
+        self._building = set()
+        self._stats = {"hits": 0, "loads": 0, "builds": 0, "queries": 0, "query_seconds": 0.0}
+
+    def get(self, owner_id: str) -> Optional[Bm25Index]:
+        with self._lock:
+            index = self._indexes.get(owner_id)
+            if index is not None:
+                self._indexes.move_to_end(owner_id)
+                self._stats["hits"] += 1
+                return index
+
+        doc = self._store_col.find_one({"_id": self._key(owner_id)})
+        if doc:
+            index = Bm25Index.from_doc(doc)
+            with self._lock:
+                self._stats["loads"] += 1
+            self._remember(owner_id, index)
+            return index
+
+        # chưa có index (syllabus cũ): dựng nền, lần này để caller tự chọn ngẫu nhiên
+        self.schedule_rebuild(owner_id)
+        return None
+
+    def rebuild(self, owner_id: str, docs: Optional[List[Tuple[object, str]]] = None) -> Bm25Index:
+        """
+        Dựng lại index của owner. docs = [(chunk_id, text)] nếu đã có sẵn (lúc ingest),
+        không thì đọc từ collection chunk theo thứ tự _id.
+        """
+        if docs is None:
+            cursor = self._chunk_col.find(
+                {self.owner_field: owner_id}, {self.text_field: 1}
+            ).sort("_id", 1)
+            docs = [(self._format(c["_id"]), c.get(self.text_field) or "") for c in cursor]
+        else:
+            docs = sorted(((self._format(cid), text) for cid, text in docs), key=lambda d: d[0])
+
+        index = Bm25Index.build(docs)
+        with self._lock:
+            self._stats["builds"] += 1
+        if docs:
+            self._persist(owner_id, index)
+        else:
+            # re-chunk ra 0 chunk: bỏ bản lưu cũ để process khác không nạp lại
+            self._store_col.delete_one({"_id": self._key(owner_id)})
+        self._remember(owner_id, index)
+        return index
+
+    def schedule_rebuild(self, owner_id: str, docs: Optional[List[Tuple[object, str]]] = None) -> None:
+        if not self.enabled:
+            return
+        self.invalidate(owner_id)
+        with self._lock:
+            # đã có lượt dựng từ DB đang chờ thì không xếp thêm; docs mới (re-chunk) thì luôn dựng
+            if docs is None and owner_id in self._building:
+                return
+            self._building.add(owner_id)
+        self._executor.submit(self._safe_rebuild, owner_id, docs)
+
+    def top_k(self, owner_id: str, query: str, k: int) -> List[Tuple[object, float]]:
+        """
+        k chunk liên quan nhất tới query (chỉ chunk có điểm > 0).
+        """
+        if not self.enabled or not query or not query.strip():
+            return []
+        index = self.get(owner_id)
+        if index is None:
+            return []
+        started = time.perf_counter()
+        hits = index.top_k(query, k)
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["query_seconds"] += time.perf_counter() - started
+        return hits
+
+    def top_positions(self, owner_id: str, query: str, k: int, n: int) -> List[int]:
+        """
+        Vị trí (trong ChunkIdIndex.ids, n phần tử) của k chunk liên quan nhất.
+        Rỗng nếu index chưa có hoặc lệch với danh sách chunk hiện tại (đang re-chunk).
+        """
+        if not self.enabled or not query or not query.strip():
+            return []
+        index = self.get(owner_id)
+        if index is not None and len(index) == 0 and n > 0:
+            # index rỗng nhớ từ trước khi owner có chunk (chunk được ghi ở process khác)
+            self.schedule_rebuild(owner_id)
+            return []
+        if index is None or len(index) != n:
+            return []
+        started = time.perf_counter()
+        hits = index.top_positions(query, k)
+        with self._lock:
+            self._stats["queries"] += 1
+            self._stats["query_seconds"] += time.perf_counter() - started
+        return [i for i, _ in hits]
+
+    def scores(self, owner_id: str, query: str) -> Optional[np.ndarray]:
+        """
+        Điểm BM25 của toàn bộ chunk theo thứ tự _id, None nếu không có index.
+        """
+        if not self.enabled or not query or not query.strip():
+            return None
+        index = self.get(owner_id)
+        return index.scores(query) if index is not None else None
+
+    def invalidate(self, owner_id: str) -> None:
+        with self._lock:
+            self._indexes.pop(owner_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["owners"] = len(self._indexes)
+            stats["empty_owners"] = sum(1 for i in self._indexes.values() if not len(i))
+            stats["postings_held"] = sum(len(i.doc_ids) for i in self._indexes.values())
+        stats["avg_query_ms"] = stats["query_seconds"] * 1000 / stats["queries"] if stats["queries"] else 0.0
+        stats["enabled"] = self.enabled
+        return stats
+
+    def _safe_rebuild(self, owner_id, docs):
+        try:
+            self.rebuild(owner_id, docs)
+        except Exception as e:
+            print(f"Retrieval index build failed for {self.name}:{owner_id}:", e)
+        finally:
+            with self._lock:
+                self._building.discard(owner_id)
+
+    def _persist(self, owner_id: str, index: Bm25Index) -> None:
+        doc = index.to_doc()
+        size = sum(len(v) for v in doc.values() if isinstance(v, bytes)) + sum(len(str(c)) for c in index.chunk_ids)
+        if size > MAX_PERSIST_BYTES:
+            print(f"Retrieval index {self.name}:{owner_id} too large to persist ({size} bytes)")
+            return
+        doc.update({
+            "_id": self._key(owner_id),
+            "name": self.name,
+            "owner_id": owner_id,
+            "num_chunks": len(index),
+            "num_terms": len(index.terms),
+            "built_at": datetime.datetime.utcnow(),
+        })
+        self._store_col.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+
+    def _remember(self, owner_id: str, index: Bm25Index) -> None:
+        with self._lock:
+            self._indexes[owner_id] = index
+            self._indexes.move_to_end(owner_id)
+            while len(self._indexes) > self.max_owners:
+                self._indexes.popitem(last=False)
+
+    def _key(self, owner_id: str) -> str:
+        return f"{self.name}:{owner_id}"
+
+    def _format(self, _id):
+        return str(_id) if self.as_str else _id
+
+
+syllabus_retrieval = RetrievalIndex(
+    "syllabus",
+    db["chunks"],
+    db["retrieval_indexes"],
+    owner_field="metadata.syllabus_id",
+    text_field="text",
+    as_str=True,
+    max_owners=RETRIEVAL_MAX_OWNERS,
+    max_workers=RETRIEVAL_WORKERS,
+    enabled=RETRIEVAL_ENABLED,
+)
+
+book_retrieval = RetrievalIndex(
+    "book",
+    db["system_book_chunks"],
+    db["retrieval_indexes"],
+    owner_field="bookId",
+    text_field="content",
+    max_owners=RETRIEVAL_MAX_OWNERS,
+    max_workers=RETRIEVAL_WORKERS,
+    enabled=RETRIEVAL_ENABLED,
+)
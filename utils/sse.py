@@ -0,0 +1,39 @@
+import json
+
+from flask import Response, stream_with_context
+
+from extensions.llm import stream_llm_json
+from extensions.rate_limit import is_rate_limit_error
+
+
+def sse_event(event: str, data) -> str:
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def sse_response(events) -> Response:
+    """
+    Trả về response text/event-stream từ 1 generator các chuỗi sse_event.
+    """
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def llm_question_events(prompt: str):
+    """
+    Stream câu hỏi từ LLM thành các SSE event: "delta" -> "result" (hoặc "error").
+    """
+    try:
+        for kind, payload in stream_llm_json(prompt):
+            if kind == "delta":
+                yield sse_event("delta", {"text": payload})
+            elif not isinstance(payload, dict) or not payload.get("question"):
+                yield sse_event("error", {"error": "LLM error", "detail": "Missing question in LLM output"})
+            else:
+                yield sse_event("result", payload)
+    except Exception as e:
+        status = 429 if is_rate_limit_error(e) else 500
+        yield sse_event("error", {"error": "LLM error", "detail": str(e), "status": status})
@@ -1,6 +1,15 @@
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from config import SUMMARY_WORKERS
 from extensions.llm import call_llm_json
 
+_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summarize")
+_pending_lock = threading.Lock()
+_pending = set()
+
 def prompt_summarize_history(old_summary: str, new_pairs: list) -> str:
     new_pairs_str = json.dumps(new_pairs, ensure_ascii=False, indent=2)
     return f"""
@@ -21,5 +30,59 @@ Yêu cầu:
 
 def summarize(old_summary: str, new_pairs: list) -> str:
     prompt = prompt_summarize_history(old_summary, new_pairs)
-    obj = call_llm_json(prompt)
+    obj = call_llm_json(prompt, use_cache=True)
     return obj.get("summary", old_summary or "")
+
+
+def schedule_rolling_summary(
+    store,
+    session_id: str,
+    qa_len: int,
+    window: int = 6,
+    keep: int = 4,
+    on_done: Optional[Callable[[], None]] = None,
+) -> bool:
+    """
+    Khi qa_log dài hơn window thì tóm tắt ở background, mỗi session tối đa 1 job
+    trong process. Trả True nếu đã lên lịch.
+    """
+    if qa_len <= window:
+        return False
+    with _pending_lock:
+        if session_id in _pending:
+            return False
+        _pending.add(session_id)
+
+    _executor.submit(_run_rolling_summary, store, session_id, window, keep, on_done)
+    return True
+
+def _run_rolling_summary(store, session_id, window, keep, on_done):
+    applied = False
+    qa_len = 0
+    try:
+        session = store.get(session_id)
+        if session is None:
+            return
+        qa_log = session.get("qa_log", [])
+        seen = len(qa_log)
+        new_summary = summarize(session.get("summary", ""), list(qa_log[-window:]))
+
+        # giữ keep lượt cuối của snapshot + các lượt được thêm trong lúc tóm tắt;
+        # version lệch nghĩa là đã có job khác (worker khác) tóm tắt trước
+        applied = store.replace_summary(
+            session_id, new_summary, session.get("summary_version", 0), max(0, seen - keep)
+        )
+        if applied:
+            latest = store.get(session_id)
+            qa_len = len(latest.get("qa_log", [])) if latest else 0
+    except Exception as e:
+        print("Summarize error:", e)
+    finally:
+        with _pending_lock:
+            _pending.discard(session_id)
+
+    if applied:
+        if on_done:
+            on_done()
+        # trong lúc tóm tắt có thể đã đủ lượt mới cho lần tiếp theo
+        schedule_rolling_summary(store, session_id, qa_len, window, keep, on_done)